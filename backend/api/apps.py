@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backend.api'
 
+    def ready(self):
+        from .metrics import install_db_wrapper
+        # Time every query on every connection for the metrics endpoint
+        connection_created.connect(install_db_wrapper, dispatch_uid='api.metrics.db_wrapper')
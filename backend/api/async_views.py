@@ -0,0 +1,143 @@
+import json
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from .models import UserSession
+from .serializers import UserSessionSerializer, ChatMessageSerializer, ChatSendSerializer
+from .intent import classify_intent
+from .history import build_chat_history
+from .jobs import enqueue_job
+from .llm_engine import achat_with_ai, astream_chat_with_ai
+from .llm_gateway import LLMUnavailable
+from .views import (
+    LLM_BUSY_ERROR, _build_chat_context, _queue_roadmap_reply, _record_chat_reply, _record_user_message,
+    _roadmap_due, _sse_event,
+)
+
+# Async counterparts of the LLM-bound endpoints in views.py, used when the app
+# is served over ASGI (see ASYNC_VIEWS in settings). Request and response
+# shapes match the DRF views exactly. Database work goes through Django's async
+# ORM or sync_to_async; the LLM calls are natively async.
+
+
+def _parse_json(request):
+    try:
+        return json.loads(request.body or b'{}')
+    except json.JSONDecodeError:
+        return None
+
+
+async def _aload_chat_turn(request):
+    """
+    Validates a chat payload and returns (session, message_text, error_response).
+    The user's message is saved once the prompt's history is built.
+    """
+    data = _parse_json(request)
+    if data is None:
+        return None, None, JsonResponse({'success': False, 'error': 'Invalid JSON data received'}, status=400)
+
+    serializer = ChatSendSerializer(data=data)
+    if not serializer.is_valid():
+        return None, None, JsonResponse({'success': False, 'errors': serializer.errors}, status=400)
+
+    session_id = serializer.validated_data['session_id']
+    message_text = serializer.validated_data['message']
+
+    try:
+        session = await UserSession.objects.aget(session_id=session_id)
+    except UserSession.DoesNotExist:
+        return None, None, JsonResponse({'success': False, 'error': 'Session not found'}, status=404)
+
+    return session, message_text, None
+
+
+@csrf_exempt
+@require_POST
+async def submit_questionnaire(request):
+    data = _parse_json(request)
+    if data is None:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON data received'}, status=400)
+
+    serializer = UserSessionSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse({'success': False, 'errors': serializer.errors}, status=400)
+
+    session = await sync_to_async(serializer.save)()
+
+    # Welcome message is generated off-request, as in the sync view
+    await sync_to_async(enqueue_job)(session, 'welcome')
+
+    return JsonResponse({
+        'success': True,
+        'session_id': session.session_id,
+    }, status=201)
+
+
+@csrf_exempt
+@require_POST
+async def send_message(request):
+    session, message_text, error_response = await _aload_chat_turn(request)
+    if error_response:
+        return error_response
+
+    intent = classify_intent(message_text)
+    if _roadmap_due(session, intent):
+        ai_message = await sync_to_async(_queue_roadmap_reply)(session, message_text)
+    else:
+        history_text = await sync_to_async(build_chat_history)(session)
+        context = await sync_to_async(_build_chat_context)(session, intent)
+        await sync_to_async(_record_user_message)(session, message_text)
+
+        try:
+            ai_response_text = await achat_with_ai(context, message_text, history_text)
+        except LLMUnavailable as e:
+            print(f"LLM unavailable for send_message: {e}")
+            return JsonResponse({'success': False, 'error': LLM_BUSY_ERROR}, status=503)
+
+        ai_message = await sync_to_async(_record_chat_reply)(session, ai_response_text)
+
+    return JsonResponse({
+        'success': True,
+        'ai_response': ChatMessageSerializer(ai_message).data
+    }, status=201)
+
+
+@csrf_exempt
+@require_POST
+async def send_message_stream(request):
+    """
+    Async version of views.send_message_stream.
+    """
+    session, message_text, error_response = await _aload_chat_turn(request)
+    if error_response:
+        return error_response
+
+    intent = classify_intent(message_text)
+    if _roadmap_due(session, intent):
+        async def event_stream():
+            ai_message = await sync_to_async(_queue_roadmap_reply)(session, message_text)
+            yield _sse_event('done', ChatMessageSerializer(ai_message).data)
+    else:
+        history_text = await sync_to_async(build_chat_history)(session)
+        context = await sync_to_async(_build_chat_context)(session, intent)
+        await sync_to_async(_record_user_message)(session, message_text)
+
+        async def event_stream():
+            parts = []
+            try:
+                async for delta in astream_chat_with_ai(context, message_text, history_text):
+                    parts.append(delta)
+                    yield _sse_event('token', {'delta': delta})
+            except Exception as e:
+                print(f"Error streaming AI response: {e}")
+                yield _sse_event('error', {'error': 'The AI response was interrupted.'})
+                return
+
+            ai_message = await sync_to_async(_record_chat_reply)(session, "".join(parts))
+            yield _sse_event('done', ChatMessageSerializer(ai_message).data)
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,276 @@
+import asyncio
+import json
+import re
+import time
+import uuid
+
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import metrics
+from .history import build_chat_history, encode_cursor, fetch_history_page
+from .intent import classify_intent
+from .jobs import run_unclaimed_jobs
+from .llm_engine import astream_chat_with_ai
+from .models import UserSession
+from .serializers import ChatMessageSerializer, ChatSendSerializer
+from .views import (
+    _build_chat_context, _queue_roadmap_reply, _record_chat_reply,
+    _record_user_message, _roadmap_due,
+)
+
+# A WebSocket per chat session (ws/chat/<session_id>/), served as a plain
+# ASGI app next to Django (see counseling_ai/asgi.py). The connection keeps
+# its UserSession in memory, so a turn skips the HTTP stack and the session
+# lookup, and pushes what the client used to poll for: new messages (the
+# welcome message, other tabs), and roadmap and resume status changes.
+#
+# Frames are JSON text. The client sends {"type": "message", "message": ...}.
+# The server sends "messages" (a batch of saved messages), "ready" (after
+# the initial history), "token", "done" and "error" for a chat turn, and
+# "roadmap" / "resume" when their status changes.
+
+PATH_PATTERN = re.compile(r'^/?(?:api/)?ws/chat/(?P<session_id>[0-9a-f-]{36})/?$')
+
+# Statuses that mean a background job will change the session soon
+IN_FLIGHT = ('pending', 'running')
+
+_open_connections = 0
+
+
+def open_connections():
+    return _open_connections
+
+
+def database_sync_to_async(func):
+    """
+    Wraps sync DB work for a socket. Outside a request, sync_to_async (and the
+    async ORM) would run every socket's queries on one shared thread, so a
+    slow step on one connection would hold up the rest. This runs them on
+    the thread pool instead and closes stale connections around each call,
+    as Django does around a request.
+    """
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def _session_changes(session_pk):
+    return UserSession.objects.filter(pk=session_pk).values(
+        'message_count', 'roadmap_status', 'resume_status', 'roadmap_draft_status',
+    ).first()
+
+
+def _load_session(session_id):
+    try:
+        return UserSession.objects.get(session_id=session_id)
+    except UserSession.DoesNotExist:
+        return None
+
+
+def _origin_allowed(scope):
+    """
+    Applies the CORS origin settings to the WebSocket handshake, which
+    browsers don't restrict themselves. Clients that send no Origin are let in.
+    """
+    headers = dict(scope.get('headers') or [])
+    origin = headers.get(b'origin', b'').decode('latin-1')
+    if not origin or getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False):
+        return True
+    if origin in settings.CORS_ALLOWED_ORIGINS:
+        return True
+    return any(re.match(pattern, origin) for pattern in settings.CORS_ALLOWED_ORIGIN_REGEXES)
+
+
+class ChatConnection:
+    def __init__(self, session, send):
+        self.session = session
+        self._send = send
+        self.cursor = None
+        # Held while a turn is saved, so the watcher never mistakes this
+        # connection's own messages for new ones
+        self.write_lock = asyncio.Lock()
+        self.wake = asyncio.Event()
+
+    async def send(self, payload):
+        # Same encoding as the history endpoint
+        await self._send({'type': 'websocket.send', 'text': orjson.dumps(payload, option=orjson.OPT_UTC_Z).decode()})
+
+    # --- History and Events ---
+    async def send_new_messages(self):
+        """
+        Sends every message after the connection's cursor, a page at a time.
+        """
+        has_more = True
+        while has_more:
+            messages, self.cursor, has_more = await database_sync_to_async(fetch_history_page)(self.session, self.cursor)
+            if messages:
+                await self.send({'type': 'messages', 'messages': messages})
+
+    async def watch(self):
+        """
+        Re-reads the session row and pushes what changed: new messages,
+        roadmap and resume status. Polls quickly while a background job is
+        expected to change something, slowly otherwise.
+        """
+        while True:
+            in_flight = (
+                self.session.message_count == 0 or self.session.roadmap_status in IN_FLIGHT
+                or self.session.resume_status in IN_FLIGHT or self.session.roadmap_draft_status in IN_FLIGHT
+            )
+            interval = settings.CHAT_SOCKET_POLL_SECONDS if in_flight else settings.CHAT_SOCKET_IDLE_POLL_SECONDS
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+
+            if in_flight:
+                # Stands in for the worker if it isn't running
+                await database_sync_to_async(run_unclaimed_jobs)(self.session)
+            async with self.write_lock:
+                row = await database_sync_to_async(_session_changes)(self.session.pk)
+                if row is None:
+                    return
+                if row['message_count'] != self.session.message_count:
+                    self.session.message_count = row['message_count']
+                    await self.send_new_messages()
+            # Drafts aren't shown to the client; the status only keeps the watcher running them
+            self.session.roadmap_draft_status = row['roadmap_draft_status']
+
+            if row['roadmap_status'] != self.session.roadmap_status:
+                await database_sync_to_async(self.session.refresh_from_db)(fields=['roadmap_status', 'roadmap_data'])
+                await self.send({'type': 'roadmap', 'status': self.session.roadmap_status})
+            if row['resume_status'] != self.session.resume_status:
+                # The chat context reads the new resume's profile and chunks from here
+                await database_sync_to_async(self.session.refresh_from_db)(
+                    fields=['resume_status', 'resume_hash', 'resume_chunks', 'resume_profile'],
+                )
+                await self.send({'type': 'resume', 'status': self.session.resume_status})
+
+    # --- Chat Turns ---
+    async def handle_turn(self, message_text):
+        started = time.perf_counter()
+        intent = classify_intent(message_text)
+        if _roadmap_due(self.session, intent):
+            async with self.write_lock:
+                ai_message = await database_sync_to_async(_queue_roadmap_reply)(self.session, message_text)
+                self._advance(ai_message)
+            await self.send({'type': 'done', 'message': ChatMessageSerializer(ai_message).data})
+            if self.session.roadmap_status:
+                # Unset if a concurrent request claimed the roadmap; the watcher reports that one
+                await self.send({'type': 'roadmap', 'status': self.session.roadmap_status})
+        else:
+            history_text = await database_sync_to_async(build_chat_history)(self.session)
+            context = await database_sync_to_async(_build_chat_context)(self.session, intent)
+            async with self.write_lock:
+                user_message = await database_sync_to_async(_record_user_message)(self.session, message_text)
+                self._advance(user_message)
+            parts = []
+            try:
+                async for delta in astream_chat_with_ai(context, message_text, history_text):
+                    parts.append(delta)
+                    await self.send({'type': 'token', 'delta': delta})
+            except Exception as e:
+                print(f"Error streaming AI response over the chat socket: {e}")
+                await self.send({'type': 'error', 'error': 'The AI response was interrupted.'})
+                return
+
+            async with self.write_lock:
+                ai_message = await database_sync_to_async(_record_chat_reply)(self.session, "".join(parts))
+                self._advance(ai_message)
+            await self.send({'type': 'done', 'message': ChatMessageSerializer(ai_message).data})
+        metrics.observe('chat_socket_turn_seconds', time.perf_counter() - started, intent=intent)
+
+    def _advance(self, ai_message):
+        # The client already has this turn, so history resumes after it
+        self.cursor = encode_cursor(ai_message.timestamp, ai_message.message_id)
+
+    async def handle_frame(self, text):
+        try:
+            frame = json.loads(text or '')
+        except json.JSONDecodeError:
+            await self.send({'type': 'error', 'error': 'Frames must be JSON.'})
+            return
+        if not isinstance(frame, dict) or frame.get('type') != 'message':
+            await self.send({'type': 'error', 'error': 'Unknown frame type.'})
+            return
+
+        serializer = ChatSendSerializer(data={'session_id': self.session.session_id, 'message': frame.get('message')})
+        if not serializer.is_valid():
+            await self.send({'type': 'error', 'errors': serializer.errors})
+            return
+        metrics.inc('chat_socket_frames_total', type='message')
+        await self.handle_turn(serializer.validated_data['message'])
+
+
+async def chat_socket(scope, receive, send):
+    """
+    ASGI app for a chat session's WebSocket.
+    """
+    global _open_connections
+
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+
+    match = PATH_PATTERN.match(scope['path'])
+    session = None
+    if match:
+        try:
+            session = await database_sync_to_async(_load_session)(uuid.UUID(match['session_id']))
+        except ValueError:
+            pass
+    # Closing before accepting rejects the handshake (servers answer 403)
+    if session is None or not _origin_allowed(scope):
+        await send({'type': 'websocket.close'})
+        return
+
+    await send({'type': 'websocket.accept'})
+    metrics.inc('chat_socket_connections_total')
+    _open_connections += 1
+    connection = ChatConnection(session, send)
+
+    # Turns run one at a time, in order, while frames keep being received
+    turns = asyncio.Queue()
+
+    async def run_turns():
+        while True:
+            text = await turns.get()
+            try:
+                await connection.handle_frame(text)
+            except Exception as e:
+                print(f"Error handling a chat socket frame for {session.session_id}: {e}")
+                await connection.send({'type': 'error', 'error': 'Something went wrong. Please try again.'})
+
+    tasks = []
+    try:
+        await connection.send_new_messages()
+        await connection.send({
+            'type': 'ready',
+            'welcome_pending': session.message_count == 0,
+            'roadmap_status': session.roadmap_status,
+            'resume_status': session.resume_status,
+        })
+        if session.message_count == 0:
+            # Start the welcome message right away; the watcher sends it once saved
+            connection.wake.set()
+        tasks = [asyncio.create_task(run_turns()), asyncio.create_task(connection.watch())]
+
+        while True:
+            event = await receive()
+            if event['type'] == 'websocket.disconnect':
+                break
+            if event['type'] == 'websocket.receive':
+                await turns.put(event.get('text'))
+    finally:
+        _open_connections -= 1
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
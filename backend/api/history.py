@@ -0,0 +1,182 @@
+import base64
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .llm_engine import summarize_history
+from .metrics import span
+from .models import ChatMessage, UserSession
+
+SENDER_LABELS = dict(ChatMessage.SENDER_CHOICES)
+
+# cl100k_base is not Llama's tokenizer, but its counts are close enough for
+# budgeting. Loaded on first use; if it cannot be loaded (e.g. offline with no
+# cached encoding) we fall back to ~4 characters per token.
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    print(f"Could not load tiktoken encoding, estimating token counts: {e}")
+                    _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def _format_line(sender, message):
+    return f"{SENDER_LABELS.get(sender, sender)}: {message}"
+
+
+def record_messages(session, messages):
+    """
+    Saves (sender, text) pairs in order and bumps the session's message_count,
+    all in one transaction. The in-memory session is updated too, so callers
+    can read the new count without another query. Returns the saved ChatMessages.
+    """
+    with transaction.atomic():
+        # Bumping the count first locks the session row, so concurrent writers
+        # to a session take turns and stamp their messages in commit order.
+        # History cursors rely on that: a message is never inserted behind
+        # one a client has already seen.
+        UserSession.objects.filter(pk=session.pk).update(
+            message_count=F('message_count') + len(messages), updated_at=timezone.now()
+        )
+        now = timezone.now()
+        chat_messages = [
+            # Keep the order stable even if the clock hasn't moved between messages
+            ChatMessage(session=session, sender=sender, message=text, timestamp=now + timedelta(microseconds=offset))
+            for offset, (sender, text) in enumerate(messages)
+        ]
+        ChatMessage.objects.bulk_create(chat_messages)
+    session.message_count += len(chat_messages)
+    return chat_messages
+
+
+def record_message(session, sender, message):
+    """
+    Saves a single chat message; see record_messages.
+    """
+    return record_messages(session, [(sender, message)])[0]
+
+
+def record_turn(session, user_message, ai_message):
+    """
+    Saves a user message together with the AI reply to it and returns the reply.
+    """
+    return record_messages(session, [('user', user_message), ('ai', ai_message)])[1]
+
+
+def build_history_text(session, until=None):
+    """
+    Returns the session's conversation as "Sender: message" lines, oldest
+    first, up to and including `until` if given.
+    """
+    rows = ChatMessage.objects.filter(session=session)
+    if until:
+        rows = rows.filter(timestamp__lte=until)
+    rows = rows.order_by("timestamp").values_list("sender", "message")
+    return "\n".join(_format_line(sender, message) for sender, message in rows)
+
+
+@span("history")
+def build_chat_history(session, token_budget=None):
+    """
+    Returns prompt-ready history for a chat turn: the rolling summary of older
+    turns followed by the recent messages verbatim, within `token_budget`.
+
+    Only messages newer than the summary are read. When they overflow the
+    budget, the oldest are folded into `session.history_summary` in one batch,
+    leaving the recent window at half the budget so the next fold is several
+    turns away.
+    """
+    token_budget = token_budget or settings.CHAT_HISTORY_TOKEN_BUDGET
+
+    recent = ChatMessage.objects.filter(session=session)
+    if session.summarized_until:
+        recent = recent.filter(timestamp__gt=session.summarized_until)
+    rows = list(recent.order_by("timestamp").values_list("timestamp", "sender", "message"))
+
+    lines = [_format_line(sender, message) for _, sender, message in rows]
+    line_tokens = [count_tokens(line) for line in lines]
+    summary_tokens = count_tokens(session.history_summary) if session.history_summary else 0
+
+    if summary_tokens + sum(line_tokens) > token_budget and len(lines) > 1:
+        # Keep as many of the newest lines as fit in half the budget (always at least one)
+        keep_budget = max(token_budget // 2 - summary_tokens, 0)
+        keep_from = len(lines) - 1
+        kept_tokens = line_tokens[-1]
+        while keep_from > 0 and kept_tokens + line_tokens[keep_from - 1] <= keep_budget:
+            keep_from -= 1
+            kept_tokens += line_tokens[keep_from]
+
+        if keep_from > 0:
+            folded_text = "\n".join(lines[:keep_from])
+            session.history_summary = summarize_history(session.history_summary, folded_text)
+            session.summarized_until = rows[keep_from - 1][0]
+            session.save(update_fields=['history_summary', 'summarized_until', 'updated_at'])
+            lines = lines[keep_from:]
+
+    if session.history_summary:
+        return f"Summary of the earlier conversation: {session.history_summary}\n\n" + "\n".join(lines)
+    return "\n".join(lines)
+
+
+# --- Paginated History ---
+# Pages are keyed on (timestamp, message_id), which follows the
+# (session, timestamp) index. A cursor points just past the last message a
+# client has seen.
+HISTORY_FIELDS = ("message_id", "sender", "message", "timestamp")
+
+
+def encode_cursor(timestamp, message_id):
+    raw = f"{timestamp.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Returns (timestamp, message_id) for a cursor. Raises ValueError if it is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, message_id = raw.split("|")
+        return datetime.fromisoformat(timestamp), uuid.UUID(message_id)
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def fetch_history_page(session, since=None, limit=None):
+    """
+    Returns (messages, next_cursor, has_more) for messages after the `since`
+    cursor, oldest first. Messages are plain dicts of HISTORY_FIELDS.
+    """
+    limit = limit or settings.CHAT_HISTORY_PAGE_SIZE
+    messages = ChatMessage.objects.filter(session=session)
+    if since:
+        timestamp, message_id = decode_cursor(since)
+        messages = messages.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, message_id__gt=message_id))
+
+    rows = list(messages.order_by("timestamp", "message_id").values(*HISTORY_FIELDS)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["message_id"]) if rows else since
+    return rows, next_cursor, has_more
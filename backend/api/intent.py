@@ -0,0 +1,137 @@
+import os
+import random
+import re
+import threading
+import zlib
+
+import numpy as np
+from django.conf import settings
+
+from . import metrics
+from .intent_seed import SEED_EXAMPLES
+
+# A small multinomial logistic regression over hashed word n-grams that labels
+# each chat turn, so cheap local checks decide whether a turn triggers the
+# roadmap or needs resume retrieval. Words after a negation are marked
+# ("neg_roadmap"), which keeps "I don't want a roadmap yet" apart from a
+# request for one. The weights ship as a compressed .npz built by
+# `manage.py train_intent_classifier`; if the file is missing, the model is
+# trained from the seed examples on first use.
+
+INTENTS = ('counseling', 'roadmap', 'resume', 'small_talk')
+# Used when the model isn't confident: no roadmap, retrieval as usual
+DEFAULT_INTENT = 'counseling'
+
+FEATURE_DIM = 2 ** 14
+NEGATIONS = frozenset("not no never don't dont doesn't didn't isn't won't wouldn't can't cannot before without yet".split())
+# How many words after a negation are marked as negated
+NEGATION_SCOPE = 3
+
+_model = None
+_model_lock = threading.Lock()
+
+
+# --- Features ---
+def _tokens(text):
+    tokens = []
+    negated = 0
+    for word in re.findall(r"[a-z0-9']+", text.lower()):
+        if word in NEGATIONS:
+            tokens.append(word)
+            negated = NEGATION_SCOPE
+            continue
+        tokens.append(f"neg_{word}" if negated else word)
+        negated = max(negated - 1, 0)
+    return tokens
+
+
+def features(text):
+    """
+    Returns the sorted hashed feature indexes (unigrams, bigrams and a bias) for a text.
+    """
+    tokens = _tokens(text)
+    grams = ['<bias>'] + tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    if len(tokens) <= 2:
+        # Very short turns are mostly acknowledgements; let the model see that
+        grams.append('<short>')
+    return np.unique([zlib.crc32(gram.encode('utf-8')) % FEATURE_DIM for gram in grams])
+
+
+# --- Model ---
+class IntentModel:
+    def __init__(self, weights, intents=INTENTS):
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.intents = tuple(intents)
+
+    def predict_proba(self, text):
+        scores = self.weights[:, features(text)].sum(axis=1)
+        scores = np.exp(scores - scores.max())
+        return scores / scores.sum()
+
+    def predict(self, text):
+        """
+        Returns (intent, confidence).
+        """
+        proba = self.predict_proba(text)
+        best = int(np.argmax(proba))
+        return self.intents[best], float(proba[best])
+
+    def save(self, path):
+        # float16 weights are plenty for argmax and keep the artifact small
+        np.savez_compressed(path, weights=self.weights.astype(np.float16), intents=np.array(self.intents))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['weights'], [str(intent) for intent in data['intents']])
+
+
+def train(examples, epochs=30, learning_rate=0.2, l2=1e-4, seed=0):
+    """
+    Fits an IntentModel to (text, intent) pairs with plain SGD on the softmax
+    loss. Only the weights of an example's features are touched per step.
+    """
+    rows = [(features(text), INTENTS.index(intent)) for text, intent in examples]
+    weights = np.zeros((len(INTENTS), FEATURE_DIM), dtype=np.float32)
+    rng = random.Random(seed)
+    for epoch in range(epochs):
+        rng.shuffle(rows)
+        step = learning_rate / (1 + epoch * 0.1)
+        for indexes, label in rows:
+            scores = weights[:, indexes].sum(axis=1)
+            proba = np.exp(scores - scores.max())
+            proba /= proba.sum()
+            proba[label] -= 1.0
+            weights[:, indexes] -= step * (proba[:, None] + l2 * weights[:, indexes])
+    return IntentModel(weights)
+
+
+def get_model():
+    """
+    Returns the process-wide model, loading (or training) it on first use.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                path = settings.INTENT_MODEL_PATH
+                if os.path.exists(path):
+                    _model = IntentModel.load(path)
+                else:
+                    print(f"No intent model at {path}; training one from the seed examples.")
+                    _model = train(SEED_EXAMPLES)
+    return _model
+
+
+def classify_intent(text, record=True):
+    """
+    Labels a user message as one of INTENTS, falling back to DEFAULT_INTENT
+    below INTENT_MIN_CONFIDENCE. Pass record=False when re-reading a message
+    already counted in chat_intents_total.
+    """
+    intent, confidence = get_model().predict(text)
+    if confidence < settings.INTENT_MIN_CONFIDENCE:
+        intent = DEFAULT_INTENT
+    if record:
+        metrics.inc('chat_intents_total', intent=intent)
+    return intent
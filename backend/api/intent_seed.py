@@ -0,0 +1,107 @@
+# Hand-labelled chat turns the intent classifier is always trained on. They
+# cover the phrasings the old keyword trigger got wrong (negations, "not
+# yet", roadmap mentioned in passing), so weak labels mined from chat history
+# can't teach those mistakes back. Add examples here when a misfire is found,
+# then rerun `manage.py train_intent_classifier`.
+
+SEED_EXAMPLES = [
+    # --- roadmap: the user wants their roadmap / career plan now ---
+    ("Can you make my roadmap now?", "roadmap"),
+    ("Please generate my career roadmap", "roadmap"),
+    ("Show me the roadmap", "roadmap"),
+    ("I'm ready for my career plan", "roadmap"),
+    ("Give me a career plan based on what we talked about", "roadmap"),
+    ("Can I see my personalized roadmap?", "roadmap"),
+    ("ok let's do the roadmap", "roadmap"),
+    ("Create a roadmap for me please", "roadmap"),
+    ("What should my step by step plan be? Make the roadmap", "roadmap"),
+    ("I think that's enough, can you prepare my career path plan", "roadmap"),
+    ("generate roadmap", "roadmap"),
+    ("roadmap please", "roadmap"),
+    ("Build me a plan for which careers to pursue", "roadmap"),
+    ("Now make me a career roadmap with courses", "roadmap"),
+    ("Can you summarize all this into a career plan for me?", "roadmap"),
+    ("I want my roadmap", "roadmap"),
+    ("Let's wrap up and get the roadmap", "roadmap"),
+    ("Could you put together a learning path and career plan now", "roadmap"),
+    ("make the career plan", "roadmap"),
+    ("Yes, go ahead and create the roadmap", "roadmap"),
+    ("I'd like to see the final roadmap now", "roadmap"),
+    ("Please give me my career roadmap so I can start", "roadmap"),
+
+    # --- resume: about the user's resume, CV, experience or projects ---
+    ("I've uploaded my resume, can you look at it?", "resume"),
+    ("What do you think of my CV?", "resume"),
+    ("Which skills on my resume are strongest?", "resume"),
+    ("Based on my resume what jobs fit me?", "resume"),
+    ("I did an internship at a startup last summer as a backend developer", "resume"),
+    ("My projects include a chat app and a weather dashboard", "resume"),
+    ("Should I add my hackathon win to my resume?", "resume"),
+    ("How can I improve my CV for data science roles?", "resume"),
+    ("I have two years of experience in Java and Spring", "resume"),
+    ("Check my work experience and tell me what's missing", "resume"),
+    ("I worked as a marketing intern at an agency", "resume"),
+    ("Does my resume show enough leadership?", "resume"),
+    ("Here is my resume", "resume"),
+    ("Can you review the projects section of my resume", "resume"),
+    ("I listed Python, SQL and Excel as my skills", "resume"),
+    ("My previous job was as a teaching assistant", "resume"),
+    ("What certifications should I add to my CV?", "resume"),
+    ("I don't have a resume yet, should I make one?", "resume"),
+    ("I built a machine learning project for my final year", "resume"),
+    ("Look at my experience section", "resume"),
+
+    # --- small_talk: greetings, thanks, acknowledgements ---
+    ("hi", "small_talk"),
+    ("hello!", "small_talk"),
+    ("hey there", "small_talk"),
+    ("good morning", "small_talk"),
+    ("thanks", "small_talk"),
+    ("thank you so much", "small_talk"),
+    ("ok", "small_talk"),
+    ("okay cool", "small_talk"),
+    ("yes", "small_talk"),
+    ("no", "small_talk"),
+    ("sure", "small_talk"),
+    ("great, thanks!", "small_talk"),
+    ("lol", "small_talk"),
+    ("nice", "small_talk"),
+    ("how are you?", "small_talk"),
+    ("I'm fine, you?", "small_talk"),
+    ("bye", "small_talk"),
+    ("see you later", "small_talk"),
+    ("that's helpful, thanks", "small_talk"),
+    ("hmm", "small_talk"),
+    ("who are you?", "small_talk"),
+    ("yeah", "small_talk"),
+
+    # --- counseling: everything else, including roadmap mentioned but not wanted yet ---
+    ("I don't want a roadmap yet", "counseling"),
+    ("Not the roadmap yet, I have more questions", "counseling"),
+    ("Before the roadmap, can we talk about engineering colleges?", "counseling"),
+    ("I'm not ready for a career plan, I'm still confused", "counseling"),
+    ("No roadmap please, just tell me about medicine", "counseling"),
+    ("Don't make the plan yet, what about commerce?", "counseling"),
+    ("My friend got a roadmap from a counselor but it didn't help him", "counseling"),
+    ("I really enjoy maths and building small games", "counseling"),
+    ("I'm confused between engineering and medicine", "counseling"),
+    ("My parents want me to become a doctor but I like art", "counseling"),
+    ("What is the scope of data science in India?", "counseling"),
+    ("Which stream should I choose after class 10?", "counseling"),
+    ("I like biology but I'm scared of NEET", "counseling"),
+    ("How much do software engineers earn?", "counseling"),
+    ("I'm interested in psychology and helping people", "counseling"),
+    ("Is it too late to switch to computer science?", "counseling"),
+    ("I love drawing and designing posters", "counseling"),
+    ("What entrance exams are there for law?", "counseling"),
+    ("I get stressed during exams, what should I do?", "counseling"),
+    ("Should I do an MBA after engineering?", "counseling"),
+    ("I want to work abroad someday", "counseling"),
+    ("I'm good at talking to people and organizing events", "counseling"),
+    ("What's the difference between BCA and BTech?", "counseling"),
+    ("I want a job with good work life balance", "counseling"),
+    ("Tell me more about careers in finance", "counseling"),
+    ("I'm worried I'm not smart enough for IIT", "counseling"),
+    ("Physics is my favourite subject", "counseling"),
+    ("What does a product manager do every day?", "counseling"),
+]
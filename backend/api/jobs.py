@@ -0,0 +1,442 @@
+import copy
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .history import build_history_text, record_message
+from .intent import classify_intent
+from .llm_engine import generate_career_roadmap, generate_welcome_message, refresh_roadmap
+from .models import BackgroundJob, ChatMessage, UserSession
+from .resume_store import store_resume
+from .roadmap_templates import roadmap_from_template
+from .vector_store import build_resume_index
+
+# A minimal DB-backed job queue. Web requests enqueue rows; `manage.py run_jobs`
+# claims and runs them. Claiming is a conditional UPDATE, so any number of
+# workers can poll the same table without running a job twice. A session has
+# at most one active welcome, roadmap or draft job (a partial unique index),
+# so a second request for the same generation joins the one in flight.
+# The worker is optional: jobs it doesn't claim in time are run in a thread
+# of the web process that next serves the session (see run_unclaimed_jobs).
+
+# How often wait_for_job re-reads a job's status
+JOB_WAIT_POLL_SECONDS = 0.25
+
+
+# --- Queue Operations ---
+def enqueue_job(session, kind, payload=None):
+    """
+    Queues a job of the given kind for a session, with an optional JSON
+    `payload`, and returns it. If the session already has one queued or
+    running, that job is returned instead.
+    """
+    try:
+        with transaction.atomic():
+            return BackgroundJob.objects.create(session=session, kind=kind, payload=payload)
+    except IntegrityError:
+        active = active_job(session, kind)
+        if active is None:
+            # It finished between the insert and the lookup
+            return BackgroundJob.objects.create(session=session, kind=kind, payload=payload)
+        return active
+
+
+def supersede_pending_jobs(session, kind):
+    """
+    Fails the session's queued jobs of a kind that a newer one replaces.
+    Jobs already running are left to notice on their own.
+    """
+    superseded = 0
+    for job in BackgroundJob.objects.filter(session=session, kind=kind, status='pending'):
+        # One at a time, so a job a worker claims meanwhile keeps its file
+        if BackgroundJob.objects.filter(pk=job.pk, status='pending').update(
+            status='failed', error='Superseded by a newer job.', finished_at=timezone.now(),
+        ):
+            _release_payload(job)
+            superseded += 1
+    return superseded
+
+
+def _release_payload(job):
+    """
+    Deletes the stored file a finished job's payload points to, if any, and
+    clears the payload.
+    """
+    if isinstance(job.payload, dict) and job.payload.get('path'):
+        default_storage.delete(job.payload['path'])
+    if job.payload is not None:
+        job.payload = None
+        BackgroundJob.objects.filter(pk=job.pk).update(payload=None)
+
+
+def latest_job(session, kind):
+    return BackgroundJob.objects.filter(session=session, kind=kind).order_by('-created_at').first()
+
+
+def active_job(session, kind):
+    return BackgroundJob.objects.filter(session=session, kind=kind, status__in=('pending', 'running')).first()
+
+
+def wait_for_job(job, timeout):
+    """
+    Waits up to `timeout` seconds for another worker's job to leave the
+    running state and returns its status then.
+    """
+    deadline = time.monotonic() + timeout
+    job.refresh_from_db(fields=['status', 'progress', 'started_at'])
+    while job.status == 'running' and time.monotonic() < deadline:
+        time.sleep(JOB_WAIT_POLL_SECONDS)
+        job.refresh_from_db(fields=['status', 'progress', 'started_at'])
+    return job.status
+
+
+def claim_next_job(kinds=None):
+    """
+    Claims the oldest runnable job and marks it running. Jobs left running past
+    the lease (e.g. by a crashed worker) are runnable again.
+    Returns None when the queue is empty.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    runnable = BackgroundJob.objects.filter(
+        Q(status='pending') | Q(status='running', started_at__lt=stale_before)
+    )
+    if kinds:
+        runnable = runnable.filter(kind__in=kinds)
+
+    for job in runnable.order_by('created_at')[:10]:
+        if claim_job(job, now):
+            return job
+    return None
+
+
+def claim_job(job, now=None):
+    """
+    Atomically moves a specific job to running. Returns False if another
+    worker (or request) got there first.
+    """
+    now = now or timezone.now()
+    claimed = BackgroundJob.objects.filter(
+        pk=job.pk, status=job.status, started_at=job.started_at
+    ).update(status='running', started_at=now, attempts=F('attempts') + 1)
+    if claimed:
+        job.refresh_from_db(fields=['status', 'started_at', 'attempts', 'progress', 'error'])
+    return bool(claimed)
+
+
+# --- In-Process Fallback ---
+# Jobs the web process stands in for, and the session field tracking each
+POLLED_JOB_STATUSES = {
+    'roadmap': 'roadmap_status', 'resume': 'resume_status', 'roadmap_draft': 'roadmap_draft_status',
+}
+# Jobs a client is waiting on from the start, run without giving a worker
+# JOB_INLINE_AFTER_SECONDS to claim them first
+IMMEDIATE_JOB_KINDS = ('welcome',)
+
+
+def _run_in_thread(job):
+    try:
+        run_job(job)
+    finally:
+        connections.close_all()
+
+
+def run_unclaimed_jobs(session):
+    """
+    Runs the session's welcome, roadmap, draft and resume jobs in a background
+    thread of this process if no worker has claimed them within
+    JOB_INLINE_AFTER_SECONDS (or has let their lease run out). Never waits
+    for them. Returns the jobs started here.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    kinds = [
+        kind for kind, status_field in POLLED_JOB_STATUSES.items()
+        if getattr(session, status_field) in ('pending', 'running')
+    ]
+    if session.message_count == 0:
+        # The welcome message is the first one, so only empty sessions can be waiting on it
+        kinds.append('welcome')
+    started = []
+    for kind in kinds:
+        waited_since = now if kind in IMMEDIATE_JOB_KINDS else now - timedelta(seconds=settings.JOB_INLINE_AFTER_SECONDS)
+        job = BackgroundJob.objects.filter(
+            Q(status='pending', created_at__lte=waited_since) | Q(status='running', started_at__lt=stale_before),
+            session=session, kind=kind,
+        ).first()
+        if job is not None and claim_job(job, now):
+            print(f"No worker claimed {kind} job {job.job_id}, running it in the web process")
+            threading.Thread(target=_run_in_thread, args=(job,), daemon=True).start()
+            started.append(job)
+    return started
+
+
+def claim_roadmap(session, roadmap_data=None, source=None):
+    """
+    Marks the session's roadmap as pending, or as done with `roadmap_data`
+    (which came from `source`), unless it already has one or one is being
+    generated. This is a conditional UPDATE, so of several concurrent
+    requests exactly one wins; the others get False and must not queue
+    another generation.
+    """
+    if roadmap_data is not None:
+        fields = {'roadmap_data': roadmap_data, 'roadmap_status': 'done', 'roadmap_source': source}
+    else:
+        fields = {'roadmap_status': 'pending'}
+    claimed = UserSession.objects.filter(
+        Q(roadmap_status__isnull=True) | Q(roadmap_status='failed'), pk=session.pk, roadmap_data__isnull=True,
+    ).update(updated_at=timezone.now(), **fields)
+    if claimed:
+        for name, value in fields.items():
+            setattr(session, name, value)
+    return bool(claimed)
+
+
+def set_progress(job, progress):
+    job.progress = progress
+    BackgroundJob.objects.filter(pk=job.pk).update(progress=progress)
+
+
+def _finish(job, status, error=''):
+    job.status = status
+    job.error = error
+    job.finished_at = timezone.now()
+    if status == 'done':
+        job.progress = 100
+    job.save(update_fields=['status', 'error', 'finished_at', 'progress'])
+    _release_payload(job)
+
+
+def run_job(job):
+    """
+    Runs a claimed job. Failures are retried until JOB_MAX_ATTEMPTS is reached.
+    """
+    handler = JOB_HANDLERS[job.kind]
+    try:
+        handler(job)
+    except Exception as e:
+        print(f"Job {job.job_id} ({job.kind}) failed: {e}")
+        if job.attempts < settings.JOB_MAX_ATTEMPTS:
+            job.status = 'pending'
+            job.error = str(e)
+            job.save(update_fields=['status', 'error'])
+        else:
+            _finish(job, 'failed', str(e))
+            on_failure = JOB_FAILURE_HANDLERS.get(job.kind)
+            if on_failure:
+                on_failure(job)
+        return False
+    _finish(job, 'done')
+    return True
+
+
+# --- Roadmap Drafts ---
+# Once a session passes ROADMAP_DRAFT_AT messages, a 'roadmap_draft' job
+# builds the roadmap ahead of time. When the roadmap is triggered, the draft
+# is served as is if nothing new was said since (see draft_is_current), or
+# refreshed with just the newer messages.
+# User messages that carry nothing for the roadmap
+NO_NEW_INFO_INTENTS = ('small_talk', 'roadmap')
+
+
+def roadmap_draft_due(session, previous_count):
+    """
+    True when the turn that took the session from `previous_count` to its
+    current message_count crossed ROADMAP_DRAFT_AT. Counts only go up, so
+    this fires once per session.
+    """
+    draft_at = settings.ROADMAP_DRAFT_AT
+    return (
+        bool(draft_at) and previous_count < draft_at <= session.message_count
+        and not session.roadmap_data and not session.roadmap_status
+    )
+
+
+def queue_roadmap_draft(session):
+    enqueue_job(session, 'roadmap_draft')
+    session.roadmap_draft_status = 'pending'
+    UserSession.objects.filter(pk=session.pk).update(roadmap_draft_status='pending')
+
+
+def _user_messages_since_draft(session):
+    return list(ChatMessage.objects.filter(
+        session=session, sender='user', timestamp__gt=session.roadmap_draft_until,
+    ).order_by('timestamp').values_list('message', flat=True))
+
+
+def draft_is_current(session, pending_messages=()):
+    """
+    True if the session has a draft roadmap and no user message since it was
+    built (including `pending_messages`, not saved yet) adds anything to it.
+    """
+    if not session.roadmap_draft:
+        return False
+    messages = _user_messages_since_draft(session) + list(pending_messages)
+    # Low-confidence messages come back as counseling, i.e. as new information
+    return all(classify_intent(message, record=False) in NO_NEW_INFO_INTENTS for message in messages)
+
+
+def _wait_for_draft(session):
+    """
+    Lets a draft job that is already running finish instead of generating
+    the roadmap a second time next to it. Gives up after half the lease, so
+    a stuck draft can't use up the roadmap job's own lease. A draft nobody
+    has started yet is dropped: the roadmap job does its work now.
+    """
+    if supersede_pending_jobs(session, 'roadmap_draft'):
+        UserSession.objects.filter(pk=session.pk, roadmap_draft_status='pending').update(roadmap_draft_status='failed')
+    draft_job = active_job(session, 'roadmap_draft')
+    if draft_job is not None and draft_job.status == 'running':
+        print(f"Waiting for the roadmap draft of {session.session_id} already in progress")
+        wait_for_job(draft_job, settings.JOB_LEASE_SECONDS / 2)
+        session.refresh_from_db(fields=['roadmap_draft', 'roadmap_draft_until'])
+
+
+def roadmap_from_draft(session):
+    """
+    Returns the session's draft roadmap brought up to date with the messages
+    since it was built, or None if there is no usable draft.
+    """
+    if not session.roadmap_draft:
+        return None
+    if draft_is_current(session):
+        return session.roadmap_draft
+    new_messages = _user_messages_since_draft(session)
+    return refresh_roadmap(copy.deepcopy(session.roadmap_draft), "\n".join(f"Student: {text}" for text in new_messages))
+
+
+# --- Job Handlers ---
+def _generate_roadmap(job, session, history_text):
+    """
+    Returns (roadmap, source) for the conversation so far. Common school
+    profiles are answered from the template store without an LLM call.
+    """
+    roadmap_json = roadmap_from_template(session, history_text)
+    if roadmap_json is not None:
+        return roadmap_json, 'template'
+    roadmap_json = generate_career_roadmap(session, history_text, on_progress=lambda p: set_progress(job, p))
+    if 'error' in roadmap_json:
+        raise ValueError(roadmap_json['error'])
+    return roadmap_json, 'llm'
+
+
+def _save_roadmap(session, roadmap_json, source):
+    session.roadmap_data = roadmap_json
+    session.roadmap_source = source
+    session.roadmap_status = 'done'
+    session.save(update_fields=['roadmap_data', 'roadmap_source', 'roadmap_status', 'updated_at'])
+
+
+def run_roadmap_job(job):
+    session = job.session
+    session.roadmap_status = 'running'
+    session.save(update_fields=['roadmap_status', 'updated_at'])
+
+    # A draft built near the message limit only needs the latest turns folded in
+    _wait_for_draft(session)
+    roadmap_json = roadmap_from_draft(session)
+    if roadmap_json is not None:
+        _save_roadmap(session, roadmap_json, session.roadmap_draft_source)
+        return
+
+    history_text = build_history_text(session)
+    set_progress(job, 10)
+    roadmap_json, source = _generate_roadmap(job, session, history_text)
+    _save_roadmap(session, roadmap_json, source)
+
+
+def run_roadmap_draft_job(job):
+    session = job.session
+    # Nothing to do if the real roadmap got there first
+    if session.roadmap_data or session.roadmap_status:
+        return
+    session.roadmap_draft_status = 'running'
+    session.save(update_fields=['roadmap_draft_status', 'updated_at'])
+
+    last_message = ChatMessage.objects.filter(session=session).order_by('-timestamp').values_list('timestamp', flat=True).first()
+    history_text = build_history_text(session, until=last_message)
+    session.roadmap_draft, session.roadmap_draft_source = _generate_roadmap(job, session, history_text)
+    session.roadmap_draft_until = last_message
+    session.roadmap_draft_status = 'done'
+    session.save(update_fields=[
+        'roadmap_draft', 'roadmap_draft_until', 'roadmap_draft_source', 'roadmap_draft_status', 'updated_at',
+    ])
+
+
+def run_welcome_job(job):
+    session = job.session
+    welcome_message = generate_welcome_message(session)
+    record_message(session, 'ai', welcome_message)
+
+
+def run_resume_job(job):
+    session = job.session
+    # Uploads are stored for the job under payload['path']; jobs from before
+    # that point at the session's saved file
+    if job.payload:
+        source, resume_hash = default_storage.open(job.payload['path'], 'rb'), job.payload['hash']
+    else:
+        source, resume_hash = session.resume_file.open('rb'), session.resume_hash
+    with source:
+        _parse_resume(job, session, resume_hash, source)
+
+
+def _parse_resume(job, session, resume_hash, source):
+    # A newer upload can replace this one at any point (its own job parses
+    # it), so every write is conditional on the session still having this file
+    current = UserSession.objects.filter(pk=session.pk, resume_hash=resume_hash)
+    if not current.update(resume_status='running', updated_at=timezone.now()):
+        print(f"Resume job {job.job_id} was superseded by a newer upload")
+        return
+
+    if not store_resume(session, resume_hash, source):
+        if not current.exists():
+            print(f"Resume job {job.job_id} was superseded by a newer upload")
+            return
+        raise ValueError("No text could be extracted from the resume.")
+    set_progress(job, 80)
+    build_resume_index(session)
+
+    current.update(resume_status='done', updated_at=timezone.now())
+
+
+def fail_roadmap_job(job):
+    session = job.session
+    session.roadmap_status = 'failed'
+    session.save(update_fields=['roadmap_status', 'updated_at'])
+
+
+def fail_roadmap_draft_job(job):
+    # The roadmap is generated from scratch instead
+    session = job.session
+    session.roadmap_draft_status = 'failed'
+    session.save(update_fields=['roadmap_draft_status', 'updated_at'])
+
+
+def fail_resume_job(job):
+    # Leave the status to a newer upload's job, if there is one
+    session = job.session
+    if active_job(session, 'resume') is None:
+        UserSession.objects.filter(pk=session.pk, resume_status__in=('pending', 'running')).update(
+            resume_status='failed', updated_at=timezone.now(),
+        )
+
+
+JOB_HANDLERS = {
+    'roadmap': run_roadmap_job,
+    'welcome': run_welcome_job,
+    'resume': run_resume_job,
+    'roadmap_draft': run_roadmap_draft_job,
+}
+
+JOB_FAILURE_HANDLERS = {
+    'roadmap': fail_roadmap_job,
+    'resume': fail_resume_job,
+    'roadmap_draft': fail_roadmap_draft_job,
+}
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import threading
+import time
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+
+# Two-tier cache for LLM replies to identical requests. An in-process LRU with
+# TTL answers repeats without any I/O; Django's cache framework (configured by
+# CACHE_URL, e.g. Redis) shares entries across workers. Call sites opt in: only
+# prompts that are deterministic enough to repeat are worth caching.
+# Entries are stored as (stored_at, reply), so hits can report their age.
+
+# Seconds; how old a reply is when it is served from the cache
+AGE_BUCKETS = (60, 300, 900, 3600, 4 * 3600, 12 * 3600, 24 * 3600)
+
+_memory = TTLCache(maxsize=settings.LLM_CACHE_MAX_ENTRIES, ttl=settings.LLM_CACHE_TTL)
+_lock = threading.Lock()
+_stats = {'memory_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+
+def _shared_cache():
+    return caches[settings.LLM_CACHE_ALIAS]
+
+
+def make_key(model, messages, **params):
+    """
+    Returns a cache key derived from the model, sampling parameters and prompt.
+    """
+    payload = json.dumps({'model': model, 'messages': messages, 'params': params}, sort_keys=True)
+    return 'llm:' + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _count(stat):
+    with _lock:
+        _stats[stat] += 1
+
+
+def _hit(tier, entry):
+    # Shared entries written before ages were recorded are bare replies
+    stored_at, value = entry if isinstance(entry, tuple) else (None, entry)
+    _count(f'{tier}_hits')
+    if stored_at is not None:
+        metrics.observe('llm_cache_hit_age_seconds', time.time() - stored_at, buckets=AGE_BUCKETS, tier=tier)
+    return value
+
+
+def _remember(key, entry):
+    with _lock:
+        _memory[key] = entry
+
+
+def get_cached(key):
+    with _lock:
+        entry = _memory.get(key)
+    if entry is not None:
+        return _hit('memory', entry)
+
+    entry = _shared_cache().get(key)
+    if entry is not None:
+        _remember(key, entry)
+        return _hit('shared', entry)
+
+    _count('misses')
+    return None
+
+
+def store_cached(key, value):
+    entry = (time.time(), value)
+    _remember(key, entry)
+    _shared_cache().set(key, entry, timeout=settings.LLM_CACHE_TTL)
+
+
+async def aget_cached(key):
+    with _lock:
+        entry = _memory.get(key)
+    if entry is not None:
+        return _hit('memory', entry)
+
+    entry = await _shared_cache().aget(key)
+    if entry is not None:
+        _remember(key, entry)
+        return _hit('shared', entry)
+
+    _count('misses')
+    return None
+
+
+async def astore_cached(key, value):
+    entry = (time.time(), value)
+    _remember(key, entry)
+    await _shared_cache().aset(key, entry, timeout=settings.LLM_CACHE_TTL)
+
+
+def cache_stats():
+    """
+    Returns hit/miss counters and the hit rate for this process.
+    """
+    with _lock:
+        stats = dict(_stats)
+        stats['memory_entries'] = len(_memory)
+    lookups = stats['memory_hits'] + stats['shared_hits'] + stats['misses']
+    stats['hit_rate'] = (stats['memory_hits'] + stats['shared_hits']) / lookups if lookups else 0.0
+    return stats
@@ -1,86 +1,131 @@
-import json
-import re
-from django.conf import settings
-from groq import Groq
+import logging
 
-# LangChain components for document processing
-from langchain_community.document_loaders import PyPDFLoader
+from django.conf import settings
 
 # Local module import
-from .youtube import get_youtube_courses
+from . import llm_cache
+from .llm_gateway import get_router
+from .metrics import span
+from .resume_profile import format_resume_profile
+from .roadmap_schema import parse_roadmap, repair_json
+from .vector_store import get_resume_index
+from .youtube import get_youtube_courses_bulk, normalize_skill
 
 # --- Initialization ---
+logger = logging.getLogger(__name__)
+
+# All LLM traffic goes through the shared router, which picks a provider per
+# task ("chat", "roadmap", "resume") and handles pooling, timeouts, retries,
+# rate limiting and failover; see llm_gateway.py.
+
+
+# --- Completion Helpers ---
+def _complete(prompt: str, max_tokens: int, temperature: float, task: str = "chat", json_mode: bool = False,
+              cache: bool = False, cache_if=None):
+    """
+    Runs a single-prompt chat completion on the `task` route and returns the reply text.
+    json_mode asks the provider for a syntactically valid JSON object.
+    With cache=True, identical requests are answered from the response cache;
+    `cache_if` can veto storing a reply (e.g. one that failed to parse).
+    """
+    messages = [{"role": "user", "content": prompt}]
+    params = {"max_tokens": max_tokens, "temperature": temperature}
+    if json_mode:
+        params["response_format"] = {"type": "json_object"}
 
-# Groq client for fast LLM inference
-client = Groq(api_key=settings.GROQ_API_KEY)
+    cache_key = None
+    if cache:
+        cache_key = llm_cache.make_key(get_router().cache_namespace(task), messages, **params)
+        cached = llm_cache.get_cached(cache_key)
+        if cached is not None:
+            return cached
 
-# Embeddings model provided by Cohere.
-# This is a free, API-based service. Make sure you have set your COHERE_API_KEY.
+    with span(f"llm.{task}"):
+        chat_completion = get_router().create(task, messages=messages, **params)
+    content = chat_completion.choices[0].message.content
 
+    if cache_key and content and (cache_if is None or cache_if(content)):
+        llm_cache.store_cached(cache_key, content)
+    return content
 
 
-# --- Resume Processing Function ---
-def process_resume(file_path: str):
+async def _acomplete(prompt: str, max_tokens: int, temperature: float, task: str = "chat", json_mode: bool = False,
+                     cache: bool = False, cache_if=None):
     """
-    Reads a resume file (PDF) and returns the text content.
-    No embeddings needed - Groq will analyze the full text.
+    Async version of _complete.
     """
-    if not file_path:
+    messages = [{"role": "user", "content": prompt}]
+    params = {"max_tokens": max_tokens, "temperature": temperature}
+    if json_mode:
+        params["response_format"] = {"type": "json_object"}
+
+    cache_key = None
+    if cache:
+        cache_key = llm_cache.make_key(get_router().cache_namespace(task), messages, **params)
+        cached = await llm_cache.aget_cached(cache_key)
+        if cached is not None:
+            return cached
+
+    with span(f"llm.{task}"):
+        chat_completion = await get_router().acreate(task, messages=messages, **params)
+    content = chat_completion.choices[0].message.content
+
+    if cache_key and content and (cache_if is None or cache_if(content)):
+        await llm_cache.astore_cached(cache_key, content)
+    return content
+
+
+# --- Resume Retrieval ---
+@span("resume.search")
+def get_relevant_resume_context(resume_index, user_query: str, k: int = 2):
+    """
+    Retrieves the resume chunks most relevant to the query from the session's local index.
+    Returns None when there is no resume or nothing matches.
+    """
+    if resume_index is None:
         return None
-    try:
-        loader = PyPDFLoader(file_path)
-        pages = loader.load()
-        resume_text = " ".join([page.page_content for page in pages])
-        print(f"Successfully processed resume: {file_path}")
-        return resume_text  # Return raw text instead of vector store
-    except Exception as e:
-        print(f"Error processing resume file: {e}")
+    relevant_chunks = resume_index.similarity_search(user_query, k=k)
+    if not relevant_chunks:
         return None
+    return " ".join(relevant_chunks)
 
-def get_relevant_resume_context(resume_text: str, user_query: str):
-    """
-    Use Groq to extract relevant resume information based on user query
-    """
-    if not resume_text:
-        return "No resume provided for this session."
-    
-    try:
-        response = client.chat.completions.create(
-            messages=[{
-                "role": "user", 
-                "content": f"""Analyze this resume and extract information relevant to the user's question.
+# --- Main AI Function (Uses Groq) ---
+# Chat intents (see intent.py) whose turns don't need resume retrieval
+SKIP_RETRIEVAL_INTENTS = ('small_talk', 'roadmap')
 
-Resume Content:
-{resume_text[:4000]}  # Limit to avoid token limits
 
-User Question/Context: {user_query}
+def wants_resume_excerpts(resume_profile, intent):
+    """
+    Whether a chat turn also searches the resume text. With a profile, only
+    questions about the resume itself do; sessions parsed before profiles
+    existed search on every turn that can use it.
+    """
+    if resume_profile:
+        return intent == 'resume'
+    return intent not in SKIP_RETRIEVAL_INTENTS
 
-Extract and summarize only the most relevant parts of the resume that relate to the user's question. Keep it concise but informative."""
-            }],
-            model="llama-3.1-8b-instant",
-            max_tokens=800,
-            temperature=0.3
-        )
-        
-        return response.choices[0].message.content
-    except Exception as e:
-        print(f"Error getting resume context: {e}")
-        return "Could not analyze resume content."
 
-# --- Main AI Function (Uses Groq) ---
-def chat_with_ai(context: dict, message: str, history: str):
+def build_chat_prompt(context: dict, message: str, history: str):
     """
-    Generates an AI response using the Groq API.
+    Builds the counselor prompt for the next chat turn.
     """
     resume_context = "No resume has been provided for this session yet."
 
-    if context.get("resume_path"):
-        vector_store = process_resume(context["resume_path"])
-        if vector_store:
-            # Find relevant text in the resume based on the current message
-            relevant_chunks = vector_store.similarity_search(message, k=2)
-            resume_context = " ".join([chunk.page_content for chunk in relevant_chunks])
-            print("Found relevant resume context.")
+    # The structured profile stands in for the resume on most turns; the
+    # stored text is only searched when the turn needs more (see wants_resume_excerpts)
+    parts = []
+    if context.get("resume_profile"):
+        parts.append(format_resume_profile(context["resume_profile"]))
+    if wants_resume_excerpts(context.get("resume_profile"), context.get("intent")):
+        relevant_context = get_relevant_resume_context(context.get("resume_index"), message, k=2)
+        if relevant_context:
+            parts.append(f"Excerpts: {relevant_context}" if parts else relevant_context)
+            logger.debug("Found relevant resume context.")
+    if parts:
+        resume_context = " ".join(parts)
+    elif context.get("resume_status") in ("pending", "running"):
+        # Parsing happens in the background; the chat doesn't wait for it
+        resume_context = "The user has uploaded a resume and it is still being processed. Don't ask for it again."
 
     # Construct the prompt for the Groq API
     prompt = f"""
@@ -111,32 +156,108 @@ def chat_with_ai(context: dict, message: str, history: str):
 
     Your next response as the AI Counselor:
     """
+    return prompt
+
+
+def chat_with_ai(context: dict, message: str, history: str, cache: bool = False):
+    """
+    Generates an AI response on the chat route.
+    Pass cache=True for prompts that repeat across users (e.g. the welcome message).
+    """
+    prompt = build_chat_prompt(context, message, history)
 
     # Groq API call for fast text generation
-    chat_completion = client.chat.completions.create(
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
-        model="llama-3.1-8b-instant",
-        max_tokens=1000,
-        temperature=0.7
-    )
+    return _complete(prompt, max_tokens=1000, temperature=0.7, cache=cache)
+
 
-    return chat_completion.choices[0].message.content
+# The welcome prompt gives an age range rather than the exact age, so users
+# with the same name and status in the same range share a cached reply
+WELCOME_AGE_RANGES = ((14, "14 or younger"), (18, "15-18"), (22, "19-22"), (30, "23-30"))
+
+
+def age_range(age):
+    for upper, label in WELCOME_AGE_RANGES:
+        if age <= upper:
+            return label
+    return "over 30"
+
+
+def generate_welcome_message(session):
+    """
+    Generates the first AI message for a new session. The prompt only depends
+    on name, status and age range, so it is served from the response cache when possible.
+    """
+    context = { "name": session.name, "status": session.status, "age": age_range(session.age) }
+    # The initial message is a placeholder to trigger the "Phase 1" welcome logic in the LLM.
+    return chat_with_ai(context, "The user has just completed the questionnaire and joined the chat.", "", cache=True)
+
+
+def stream_chat_with_ai(context: dict, message: str, history: str):
+    """
+    Generates an AI response on the chat route, yielding text as it arrives.
+    """
+    prompt = build_chat_prompt(context, message, history)
+
+    # Timed until the stream opens; the rest depends on how fast the client reads
+    with span("llm.chat_stream"):
+        stream = get_router().create(
+            "chat",
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=1000,
+            temperature=0.7,
+            stream=True
+        )
+
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+
+# --- History Summarization (Uses Groq) ---
+def summarize_history(previous_summary: str, transcript: str):
+    """
+    Folds older conversation turns into the rolling summary used by chat prompts.
+    """
+    prompt = f"""
+    You maintain a running summary of a career counseling conversation between a user and an AI counselor.
+
+    Current summary:
+    {previous_summary or "(none yet)"}
+
+    New conversation turns to fold in:
+    {transcript}
+
+    Write an updated summary that keeps the user's background, goals, interests, concerns and any advice already given.
+    Be concise and factual. Output ONLY the summary text.
+    """
+
+    try:
+        return _complete(prompt, max_tokens=settings.HISTORY_SUMMARY_MAX_TOKENS, temperature=0.3).strip()
+    except Exception as e:
+        logger.warning("Error summarizing history: %s", e)
+        # Still keep the prompt bounded: retain roughly the newest summary-sized tail
+        combined = f"{previous_summary}\n{transcript}".strip()
+        return combined[-settings.HISTORY_SUMMARY_MAX_TOKENS * 4:]
 
 
 # --- Roadmap Generation (Uses Groq) ---
-def generate_career_roadmap(session, history_text):
+def build_roadmap_prompt(session, history_text):
     """
-    Generates a career roadmap using the Groq API.
+    Builds the JSON roadmap prompt for the session's status.
     """
     resume_context = "No resume provided for this session."
-    if session.resume_file and hasattr(session.resume_file, 'path'):
-        vector_store = process_resume(session.resume_file.path)
-        if vector_store:
-            # Find relevant text in the resume based on the entire conversation
-            relevant_chunks = vector_store.similarity_search(history_text, k=3)
-            resume_context = " ".join([chunk.page_content for chunk in relevant_chunks])
+    if session.resume_profile:
+        resume_context = format_resume_profile(session.resume_profile)
+    else:
+        # Resumes parsed before profiles existed: find relevant text based on the entire conversation
+        relevant_context = get_relevant_resume_context(get_resume_index(session), history_text, k=3)
+        if relevant_context:
+            resume_context = relevant_context
 
     if session.status == 'school_student':
         prompt = f"""
@@ -164,47 +285,165 @@ def generate_career_roadmap(session, history_text):
         - The "courses_to_find" value MUST be a list of 2-3 strings.
         - Each string MUST be a specific, searchable skill or course name (e.g., "User Interface Design", "UX Research Methods").
         """
+    return prompt
 
-    # Groq API call for structured JSON generation
-    chat_completion = client.chat.completions.create(
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
-        model="llama-3.1-8b-instant",
-        max_tokens=1500,
-        temperature=0.3
-    )
 
+def _is_roadmap_json(llm_output_text: str, status: str):
     try:
-        llm_output_text = chat_completion.choices[0].message.content.strip()
-        print("--- LLM Roadmap Response ---")
-        print(llm_output_text)
-        print("--------------------------")
-
-        data = None
-        json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', llm_output_text, re.DOTALL)
-
-        if json_match:
-            json_string = json_match.group(1)
-            data = json.loads(json_string)
-        elif llm_output_text.startswith('{') and llm_output_text.endswith('}'):
-            data = json.loads(llm_output_text)
-        else:
-            raise ValueError("Could not find or parse a valid JSON object in the AI's response.")
-
-        if session.status != 'school_student' and 'roadmap' in data:
-            for pathway in data['roadmap']:
-                verified_courses = []
-                if 'courses_to_find' in pathway:
-                    for skill_to_find in pathway['courses_to_find']:
-                        courses = get_youtube_courses(skill_to_find, max_results=1)
-                        if courses:
-                            verified_courses.append(courses[0])
-                pathway['courses'] = verified_courses
-                del pathway['courses_to_find']
+        parse_roadmap(llm_output_text, status)
+        return True
+    except ValueError:
+        return False
+
+
+def _needs_courses(session, data):
+    return session.status != 'school_student' and 'roadmap' in data
+
+
+@span("youtube.courses")
+def attach_roadmap_courses(data):
+    """
+    Replaces each pathway's "courses_to_find" with verified YouTube courses.
+    All lookups for the roadmap run in parallel.
+    """
+    skills = [skill for pathway in data['roadmap'] for skill in pathway.get('courses_to_find', [])]
+    courses_by_skill = get_youtube_courses_bulk(skills, max_results=1)
+    for pathway in data['roadmap']:
+        verified_courses = []
+        for skill_to_find in pathway.get('courses_to_find', []):
+            courses = courses_by_skill.get(normalize_skill(skill_to_find))
+            if courses:
+                verified_courses.append(courses[0])
+        pathway['courses'] = verified_courses
+        pathway.pop('courses_to_find', None)
+    return data
+
+
+def generate_career_roadmap(session, history_text, on_progress=None):
+    """
+    Generates a career roadmap on the roadmap route.
+    `on_progress`, if given, is called with a rough completion percentage.
+    """
+    prompt = build_roadmap_prompt(session, history_text)
+
+    # Groq API call for structured JSON generation
+    llm_output_text = _complete(prompt, max_tokens=1500, temperature=0.3, task="roadmap", json_mode=True,
+                                cache=True, cache_if=lambda text: _is_roadmap_json(text, session.status))
+
+    if on_progress:
+        on_progress(60)
 
+    # Raw model output can quote the conversation, so it is only logged at debug level
+    logger.debug("LLM roadmap response: %s", llm_output_text)
+
+    try:
+        data = parse_roadmap(llm_output_text, session.status)
+        if _needs_courses(session, data):
+            attach_roadmap_courses(data)
+            if on_progress:
+                on_progress(90)
         return data
 
-    except (json.JSONDecodeError, TypeError, KeyError, ValueError) as e:
-        print(f"Error processing roadmap: {e}")
-        return {"error": "Failed to decode or process the roadmap from AI response."}
\ No newline at end of file
+    except (TypeError, KeyError, ValueError, AttributeError) as e:
+        logger.warning("Error processing roadmap: %s", e)
+        return {"error": "Failed to decode or process the roadmap from AI response."}
+
+
+def personalize_roadmap(roadmap, history_text):
+    """
+    Rewrites the "reasoning" of a template roadmap for this conversation. The
+    prompt and output are small; the roadmap is returned unchanged if the
+    pass fails.
+    """
+    titles = [pathway["title"] for pathway in roadmap["roadmap"]]
+    prompt = f"""
+    You are a JSON generation assistant. A student had this conversation with a career counselor:
+    ---
+    {history_text[-3000:]}
+    ---
+    These academic fields were chosen for the student: {", ".join(titles)}.
+    For each field, in the same order, write one or two sentences on why it suits this student.
+    Respond with ONLY a JSON object of the form {{"reasoning": ["...", "..."]}}.
+    """
+
+    try:
+        llm_output_text = _complete(prompt, max_tokens=300, temperature=0.3, task="roadmap", json_mode=True)
+        reasons = repair_json(llm_output_text)["reasoning"]
+        if len(reasons) == len(titles):
+            for pathway, reasoning in zip(roadmap["roadmap"], reasons):
+                pathway["reasoning"] = str(reasoning)
+    except Exception as e:
+        logger.warning("Error personalizing roadmap template: %s", e)
+    return roadmap
+
+
+def refresh_roadmap(roadmap, new_messages_text):
+    """
+    Updates a draft roadmap with what the student said after it was built.
+    Only the reasoning is rewritten, so skills and courses are kept. Returns
+    None if the new messages rule the draft's fields out (the caller then
+    generates a fresh roadmap), or the draft unchanged if the pass fails.
+    """
+    pathways = "\n".join(f"- {pathway['title']}: {pathway.get('reasoning', '')}" for pathway in roadmap["roadmap"])
+    prompt = f"""
+    You are a JSON generation assistant. These academic fields, with the reasons they suit the student, were chosen from a conversation with a career counselor:
+    {pathways}
+    Since then, the student has said:
+    ---
+    {new_messages_text[-3000:]}
+    ---
+    If these messages make any of the fields clearly unsuitable, set "still_fits" to false.
+    Otherwise set it to true and, for each field in the same order, rewrite the reason in one or two sentences, taking the new messages into account.
+    Respond with ONLY a JSON object of the form {{"still_fits": true, "reasoning": ["...", "..."]}}.
+    """
+
+    try:
+        llm_output_text = _complete(prompt, max_tokens=300, temperature=0.3, task="roadmap", json_mode=True)
+        data = repair_json(llm_output_text)
+        if data["still_fits"] is False:
+            return None
+        reasons = data["reasoning"]
+        if len(reasons) == len(roadmap["roadmap"]):
+            for pathway, reasoning in zip(roadmap["roadmap"], reasons):
+                pathway["reasoning"] = str(reasoning)
+    except Exception as e:
+        logger.warning("Error refreshing roadmap draft: %s", e)
+    return roadmap
+
+
+# --- Async Variants (ASGI) ---
+# These mirror the functions above on the async clients so an ASGI worker
+# can keep many LLM round-trips in flight without pinning a thread per request.
+async def achat_with_ai(context: dict, message: str, history: str, cache: bool = False):
+    """
+    Async version of chat_with_ai.
+    """
+    prompt = build_chat_prompt(context, message, history)
+
+    return await _acomplete(prompt, max_tokens=1000, temperature=0.7, cache=cache)
+
+
+async def astream_chat_with_ai(context: dict, message: str, history: str):
+    """
+    Async version of stream_chat_with_ai.
+    """
+    prompt = build_chat_prompt(context, message, history)
+
+    with span("llm.chat_stream"):
+        stream = await get_router().acreate(
+            "chat",
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=1000,
+            temperature=0.7,
+            stream=True
+        )
+
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
@@ -0,0 +1,635 @@
+import asyncio
+import importlib
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from django.conf import settings
+from tenacity import AsyncRetrying, Retrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+from . import metrics
+
+# Shared layer for every LLM call. Each provider/model pair gets a gateway that
+# owns its pooled HTTP clients and adds per-call timeouts, jittered retries on
+# transient errors, and token buckets that keep us inside the provider's
+# request/token-per-minute quota, so bursts queue briefly instead of turning
+# into 429s. The router on top sends each task (chat, roadmap, resume) to the
+# fastest healthy gateway on its route and fails over down the route.
+
+# Provider SDKs are imported when their first gateway is built (see the
+# registry under Construction); openai alone adds ~0.3s and tens of MB to a
+# worker, and most deployments use a single provider.
+
+
+class LLMUnavailable(Exception):
+    """
+    Raised when an LLM call cannot be completed within the retry and rate-limit budget.
+    """
+
+
+# --- Rate Limiting ---
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `per_minute` units per minute.
+    Callers reserve units up front and sleep off any deficit, so waiters are
+    served in arrival order.
+    """
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount, max_wait):
+        """
+        Takes `amount` units and returns how long to wait before using them.
+        Raises LLMUnavailable (taking nothing) if that would exceed `max_wait`.
+        """
+        amount = min(amount, self.capacity)
+        with self.lock:
+            self._refill()
+            wait = max(0.0, (amount - self.tokens) / self.rate)
+            if wait > max_wait:
+                raise LLMUnavailable(f"Rate limit wait of {wait:.1f}s exceeds {max_wait:.1f}s")
+            self.tokens -= amount
+        return wait
+
+    def acquire(self, amount, max_wait):
+        wait = self.reserve(amount, max_wait)
+        if wait:
+            time.sleep(wait)
+
+    async def aacquire(self, amount, max_wait):
+        wait = self.reserve(amount, max_wait)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def charge(self, amount):
+        """
+        Deducts units after the fact (e.g. completion tokens); may go into debt.
+        """
+        with self.lock:
+            self._refill()
+            self.tokens -= amount
+
+
+def estimate_tokens(messages):
+    return sum(len(message.get("content", "")) for message in messages) // 4 + 1
+
+
+def _retry_wait(retry_state):
+    # Honour the provider's Retry-After on 429s, otherwise jittered exponential backoff
+    wait = wait_random_exponential(multiplier=0.5, max=8)(retry_state)
+    error = retry_state.outcome.exception()
+    response = getattr(error, 'response', None)
+    if response is not None:
+        try:
+            wait = max(wait, float(response.headers.get('retry-after', 0)))
+        except ValueError:
+            pass
+    return wait
+
+
+# --- Gateway ---
+class LLMGateway:
+    """
+    One provider/model pair: its clients, retry policy and rate limits.
+    Buckets are optional; providers without a published quota (e.g. a local
+    Ollama server) are not throttled.
+    """
+
+    def __init__(self, client, async_client, timeout, max_retries, request_bucket, token_bucket, max_wait,
+                 name='groq', model=None, retryable_errors=(), provider_errors=()):
+        self.client = client
+        self.async_client = async_client
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.request_bucket = request_bucket
+        self.token_bucket = token_bucket
+        self.max_wait = max_wait
+        self.name = name
+        self.model = model
+        # Errors worth retrying (rate limits, 5xx and network failures/timeouts),
+        # and those after which the router moves on to the next provider
+        self.retryable_errors = tuple(retryable_errors)
+        self.provider_errors = tuple(provider_errors)
+
+    @property
+    def key(self):
+        return f"{self.name}:{self.model}"
+
+    def _retrying(self, retrying_class, max_retries=None):
+        if max_retries is None:
+            max_retries = self.max_retries
+        return retrying_class(
+            stop=stop_after_attempt(max_retries + 1),
+            wait=_retry_wait,
+            retry=retry_if_exception_type(self.retryable_errors),
+            reraise=True,
+        )
+
+    def _acquire(self, prompt_tokens):
+        if self.request_bucket:
+            self.request_bucket.acquire(1, self.max_wait)
+        if self.token_bucket:
+            self.token_bucket.acquire(prompt_tokens, self.max_wait)
+
+    async def _aacquire(self, prompt_tokens):
+        if self.request_bucket:
+            await self.request_bucket.aacquire(1, self.max_wait)
+        if self.token_bucket:
+            await self.token_bucket.aacquire(prompt_tokens, self.max_wait)
+
+    def _charge(self, amount):
+        if self.token_bucket and amount:
+            self.token_bucket.charge(amount)
+
+    def _record_tokens(self, prompt_tokens, completion_tokens):
+        if prompt_tokens:
+            metrics.inc('llm_tokens_total', prompt_tokens, provider=self.key, type='prompt')
+        if completion_tokens:
+            metrics.inc('llm_tokens_total', completion_tokens, provider=self.key, type='completion')
+
+    def _charge_usage(self, completion):
+        usage = getattr(completion, 'usage', None)
+        if usage is not None:
+            self._charge(getattr(usage, 'completion_tokens', None))
+            self._record_tokens(getattr(usage, 'prompt_tokens', None), getattr(usage, 'completion_tokens', None))
+
+    def create(self, messages, stream=False, max_retries=None, **params):
+        """
+        Sends a chat completion request. Returns the completion, or an iterator
+        of chunks when stream=True (only opening the stream is retried).
+        """
+        params.setdefault('model', self.model)
+        prompt_tokens = estimate_tokens(messages)
+        try:
+            for attempt in self._retrying(Retrying, max_retries):
+                with attempt:
+                    self._acquire(prompt_tokens)
+                    response = self.client.chat.completions.create(
+                        messages=messages, stream=stream, timeout=self.timeout, **params
+                    )
+        except self.retryable_errors as e:
+            raise LLMUnavailable(str(e)) from e
+
+        if stream:
+            return self._metered_stream(response, prompt_tokens)
+        self._charge_usage(response)
+        return response
+
+    async def acreate(self, messages, stream=False, max_retries=None, **params):
+        """
+        Async version of create.
+        """
+        params.setdefault('model', self.model)
+        prompt_tokens = estimate_tokens(messages)
+        try:
+            async for attempt in self._retrying(AsyncRetrying, max_retries):
+                with attempt:
+                    await self._aacquire(prompt_tokens)
+                    response = await self.async_client.chat.completions.create(
+                        messages=messages, stream=stream, timeout=self.timeout, **params
+                    )
+        except self.retryable_errors as e:
+            raise LLMUnavailable(str(e)) from e
+
+        if stream:
+            return self._ametered_stream(response, prompt_tokens)
+        self._charge_usage(response)
+        return response
+
+    # Streams carry no usage, so their tokens are estimated from the text
+    def _metered_stream(self, stream, prompt_tokens):
+        chars = 0
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                chars += len(chunk.choices[0].delta.content)
+            yield chunk
+        self._charge(chars // 4)
+        self._record_tokens(prompt_tokens, chars // 4)
+
+    async def _ametered_stream(self, stream, prompt_tokens):
+        chars = 0
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                chars += len(chunk.choices[0].delta.content)
+            yield chunk
+        self._charge(chars // 4)
+        self._record_tokens(prompt_tokens, chars // 4)
+
+
+# --- Routing ---
+class ProviderStats:
+    """
+    Exponentially weighted latency and error rate for one gateway.
+    """
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.latency = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def record(self, latency, ok):
+        with self.lock:
+            self.calls += 1
+            if not ok:
+                self.failures += 1
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += self.alpha * (latency - self.latency)
+            self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+
+    def score(self, error_penalty):
+        """
+        Expected cost of a call in seconds; failures are charged as
+        `error_penalty` extra seconds each. None until the first call.
+        """
+        with self.lock:
+            if self.latency is None:
+                return None
+            return self.latency + self.error_rate * error_penalty
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'latency': self.latency,
+                'error_rate': self.error_rate,
+                'calls': self.calls,
+                'failures': self.failures,
+            }
+
+
+class LLMRouter:
+    """
+    Sends each task to the gateways configured on its route, fastest healthy
+    one first. Gateways that have not been measured yet keep their configured
+    order behind measured ones, and a small share of calls is sent to a
+    random fallback so a provider that recovers gets noticed again.
+
+    If a gateway fails, the call moves down the route; gateways other than
+    the last get only `failover_retries` retries, so a struggling provider
+    costs one short detour rather than the full backoff.
+    """
+
+    def __init__(self, routes, alpha=0.2, error_penalty=10.0, explore_rate=0.05, failover_retries=1):
+        self.routes = routes
+        self.gateways = {gateway.key: gateway for route in routes.values() for gateway in route}
+        self.stats = {key: ProviderStats(alpha) for key in self.gateways}
+        self.error_penalty = error_penalty
+        self.explore_rate = explore_rate
+        self.failover_retries = failover_retries
+
+    def cache_namespace(self, task):
+        """
+        Identifies the route's models, for keying cached replies.
+        """
+        return ",".join(gateway.key for gateway in self.routes.get(task, []))
+
+    def candidates(self, task):
+        """
+        Returns the route's gateways in the order they should be tried.
+        """
+        route = self.routes.get(task, [])
+        if len(route) <= 1:
+            return list(route)
+
+        def rank(position):
+            score = self.stats[route[position].key].score(self.error_penalty)
+            return (score is None, score or 0.0, position)
+
+        ordered = [route[position] for position in sorted(range(len(route)), key=rank)]
+        if random.random() < self.explore_rate:
+            ordered.insert(0, ordered.pop(random.randrange(1, len(ordered))))
+        return ordered
+
+    def _candidates_or_raise(self, task):
+        candidates = self.candidates(task)
+        if not candidates:
+            raise LLMUnavailable(f"No LLM providers configured for {task}")
+        return candidates
+
+    def _retries_for(self, index, candidates):
+        return None if index == len(candidates) - 1 else self.failover_retries
+
+    def create(self, task, messages, stream=False, **params):
+        """
+        Runs a completion for `task` on the best available gateway.
+        Raises LLMUnavailable once every gateway on the route has failed, or
+        if the route has none.
+        """
+        candidates = self._candidates_or_raise(task)
+        error = None
+        for index, gateway in enumerate(candidates):
+            started = time.monotonic()
+            try:
+                response = gateway.create(
+                    messages, stream=stream, max_retries=self._retries_for(index, candidates), **params
+                )
+            except (LLMUnavailable,) + gateway.provider_errors as e:
+                self.stats[gateway.key].record(time.monotonic() - started, ok=False)
+                print(f"LLM provider {gateway.key} failed for {task}: {e}")
+                error = e
+                continue
+            self.stats[gateway.key].record(time.monotonic() - started, ok=True)
+            return response
+        raise LLMUnavailable(f"All providers failed for {task}: {error}") from error
+
+    async def acreate(self, task, messages, stream=False, **params):
+        """
+        Async version of create.
+        """
+        candidates = self._candidates_or_raise(task)
+        error = None
+        for index, gateway in enumerate(candidates):
+            started = time.monotonic()
+            try:
+                response = await gateway.acreate(
+                    messages, stream=stream, max_retries=self._retries_for(index, candidates), **params
+                )
+            except (LLMUnavailable,) + gateway.provider_errors as e:
+                self.stats[gateway.key].record(time.monotonic() - started, ok=False)
+                print(f"LLM provider {gateway.key} failed for {task}: {e}")
+                error = e
+                continue
+            self.stats[gateway.key].record(time.monotonic() - started, ok=True)
+            return response
+        raise LLMUnavailable(f"All providers failed for {task}: {error}") from error
+
+    def provider_stats(self):
+        return {key: stats.snapshot() for key, stats in self.stats.items()}
+
+
+# --- Fake Backend ---
+# Stands in for the Groq client (LLM_BACKEND=fake) so the gateway and the rest
+# of the pipeline can be exercised offline with a configurable latency and
+# error profile.
+FAKE_ROADMAP_JSON = (
+    '{"roadmap": ['
+    '{"title": "Software Engineering", "skills": ["Python", "Data Structures"], "reasoning": "Strong interest in building things.",'
+    ' "courses_to_find": ["Python Programming", "Data Structures"], "salary": "6-12 LPA", "growth": "High"},'
+    '{"title": "Data Science", "skills": ["Statistics", "SQL"], "reasoning": "Enjoys working with numbers.",'
+    ' "courses_to_find": ["Statistics for Data Science", "SQL Basics"], "salary": "7-14 LPA", "growth": "High"},'
+    '{"title": "Product Design", "skills": ["Figma", "User Research"], "reasoning": "Creative and user-focused.",'
+    ' "courses_to_find": ["User Interface Design", "UX Research Methods"], "salary": "5-10 LPA", "growth": "Medium"}'
+    ']}'
+)
+
+
+class _FakeCompletions:
+    def __init__(self, latency, error_rate):
+        self.latency = latency
+        self.error_rate = error_rate
+
+    def _maybe_fail(self):
+        if random.random() < self.error_rate:
+            import groq
+            import httpx
+            request = httpx.Request('POST', 'https://fake-llm.local/chat/completions')
+            raise groq.RateLimitError(
+                "Fake rate limit", response=httpx.Response(429, request=request), body=None
+            )
+
+    def _reply(self, messages):
+        prompt = messages[-1]["content"]
+        if "JSON" in prompt:
+            return FAKE_ROADMAP_JSON
+        return "Thanks for sharing that. Could you tell me a little more about what you enjoy most?"
+
+    def _completion(self, content, messages):
+        prompt_tokens = estimate_tokens(messages)
+        completion_tokens = len(content) // 4 + 1
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens,
+            ),
+        )
+
+    @staticmethod
+    def _chunks(content):
+        for word in content.split(" "):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))])
+
+    def create(self, messages, stream=False, **params):
+        time.sleep(self.latency)
+        self._maybe_fail()
+        content = self._reply(messages)
+        if stream:
+            return self._chunks(content)
+        return self._completion(content, messages)
+
+
+class _AsyncFakeCompletions(_FakeCompletions):
+    async def create(self, messages, stream=False, **params):
+        await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        content = self._reply(messages)
+        if stream:
+            return self._achunks(content)
+        return self._completion(content, messages)
+
+    async def _achunks(self, content):
+        for chunk in self._chunks(content):
+            yield chunk
+
+
+class FakeLLM:
+    def __init__(self, latency=0.0, error_rate=0.0, is_async=False):
+        completions_class = _AsyncFakeCompletions if is_async else _FakeCompletions
+        self.chat = SimpleNamespace(completions=completions_class(latency, error_rate))
+
+
+# --- Construction ---
+DEFAULT_MODELS = {
+    'groq': 'llama-3.1-8b-instant',
+    'fake': 'fake',
+}
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def _ollama_base_url():
+    host = settings.OLLAMA_HOST
+    if '://' not in host:
+        host = f"http://{host}"
+    return host.rstrip('/') + '/v1'
+
+
+def _resolve_model(backend, model=None):
+    if model:
+        return model
+    if backend == 'ollama':
+        return settings.OLLAMA_MODEL
+    if backend == 'openai':
+        return settings.OPENAI_MODEL
+    return DEFAULT_MODELS.get(backend)
+
+
+# --- Provider Registry ---
+# Each provider maps to the SDK its errors come from and a builder for its
+# (client, async_client) pair. Both import the SDK on first use. The fake
+# backend stands in for Groq, so it raises Groq's errors.
+PROVIDER_SDKS = {
+    'groq': 'groq',
+    'openai': 'openai',
+    'ollama': 'openai',
+    'fake': 'groq',
+}
+
+
+def _http_limits():
+    import httpx
+    return httpx.Limits(
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+    )
+
+
+def _fake_clients(options):
+    return (
+        FakeLLM(options['fake_latency'], options['fake_error_rate']),
+        FakeLLM(options['fake_latency'], options['fake_error_rate'], is_async=True),
+    )
+
+
+def _groq_clients(options):
+    import groq
+    # Retries are handled by the gateway, so the SDKs' own are disabled
+    limits = _http_limits()
+    return (
+        groq.Groq(api_key=settings.GROQ_API_KEY, max_retries=0,
+                  http_client=groq.DefaultHttpxClient(limits=limits)),
+        groq.AsyncGroq(api_key=settings.GROQ_API_KEY, max_retries=0,
+                       http_client=groq.DefaultAsyncHttpxClient(limits=limits)),
+    )
+
+
+def _openai_clients(options, **client_options):
+    import openai
+    limits = _http_limits()
+    client_options = {'api_key': settings.OPENAI_API_KEY or 'unused', 'max_retries': 0, **client_options}
+    return (
+        openai.OpenAI(http_client=openai.DefaultHttpxClient(limits=limits), **client_options),
+        openai.AsyncOpenAI(http_client=openai.DefaultAsyncHttpxClient(limits=limits), **client_options),
+    )
+
+
+def _ollama_clients(options):
+    # Ollama serves an OpenAI-compatible API under /v1 and ignores the key
+    return _openai_clients(options, api_key='ollama', base_url=_ollama_base_url())
+
+
+CLIENT_BUILDERS = {
+    'groq': _groq_clients,
+    'openai': _openai_clients,
+    'ollama': _ollama_clients,
+    'fake': _fake_clients,
+}
+
+
+def _provider_errors(backend):
+    """
+    Returns (retryable errors, provider errors) from the backend's SDK.
+    """
+    sdk = importlib.import_module(PROVIDER_SDKS[backend])
+    return (sdk.RateLimitError, sdk.InternalServerError, sdk.APIConnectionError), (sdk.APIError,)
+
+
+def _build_clients(backend, options):
+    builder = CLIENT_BUILDERS.get(backend)
+    if builder is None:
+        raise ValueError(f"Unknown LLM backend: {backend}")
+    return builder(options)
+
+
+def build_gateway(backend=None, model=None, **overrides):
+    """
+    Builds a gateway from settings; keyword arguments override individual settings.
+    """
+    backend = backend or settings.LLM_BACKEND
+    model = _resolve_model(backend, model)
+
+    requests_per_minute, tokens_per_minute = settings.LLM_RATE_LIMITS.get(backend, (None, None))
+    options = {
+        'timeout': settings.LLM_TIMEOUT,
+        'max_retries': settings.LLM_MAX_RETRIES,
+        'requests_per_minute': requests_per_minute,
+        'tokens_per_minute': tokens_per_minute,
+        'max_wait': settings.LLM_RATE_LIMIT_MAX_WAIT,
+        'fake_latency': settings.FAKE_LLM_LATENCY,
+        'fake_error_rate': settings.FAKE_LLM_ERROR_RATE,
+    }
+    options.update(overrides)
+
+    client, async_client = _build_clients(backend, options)
+    retryable_errors, provider_errors = _provider_errors(backend)
+    return LLMGateway(
+        client,
+        async_client,
+        timeout=options['timeout'],
+        max_retries=options['max_retries'],
+        request_bucket=TokenBucket(options['requests_per_minute']) if options['requests_per_minute'] else None,
+        token_bucket=TokenBucket(options['tokens_per_minute']) if options['tokens_per_minute'] else None,
+        max_wait=options['max_wait'],
+        name=backend,
+        model=model,
+        retryable_errors=retryable_errors,
+        provider_errors=provider_errors,
+    )
+
+
+def build_router(routes=None, gateway_options=None, **router_options):
+    """
+    Builds a router from task -> ["provider:model", ...] routes (default
+    LLM_ROUTES). A provider/model pair shared by several routes gets one
+    gateway, so its rate limits and stats are shared too. `gateway_options`
+    maps "provider:model" keys to build_gateway overrides.
+    """
+    routes = routes or settings.LLM_ROUTES
+    options = {
+        'alpha': settings.LLM_ROUTER_EWMA_ALPHA,
+        'error_penalty': settings.LLM_ROUTER_ERROR_PENALTY,
+        'explore_rate': settings.LLM_ROUTER_EXPLORE_RATE,
+        'failover_retries': settings.LLM_FAILOVER_RETRIES,
+    }
+    options.update(router_options)
+
+    gateways = {}
+    built_routes = {}
+    for task, specs in routes.items():
+        built_routes[task] = []
+        for spec in specs:
+            backend, _, model = spec.partition(':')
+            key = f"{backend}:{_resolve_model(backend, model)}"
+            if key not in gateways:
+                gateways[key] = build_gateway(backend, model or None, **(gateway_options or {}).get(key, {}))
+            built_routes[task].append(gateways[key])
+    return LLMRouter(built_routes, **options)
+
+
+def get_router():
+    """
+    Returns the process-wide router, building it on first use.
+    """
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = build_router()
+    return _router
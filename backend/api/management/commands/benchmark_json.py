@@ -0,0 +1,81 @@
+import json
+import timeit
+import uuid
+from datetime import timedelta
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from backend.api.llm_gateway import FAKE_ROADMAP_JSON
+from backend.api.models import ChatMessage
+from backend.api.renderers import ORJSONParser, ORJSONRenderer
+from backend.api.serializers import ChatMessageSerializer
+
+
+def _history_payload(message_count):
+    # Serializer output for unsaved messages, shaped like a chat history response
+    started = timezone.now()
+    messages = [
+        ChatMessage(
+            message_id=uuid.uuid4(),
+            sender='user' if i % 2 else 'ai',
+            message="I enjoy maths and building small games, but I'm not sure which career fits. " * 3,
+            timestamp=started + timedelta(seconds=i),
+        )
+        for i in range(message_count)
+    ]
+    return {
+        'session_id': uuid.uuid4(),
+        'name': 'Asha',
+        'status': 'college_student',
+        'messages': ChatMessageSerializer(messages, many=True).data,
+    }
+
+
+def _roadmap_payload():
+    data = json.loads(FAKE_ROADMAP_JSON)
+    for pathway in data['roadmap']:
+        pathway['courses'] = [
+            {'name': f"{course} - Full Course for Beginners", 'url': 'https://www.youtube.com/watch?v=abc123'}
+            for course in pathway.pop('courses_to_find')
+        ]
+    return data
+
+
+class Command(BaseCommand):
+    help = "Compares DRF's JSON renderer/parser with the orjson ones on history and roadmap payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200, help="Messages in the history payload.")
+        parser.add_argument('--number', type=int, default=500, help="Iterations per measurement.")
+
+    def handle(self, *args, **options):
+        payloads = {
+            f"history ({options['messages']} messages)": _history_payload(options['messages']),
+            'roadmap': _roadmap_payload(),
+        }
+        number = options['number']
+        drf_renderer, fast_renderer = JSONRenderer(), ORJSONRenderer()
+        drf_parser, fast_parser = JSONParser(), ORJSONParser()
+
+        for name, payload in payloads.items():
+            drf_body = drf_renderer.render(payload)
+            fast_body = fast_renderer.render(payload)
+            if drf_parser.parse(BytesIO(drf_body)) != fast_parser.parse(BytesIO(fast_body)):
+                self.stderr.write(f"{name}: orjson output differs from DRF's")
+
+            rows = [
+                ('render', lambda: drf_renderer.render(payload), lambda: fast_renderer.render(payload)),
+                ('parse', lambda: drf_parser.parse(BytesIO(drf_body)), lambda: fast_parser.parse(BytesIO(fast_body))),
+            ]
+            self.stdout.write(f"{name}, {len(drf_body)} bytes:")
+            for label, drf_call, fast_call in rows:
+                drf_time = min(timeit.repeat(drf_call, number=number, repeat=3)) / number
+                fast_time = min(timeit.repeat(fast_call, number=number, repeat=3)) / number
+                self.stdout.write(
+                    f"  {label}: DRF {drf_time * 1e6:.1f}us, orjson {fast_time * 1e6:.1f}us "
+                    f"({drf_time / fast_time:.1f}x faster)"
+                )
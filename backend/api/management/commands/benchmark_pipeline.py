@@ -0,0 +1,313 @@
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from backend.api.jobs import claim_job, latest_job, run_job
+from backend.api.llm_cache import cache_stats
+from backend.api.llm_gateway import get_router
+from backend.api.models import UserSession
+
+STEPS = (
+    'questionnaire', 'history', 'chat', 'resume_upload', 'resume_job',
+    'roadmap_draft_job', 'roadmap_request', 'roadmap_job', 'roadmap_fetch',
+)
+# Steps that run a background job inline rather than an HTTP request
+JOB_STEPS = ('resume_job', 'roadmap_draft_job', 'roadmap_job')
+
+CHAT_MESSAGES = [
+    "I really enjoy maths and I've started building small games in Python.",
+    "I'm not sure whether to go for computer science or electronics.",
+    "My parents want me to do medicine but I don't like biology much.",
+    "I like working with people and I was class representative last year.",
+    "I'd like a job where I can keep learning new things.",
+]
+
+RESUME_LINES = [
+    "Student Resume",
+    "EDUCATION",
+    "Class 12, Science stream, 2024",
+    "PROJECTS",
+    "Built a 2D platformer game in Python with Pygame",
+    "Made a weather dashboard with JavaScript and a public API",
+    "SKILLS",
+    "Python, JavaScript, Maths, Problem Solving, Teamwork",
+]
+
+
+def _resume_pdf(lines):
+    """
+    Returns a minimal one-page PDF with `lines` as its text.
+    """
+    text = " ".join(f"({line}) '" for line in lines)
+    content = f"BT /F1 11 Tf 50 750 Td 14 TL {text} ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        "/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
+    ]
+    pdf = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return pdf.encode('latin-1')
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class _Recorder:
+    """
+    Collects (latency, queries, ok) samples per step from all worker threads.
+    """
+    def __init__(self):
+        self.samples = {step: [] for step in STEPS}
+        self._lock = threading.Lock()
+
+    def measure(self, step, call):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            try:
+                ok = call()
+            except Exception as e:
+                print(f"{step} raised: {e}")
+                ok = False
+            latency = time.perf_counter() - started
+        with self._lock:
+            self.samples[step].append((latency, len(queries.captured_queries), ok))
+        return ok
+
+    def summary(self):
+        steps = {}
+        for step, samples in self.samples.items():
+            if not samples:
+                continue
+            latencies = [latency for latency, _, _ in samples]
+            queries = [count for _, count, _ in samples]
+            steps[step] = {
+                'count': len(samples),
+                'errors': sum(1 for _, _, ok in samples if not ok),
+                'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+                'p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+                'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+                'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+                'queries_mean': round(sum(queries) / len(queries), 2),
+                'queries_max': max(queries),
+            }
+        return steps
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs end-to-end user journeys (questionnaire, chat, resume upload, roadmap) against a throwaway "
+        "database with fake LLM and YouTube backends, and reports latency, DB queries and throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help="Simulated users, each running the full journey.")
+        parser.add_argument('--concurrency', type=int, default=4, help="Users running at the same time.")
+        parser.add_argument('--turns', type=int, default=5, help="Chat turns per user before the roadmap request. Enough turns to pass ROADMAP_DRAFT_AT also build the roadmap draft.")
+        parser.add_argument('--llm-latency', type=float, default=0.2, help="Fake LLM latency in seconds.")
+        parser.add_argument('--llm-error-rate', type=float, default=0.0, help="Fraction of fake LLM calls that return a 429.")
+        parser.add_argument('--youtube-latency', type=float, default=0.1, help="Fake YouTube search latency in seconds.")
+        parser.add_argument('--youtube-error-rate', type=float, default=0.0, help="Fraction of fake YouTube searches that fail.")
+        parser.add_argument('--skip-resume', action='store_true', help="Leave the resume upload out of the journey.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+        parser.add_argument('--compare', help="Earlier JSON results to print p95 and query deltas against.")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read {options['compare']}: {e}")
+
+        workdir = tempfile.mkdtemp(prefix='benchmark-')
+        fake_backends = override_settings(
+            LLM_ROUTES={task: ['fake'] for task in ('chat', 'roadmap', 'resume')},
+            FAKE_LLM_LATENCY=options['llm_latency'],
+            FAKE_LLM_ERROR_RATE=options['llm_error_rate'],
+            YOUTUBE_BACKEND='fake',
+            FAKE_YOUTUBE_LATENCY=options['youtube_latency'],
+            FAKE_YOUTUBE_ERROR_RATE=options['youtube_error_rate'],
+            # Keep fake replies out of any shared cache the real app uses
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'}},
+            MEDIA_ROOT=os.path.join(workdir, 'media'),
+        )
+        setup_test_environment()
+        fake_backends.enable()
+        # SQLite's default test database lives in memory, which worker threads
+        # can't share safely; a file behaves like the real deployment.
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(workdir, 'benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            fake_backends.disable()
+            teardown_test_environment()
+
+        self._report(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def _run(self, options):
+        recorder = _Recorder()
+        resume_pdf = None if options['skip_resume'] else _resume_pdf(RESUME_LINES)
+
+        def journey(user):
+            client = Client()
+            try:
+                self._journey(client, recorder, user, options['turns'], resume_pdf)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(journey, range(options['users'])))
+        elapsed = time.perf_counter() - started
+
+        steps = recorder.summary()
+        total_requests = sum(step['count'] for name, step in steps.items() if name not in JOB_STEPS)
+        return {
+            'commit': _git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'options': {key: options[key] for key in (
+                'users', 'concurrency', 'turns', 'llm_latency', 'llm_error_rate',
+                'youtube_latency', 'youtube_error_rate', 'skip_resume',
+            )},
+            'database': connection.vendor,
+            'elapsed_s': round(elapsed, 3),
+            'requests': total_requests,
+            'throughput_rps': round(total_requests / elapsed, 2) if elapsed else 0.0,
+            'steps': steps,
+            'llm_cache': cache_stats(),
+            'llm_providers': get_router().provider_stats(),
+        }
+
+    def _journey(self, client, recorder, user, turns, resume_pdf):
+        session_id = None
+
+        def questionnaire():
+            nonlocal session_id
+            response = client.post(reverse('submit_questionnaire'), {
+                'status': 'school_student', 'level': 'class_12', 'field': 'science',
+                'name': f"Benchmark User {user}", 'age': 17,
+            }, content_type='application/json')
+            if response.status_code != 201:
+                return False
+            session_id = response.json()['session_id']
+            return True
+
+        def send(text):
+            return lambda: client.post(
+                reverse('send_message'), {'session_id': session_id, 'message': text}, content_type='application/json',
+            ).status_code == 201
+
+        def history():
+            return client.get(reverse('get_chat_history', args=[session_id])).status_code == 200
+
+        def resume_upload():
+            upload = SimpleUploadedFile(f"resume-{user}.pdf", resume_pdf, content_type='application/pdf')
+            return client.post(reverse('upload_resume'), {'session_id': session_id, 'resume': upload}).status_code == 200
+
+        def queued(kind):
+            job = latest_job(UserSession(session_id=session_id), kind)
+            return job if job is not None and job.status == 'pending' else None
+
+        def job(kind):
+            # Run the queued job inline, as a `run_jobs` worker would
+            def run():
+                pending = queued(kind)
+                if pending is None or not claim_job(pending):
+                    return False
+                return run_job(pending)
+            return run
+
+        def roadmap_fetch():
+            return client.get(reverse('get_roadmap', args=[session_id])).status_code == 200
+
+        if not recorder.measure('questionnaire', questionnaire):
+            return
+        recorder.measure('welcome_job', job('welcome'))
+        recorder.measure('history', history)
+        for turn in range(turns):
+            recorder.measure('chat', send(CHAT_MESSAGES[turn % len(CHAT_MESSAGES)]))
+            # Queued once the session passes ROADMAP_DRAFT_AT messages
+            if queued('roadmap_draft'):
+                recorder.measure('roadmap_draft_job', job('roadmap_draft'))
+        if resume_pdf is not None and recorder.measure('resume_upload', resume_upload):
+            recorder.measure('resume_job', job('resume'))
+        recorder.measure('roadmap_request', send("Could you make my career roadmap now?"))
+        # A current draft is served by the request itself, with no job to run
+        if queued('roadmap') is None or recorder.measure('roadmap_job', job('roadmap')):
+            recorder.measure('roadmap_fetch', roadmap_fetch)
+
+    def _report(self, results, baseline):
+        options = results['options']
+        self.stdout.write(
+            f"{options['users']} users x {options['turns']} turns, concurrency {options['concurrency']}, "
+            f"LLM {options['llm_latency'] * 1000:.0f}ms, YouTube {options['youtube_latency'] * 1000:.0f}ms "
+            f"({results['database']}, commit {results['commit'] or '-'})"
+        )
+        self.stdout.write(
+            f"{results['requests']} requests in {results['elapsed_s']:.2f}s ({results['throughput_rps']:.1f} req/s)"
+        )
+        self.stdout.write(
+            f"{'step':<16}{'count':>6}{'errors':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}"
+        )
+        previous = (baseline or {}).get('steps', {})
+        for name, step in results['steps'].items():
+            line = (
+                f"{name:<16}{step['count']:>6}{step['errors']:>7}{step['p50_ms']:>7.0f}ms{step['p95_ms']:>7.0f}ms"
+                f"{step['p99_ms']:>7.0f}ms{step['queries_mean']:>9.1f}"
+            )
+            if name in previous:
+                line += (
+                    f"   p95 {step['p95_ms'] - previous[name]['p95_ms']:+.0f}ms, "
+                    f"queries {step['queries_mean'] - previous[name]['queries_mean']:+.1f}"
+                )
+            self.stdout.write(line)
+        if baseline:
+            self.stdout.write(
+                f"throughput {results['throughput_rps'] - baseline['throughput_rps']:+.1f} req/s "
+                f"vs commit {baseline.get('commit') or '-'}"
+            )
@@ -0,0 +1,96 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules worth knowing about when they end up loaded at boot
+HEAVY_MODULES = ('groq', 'openai', 'httpx', 'googleapiclient', 'faiss', 'pypdf', 'langchain_community', 'tiktoken', 'numpy')
+
+# Runs in a fresh interpreter, doing what a web worker does before its first
+# request: build the application, then load the URLconf (and with it every
+# view module). Arguments: the server interface, then the modules to look for.
+WORKER_SCRIPT = """
+import json, sys, time
+server, heavy_modules = sys.argv[1], sys.argv[2:]
+started = time.perf_counter()
+if server == 'asgi':
+    from backend.counseling_ai.asgi import application
+else:
+    from backend.counseling_ai.wsgi import application
+setup_done = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls_done = time.perf_counter()
+
+rss_kb = None
+try:
+    with open('/proc/self/status') as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+except OSError:
+    try:
+        import resource
+        rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            rss_kb //= 1024
+    except ImportError:
+        pass
+
+print(json.dumps({
+    'setup_s': setup_done - started,
+    'urls_s': urls_done - setup_done,
+    'total_s': urls_done - started,
+    'rss_mb': rss_kb / 1024 if rss_kb else None,
+    'loaded': [name for name in heavy_modules if name in sys.modules],
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Measures web worker boot time and memory in fresh interpreters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters to start.")
+        parser.add_argument('--wsgi', action='store_true', help="Boot the WSGI application instead of ASGI.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        server = 'wsgi' if options['wsgi'] else 'asgi'
+        # The project imports as `backend.*`, so the repository root must be importable
+        project_root = str(settings.BASE_DIR.parent)
+        env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [project_root, os.environ.get('PYTHONPATH')]))}
+
+        runs = []
+        for _ in range(options['runs']):
+            result = subprocess.run(
+                [sys.executable, '-c', WORKER_SCRIPT, server, *HEAVY_MODULES], capture_output=True, text=True, env=env,
+            )
+            if result.returncode != 0:
+                raise CommandError(f"Worker failed to boot:\n{result.stderr}")
+            runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+        summary = {
+            'runs': len(runs),
+            'server': server,
+            'setup_s': statistics.median(run['setup_s'] for run in runs),
+            'urls_s': statistics.median(run['urls_s'] for run in runs),
+            'total_s': statistics.median(run['total_s'] for run in runs),
+            'rss_mb': statistics.median(run['rss_mb'] for run in runs) if runs[0]['rss_mb'] else None,
+            'loaded': runs[0]['loaded'],
+        }
+        self.stdout.write(
+            f"{summary['server']} worker boot (median of {summary['runs']}): "
+            f"setup {summary['setup_s'] * 1000:.0f}ms, URLconf {summary['urls_s'] * 1000:.0f}ms, "
+            f"total {summary['total_s'] * 1000:.0f}ms"
+        )
+        if summary['rss_mb'] is not None:
+            self.stdout.write(f"RSS after boot: {summary['rss_mb']:.1f} MB")
+        self.stdout.write(f"Heavy modules loaded at boot: {', '.join(summary['loaded']) or 'none'}")
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(summary, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from backend.api.models import RoadmapTemplate, UserSession
+from backend.api.roadmap_templates import TEMPLATE_STATUSES, build_templates, clear_template_cache
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the roadmap template store from past sessions' roadmaps."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', choices=[s for s, _ in UserSession.STATUS_CHOICES if s in TEMPLATE_STATUSES],
+                            default='school_student')
+        parser.add_argument('--min-support', type=int, default=3, help="Smallest cluster that becomes a template.")
+        parser.add_argument('--cluster-threshold', type=float, default=0.5,
+                            help="Cosine similarity needed to join an existing cluster.")
+        parser.add_argument('--dry-run', action='store_true', help="Report the clusters without saving them.")
+
+    def handle(self, *args, **options):
+        templates = build_templates(options['status'], options['min_support'], options['cluster_threshold'])
+        for template in templates:
+            titles = ", ".join(pathway.get('title', '?') for pathway in template.roadmap_data['roadmap'])
+            self.stdout.write(f"{template.level or '-'} / {template.field or '-'}: {template.support} sessions -> {titles}")
+
+        if options['dry_run']:
+            self.stdout.write(f"{len(templates)} templates (dry run, nothing saved).")
+            return
+
+        # Swap the whole set at once so matching never sees a half-built store
+        with transaction.atomic():
+            RoadmapTemplate.objects.filter(status=options['status']).delete()
+            RoadmapTemplate.objects.bulk_create(templates)
+        clear_template_cache()
+        self.stdout.write(self.style.SUCCESS(f"Saved {len(templates)} templates for {options['status']}."))
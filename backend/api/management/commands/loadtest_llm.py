@@ -0,0 +1,96 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from backend.api.llm_gateway import LLMUnavailable, build_router
+
+groq_rpm, groq_tpm = settings.LLM_RATE_LIMITS['groq']
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = "Load-tests the LLM gateway and router offline against fake providers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--latency', type=float, default=settings.FAKE_LLM_LATENCY, help="Fake backend latency in seconds.")
+        parser.add_argument('--error-rate', type=float, default=0.05, help="Fraction of fake calls that return a 429.")
+        parser.add_argument('--rpm', type=int, default=groq_rpm, help="Requests-per-minute quota.")
+        parser.add_argument('--tpm', type=int, default=groq_tpm, help="Tokens-per-minute quota.")
+        parser.add_argument('--max-wait', type=float, default=settings.LLM_RATE_LIMIT_MAX_WAIT)
+        parser.add_argument(
+            '--fallback-latency', type=float, default=None,
+            help="Adds a second, unthrottled fake provider with this latency to the route.",
+        )
+        parser.add_argument('--slow-after', type=int, default=None, help="Request number at which the primary slows down.")
+        parser.add_argument('--slow-latency', type=float, default=2.0, help="Primary latency once it has slowed down.")
+
+    def handle(self, *args, **options):
+        route = ['fake:primary']
+        gateway_options = {
+            'fake:primary': {
+                'fake_latency': options['latency'],
+                'fake_error_rate': options['error_rate'],
+                'requests_per_minute': options['rpm'],
+                'tokens_per_minute': options['tpm'],
+                'max_wait': options['max_wait'],
+            },
+        }
+        if options['fallback_latency'] is not None:
+            route.append('fake:fallback')
+            gateway_options['fake:fallback'] = {
+                'fake_latency': options['fallback_latency'],
+                'fake_error_rate': options['error_rate'],
+                'requests_per_minute': None,
+                'tokens_per_minute': None,
+            }
+        router = build_router({'chat': route}, gateway_options=gateway_options)
+        primary = router.gateways['fake:primary']
+        messages = [{"role": "user", "content": "Tell me about careers in software. " * 20}]
+
+        def one_call(number):
+            if options['slow_after'] is not None and number == options['slow_after']:
+                primary.client.chat.completions.latency = options['slow_latency']
+                self.stdout.write(f"request {number}: primary slowed to {options['slow_latency']}s")
+            started = time.monotonic()
+            try:
+                router.create('chat', messages=messages, max_tokens=200, temperature=0.7)
+                outcome = 'ok'
+            except LLMUnavailable:
+                outcome = 'unavailable'
+            except Exception:
+                outcome = 'error'
+            return outcome, time.monotonic() - started
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(one_call, range(options['requests'])))
+        elapsed = time.monotonic() - started
+
+        latencies = [latency for outcome, latency in results if outcome == 'ok']
+        counts = {outcome: sum(1 for o, _ in results if o == outcome) for outcome in ('ok', 'unavailable', 'error')}
+        self.stdout.write(
+            f"{options['requests']} requests, concurrency {options['concurrency']}, {elapsed:.2f}s "
+            f"({counts['ok'] / elapsed:.1f} successful req/s)"
+        )
+        self.stdout.write(f"ok={counts['ok']} unavailable={counts['unavailable']} error={counts['error']}")
+        self.stdout.write(
+            f"latency p50={_percentile(latencies, 50) * 1000:.0f}ms "
+            f"p95={_percentile(latencies, 95) * 1000:.0f}ms p99={_percentile(latencies, 99) * 1000:.0f}ms"
+        )
+        for key, stats in router.provider_stats().items():
+            ewma = f"{stats['latency'] * 1000:.0f}ms" if stats['latency'] is not None else "-"
+            self.stdout.write(
+                f"{key}: calls={stats['calls']} failures={stats['failures']} "
+                f"ewma_latency={ewma} error_rate={stats['error_rate']:.2f}"
+            )
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from backend.api.jobs import JOB_HANDLERS, claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Runs queued background jobs (roadmaps and their drafts, welcome messages, resume parsing). Start as many workers as needed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--kind', action='append', choices=sorted(JOB_HANDLERS), help="Only run jobs of this kind (repeatable).")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Job worker started.")
+        while True:
+            close_old_connections()
+            job = claim_next_job(options['kind'])
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            started = time.monotonic()
+            succeeded = run_job(job)
+            outcome = "done" if succeeded else job.status
+            self.stdout.write(f"{job.kind} job {job.job_id}: {outcome} in {time.monotonic() - started:.2f}s")
@@ -0,0 +1,101 @@
+import csv
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.api.intent import INTENTS, NEGATIONS, _tokens, train
+from backend.api.intent_seed import SEED_EXAMPLES
+from backend.api.models import ChatMessage
+
+# Start of the AI reply saved when a turn queues the roadmap (see views._roadmap_ready_text)
+ROADMAP_REPLY_PREFIX = "Oops! You've reached the message limit"
+TOPIC_WORDS = frozenset("roadmap plan resume cv experience internship project projects".split())
+
+
+def _history_examples(max_per_intent):
+    """
+    Weak labels mined from past chats: explicit roadmap requests (the user
+    message right before a roadmap reply, sent before the message limit and
+    without a negation) and longer messages that got an ordinary reply and
+    mention none of the topic words, as counseling.
+    """
+    examples = {'roadmap': [], 'counseling': []}
+    previous = None
+    position = 0
+    rows = ChatMessage.objects.order_by('session_id', 'timestamp').values_list('session_id', 'sender', 'message')
+    for session_id, sender, message in rows.iterator(chunk_size=2000):
+        if previous is None or previous[0] != session_id:
+            previous, position = None, 0
+        position += 1
+        if sender == 'ai' and previous and previous[1] == 'user':
+            words = set(_tokens(previous[2]))
+            if message.startswith(ROADMAP_REPLY_PREFIX):
+                # Turns at or past the message limit triggered the roadmap by count, not by asking
+                if position < settings.ROADMAP_MESSAGE_LIMIT and not words & NEGATIONS:
+                    examples['roadmap'].append(previous[2])
+            elif len(words) >= 6 and not words & TOPIC_WORDS:
+                examples['counseling'].append(previous[2])
+        previous = (session_id, sender, message)
+
+    rng = random.Random(0)
+    labelled = []
+    for intent, texts in examples.items():
+        rng.shuffle(texts)
+        labelled.extend((text, intent) for text in texts[:max_per_intent])
+    return labelled
+
+
+def _read_tsv(path):
+    examples = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for line_number, row in enumerate(csv.reader(f, delimiter='\t'), start=1):
+            if not row:
+                continue
+            if len(row) != 2 or row[1] not in INTENTS:
+                raise CommandError(f"{path}:{line_number}: expected 'text<TAB>intent' with intent in {INTENTS}")
+            examples.append((row[0], row[1]))
+    return examples
+
+
+class Command(BaseCommand):
+    help = "Trains the chat intent classifier from the seed examples, labelled files and chat history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', action='append', default=[], help="TSV file of text<TAB>intent rows (repeatable).")
+        parser.add_argument('--from-history', action='store_true', help="Add weak labels mined from saved chats.")
+        parser.add_argument('--max-per-intent', type=int, default=2000, help="Cap on history examples per intent.")
+        parser.add_argument('--epochs', type=int, default=30)
+        parser.add_argument('--output', default=settings.INTENT_MODEL_PATH)
+
+    def handle(self, *args, **options):
+        examples = list(SEED_EXAMPLES)
+        for path in options['data']:
+            examples.extend(_read_tsv(path))
+        if options['from_history']:
+            mined = _history_examples(options['max_per_intent'])
+            self.stdout.write(f"Mined {len(mined)} examples from chat history.")
+            examples.extend(mined)
+        for intent in INTENTS:
+            self.stdout.write(f"  {intent}: {sum(1 for _, label in examples if label == intent)}")
+
+        started = time.perf_counter()
+        model = train(examples, epochs=options['epochs'])
+        self.stdout.write(f"Trained on {len(examples)} examples in {time.perf_counter() - started:.2f}s")
+
+        # The seed examples are the regressions we care about, so they must all pass
+        misses = [(text, intent, model.predict(text)[0]) for text, intent in SEED_EXAMPLES if model.predict(text)[0] != intent]
+        for text, expected, got in misses:
+            self.stdout.write(f"  seed miss: {text!r} expected {expected}, got {got}")
+        accuracy = sum(1 for text, intent in examples if model.predict(text)[0] == intent) / len(examples)
+        self.stdout.write(f"Training accuracy {accuracy:.1%}, {len(misses)} seed misses")
+
+        started = time.perf_counter()
+        for text, _ in SEED_EXAMPLES:
+            model.predict(text)
+        per_call = (time.perf_counter() - started) / len(SEED_EXAMPLES)
+        self.stdout.write(f"Classification takes {per_call * 1e6:.0f}us per message")
+
+        model.save(options['output'])
+        self.stdout.write(self.style.SUCCESS(f"Saved the model to {options['output']}"))
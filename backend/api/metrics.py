@@ -0,0 +1,187 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process metrics in the Prometheus text format, without a client library.
+# `span()` times a stage of work (an LLM call, a YouTube search, history
+# building...) and the request middleware adds DB time and a per-request
+# breakdown. Each worker process keeps its own registry, so Prometheus should
+# scrape every worker (or run one worker per container).
+
+# Seconds; spans range from sub-millisecond queries to 30s LLM timeouts
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+_HELP = {
+    'stage_duration_seconds': "Time spent in each instrumented stage, in or out of a request.",
+    'db_query_duration_seconds': "Time spent per database query.",
+    'http_request_duration_seconds': "Time to produce a response, per view.",
+    'http_request_stage_seconds': "Time spent in each stage per request, per view.",
+    'http_request_db_queries': "Database queries per request, per view.",
+    'llm_tokens_total': "Tokens used per LLM provider, from the response's usage (estimated for streams).",
+    'llm_cache_hit_age_seconds': "Age of LLM replies served from the response cache, by tier.",
+    'youtube_cache_lookups_total': "YouTube course lookups by cache result.",
+    'chat_intents_total': "Chat turns by classified intent.",
+    'chat_socket_connections_total': "Chat WebSocket connections accepted.",
+    'chat_socket_frames_total': "Frames received on chat WebSockets, by type.",
+    'chat_socket_turn_seconds': "Time to answer a chat turn over a WebSocket, by intent.",
+}
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+
+# Per-request stage timings, shared with any sync_to_async threads the request
+# uses (they copy the context but still point at the same object)
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+# --- Recording ---
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name, value, buckets=DURATION_BUCKETS, **labels):
+    """
+    Adds a sample to a histogram.
+    """
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': buckets, 'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                histogram['counts'][index] += 1
+                break
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+
+def inc(name, amount=1, **labels):
+    """
+    Increments a counter.
+    """
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+class RequestTimings:
+    def __init__(self):
+        self.stages = {}
+        self.queries = 0
+        self.lock = threading.Lock()
+
+    def add(self, stage, elapsed):
+        with self.lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + elapsed
+
+
+@contextmanager
+def span(stage):
+    """
+    Times the enclosed block as `stage`, globally and in the current request's breakdown.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        observe('stage_duration_seconds', elapsed, stage=stage)
+        timings = _current.get()
+        if timings is not None:
+            timings.add(stage, elapsed)
+
+
+def start_request():
+    """
+    Starts collecting a breakdown for the current request. Returns the
+    timings and a token for end_request.
+    """
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """
+    Database execute wrapper (see connection.execute_wrappers) that times every query.
+    """
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        observe('db_query_duration_seconds', elapsed)
+        timings = _current.get()
+        if timings is not None:
+            timings.add('db', elapsed)
+            with timings.lock:
+                timings.queries += 1
+
+
+def install_db_wrapper(sender, connection, **kwargs):
+    # connection_created receiver; covers every thread's connection
+    if db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_execute_wrapper)
+
+
+# --- Exposition ---
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value is None:
+        return 'NaN'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(extra=()):
+    """
+    Returns every metric in the Prometheus text exposition format. `extra` is
+    an iterable of (name, type, help, labels dict, value) for values owned by
+    other modules, such as cache and provider stats.
+    """
+    with _lock:
+        histograms = {key: {**value, 'counts': list(value['counts'])} for key, value in _histograms.items()}
+        counters = dict(_counters)
+
+    families = {}
+    for (name, labels), histogram in histograms.items():
+        families.setdefault(name, ('histogram', _HELP.get(name, ''), []))[2].append((labels, histogram))
+    for (name, labels), value in counters.items():
+        families.setdefault(name, ('counter', _HELP.get(name, ''), []))[2].append((labels, value))
+    for name, kind, help_text, labels, value in extra:
+        families.setdefault(name, (kind, help_text, []))[2].append((tuple(sorted(labels.items())), value))
+
+    lines = []
+    for name in sorted(families):
+        kind, help_text, samples = families[name]
+        if help_text:
+            lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(samples, key=lambda sample: sample[0]):
+            if kind != 'histogram':
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(value['buckets'], value['counts']):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {value['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
@@ -0,0 +1,59 @@
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from . import metrics
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.url_name if match and match.url_name else 'unmatched'
+
+
+def _record(request, response, timings, started):
+    elapsed = time.perf_counter() - started
+    view = _view_name(request)
+    metrics.observe(
+        'http_request_duration_seconds', elapsed,
+        view=view, method=request.method, status=str(response.status_code),
+    )
+    metrics.observe('http_request_db_queries', timings.queries, buckets=metrics.QUERY_COUNT_BUCKETS, view=view)
+    for stage, stage_elapsed in timings.stages.items():
+        metrics.observe('http_request_stage_seconds', stage_elapsed, view=view, stage=stage)
+
+    if settings.METRICS_SERVER_TIMING:
+        # Shows the breakdown in the browser's network panel
+        entries = [f"{stage};dur={stage_elapsed * 1000:.1f}" for stage, stage_elapsed in timings.stages.items()]
+        entries.append(f"total;dur={elapsed * 1000:.1f}")
+        response['Server-Timing'] = ", ".join(entries)
+
+
+@sync_and_async_middleware
+def request_metrics_middleware(get_response):
+    """
+    Records each request's latency, DB queries and per-stage breakdown.
+    Streaming responses are timed up to their first byte.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            timings, token = metrics.start_request()
+            started = time.perf_counter()
+            try:
+                response = await get_response(request)
+                _record(request, response, timings, started)
+                return response
+            finally:
+                metrics.end_request(token)
+    else:
+        def middleware(request):
+            timings, token = metrics.start_request()
+            started = time.perf_counter()
+            try:
+                response = get_response(request)
+                _record(request, response, timings, started)
+                return response
+            finally:
+                metrics.end_request(token)
+    return middleware
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_usersession_roadmap_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersession',
+            name='resume_chunks',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='usersession',
+            name='resume_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
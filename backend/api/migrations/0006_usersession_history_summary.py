@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_backgroundjob_usersession_roadmap_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersession',
+            name='history_summary',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='usersession',
+            name='summarized_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_usersession_history_summary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='kind',
+            field=models.CharField(choices=[('roadmap', 'Roadmap Generation'), ('welcome', 'Welcome Message')], max_length=20),
+        ),
+    ]
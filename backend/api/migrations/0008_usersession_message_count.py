@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:49
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_message_count(apps, schema_editor):
+    UserSession = apps.get_model('api', 'UserSession')
+    ChatMessage = apps.get_model('api', 'ChatMessage')
+    counts = (
+        ChatMessage.objects.filter(session=OuterRef('pk'))
+        .order_by()
+        .values('session')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    UserSession.objects.update(message_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_alter_backgroundjob_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersession',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_message_count, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='chatmessage',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:55
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_usersession_message_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoadmapTemplate',
+            fields=[
+                ('template_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('school_student', 'School Student'), ('college_student', 'College Student'), ('passout', 'Graduate/Passout')], max_length=20)),
+                ('level', models.CharField(blank=True, choices=[('class_10', 'Class 10'), ('class_11', 'Class 11'), ('class_12', 'Class 12')], max_length=20, null=True)),
+                ('field', models.CharField(blank=True, choices=[('engineering', 'Engineering'), ('medical', 'Medical'), ('business', 'Business/Commerce'), ('arts', 'Arts/Humanities'), ('science', 'Science')], max_length=20, null=True)),
+                ('centroid', models.BinaryField()),
+                ('roadmap_data', models.JSONField()),
+                ('support', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Roadmap Template',
+                'verbose_name_plural': 'Roadmap Templates',
+                'db_table': 'roadmap_templates',
+                'indexes': [models.Index(fields=['status', 'level', 'field'], name='roadmap_tem_status_d54ab2_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_roadmaptemplate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersession',
+            name='resume_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], max_length=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='kind',
+            field=models.CharField(choices=[('roadmap', 'Roadmap Generation'), ('welcome', 'Welcome Message'), ('resume', 'Resume Parsing')], max_length=20),
+        ),
+    ]
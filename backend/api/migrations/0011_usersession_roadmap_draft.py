@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_usersession_resume_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersession',
+            name='roadmap_draft',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='usersession',
+            name='roadmap_draft_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='kind',
+            field=models.CharField(choices=[('roadmap', 'Roadmap Generation'), ('welcome', 'Welcome Message'), ('resume', 'Resume Parsing'), ('roadmap_draft', 'Roadmap Draft')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:13
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fail_duplicate_active_jobs(apps, schema_editor):
+    # Keep the newest queued/running job per session and kind; the constraint
+    # below can't be added while older duplicates are still active.
+    BackgroundJob = apps.get_model('api', 'BackgroundJob')
+    active = BackgroundJob.objects.filter(
+        status__in=['pending', 'running'], kind__in=['welcome', 'roadmap', 'roadmap_draft'],
+    ).order_by('session_id', 'kind', '-created_at')
+    seen = set()
+    duplicates = []
+    for job_id, session_id, kind in active.values_list('job_id', 'session_id', 'kind'):
+        if (session_id, kind) in seen:
+            duplicates.append(job_id)
+        seen.add((session_id, kind))
+    BackgroundJob.objects.filter(job_id__in=duplicates).update(
+        status='failed', error='Superseded by a newer job.', finished_at=timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_usersession_roadmap_draft'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_active_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='backgroundjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('kind__in', ['welcome', 'roadmap', 'roadmap_draft']), ('status__in', ['pending', 'running'])), fields=('session', 'kind'), name='one_active_job_per_session_kind'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_backgroundjob_single_flight'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersession',
+            name='resume_profile',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
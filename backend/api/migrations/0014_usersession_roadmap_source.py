@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:33
+
+from django.db import migrations, models
+
+
+def _titles(roadmap):
+    if not isinstance(roadmap, dict) or not isinstance(roadmap.get('roadmap'), list):
+        return None
+    return tuple(pathway.get('title') for pathway in roadmap['roadmap'] if isinstance(pathway, dict))
+
+
+def backfill_roadmap_source(apps, schema_editor):
+    # Template roadmaps only get their reasoning personalised, so one whose
+    # pathway titles match a stored template (same profile) is taken to have
+    # come from it. Everything else was generated by the LLM.
+    UserSession = apps.get_model('api', 'UserSession')
+    RoadmapTemplate = apps.get_model('api', 'RoadmapTemplate')
+    template_titles = {
+        (template.status, template.level, template.field, _titles(template.roadmap_data))
+        for template in RoadmapTemplate.objects.all()
+    }
+    sessions = UserSession.objects.filter(
+        models.Q(roadmap_data__isnull=False) | models.Q(roadmap_draft__isnull=False)
+    ).only('session_id', 'status', 'level', 'field', 'roadmap_data', 'roadmap_draft')
+    for session in sessions.iterator():
+        profile = (session.status, session.level, session.field)
+        for data_field, source_field in (('roadmap_data', 'roadmap_source'), ('roadmap_draft', 'roadmap_draft_source')):
+            roadmap = getattr(session, data_field)
+            if roadmap is not None:
+                source = 'template' if profile + (_titles(roadmap),) in template_titles else 'llm'
+                setattr(session, source_field, source)
+        session.save(update_fields=['roadmap_source', 'roadmap_draft_source'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_usersession_resume_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersession',
+            name='roadmap_draft_source',
+            field=models.CharField(blank=True, choices=[('llm', 'LLM'), ('template', 'Template Store')], max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='usersession',
+            name='roadmap_source',
+            field=models.CharField(blank=True, choices=[('llm', 'LLM'), ('template', 'Template Store')], max_length=10, null=True),
+        ),
+        migrations.RunPython(backfill_roadmap_source, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_usersession_roadmap_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='payload',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_usersession_roadmap_draft_status'),
+    ]
+
+    operations = [
+        # Bytes can't be converted in place; queued uploads from before fall
+        # back to the session's resume_file
+        migrations.RemoveField(
+            model_name='backgroundjob',
+            name='payload',
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='payload',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 import uuid
 
 class UserSession(models.Model):
@@ -7,6 +8,8 @@ class UserSession(models.Model):
     LEVEL_CHOICES = [('class_10', 'Class 10'), ('class_11', 'Class 11'), ('class_12', 'Class 12')]
     YEAR_CHOICES = [('first_year', '1st Year'), ('second_year', '2nd Year'), ('third_year', '3rd Year'), ('fourth_year', '4th Year')]
     FIELD_CHOICES = [('engineering', 'Engineering'), ('medical', 'Medical'), ('business', 'Business/Commerce'), ('arts', 'Arts/Humanities'), ('science', 'Science')]
+    ROADMAP_STATUS_CHOICES = [('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')]
+    ROADMAP_SOURCE_CHOICES = [('llm', 'LLM'), ('template', 'Template Store')]
 
     # --- FIELDS ---
     session_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -19,9 +22,34 @@ class UserSession(models.Model):
     # MODIFIED: Concerns is now optional as it will be gathered during the chat.
     concerns = models.TextField(blank=True, null=True)
     resume_file = models.FileField(upload_to='resumes/', blank=True, null=True)
+    # Parsed once at upload; chat turns read these instead of re-opening the PDF.
+    resume_hash = models.CharField(max_length=64, blank=True, null=True)
+    resume_chunks = models.JSONField(null=True, blank=True)
+    # Skills, education, roles, etc. (see resume_profile.py); prompts use this instead of resume text.
+    resume_profile = models.JSONField(null=True, blank=True)
+    # Set on upload; tracks the background job that parses the resume.
+    resume_status = models.CharField(max_length=10, choices=ROADMAP_STATUS_CHOICES, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     roadmap_data = models.JSONField(null=True, blank=True)
+    # Rolling summary of turns that no longer fit the prompt's history budget,
+    # and the timestamp of the last message folded into it.
+    history_summary = models.TextField(blank=True, default='')
+    summarized_until = models.DateTimeField(blank=True, null=True)
+    # Set once a roadmap has been requested; tracks its background job.
+    roadmap_status = models.CharField(max_length=10, choices=ROADMAP_STATUS_CHOICES, blank=True, null=True)
+    # Where roadmap_data came from; only LLM roadmaps feed the template store.
+    roadmap_source = models.CharField(max_length=10, choices=ROADMAP_SOURCE_CHOICES, blank=True, null=True)
+    # Roadmap generated speculatively as the session nears the message limit,
+    # the timestamp of the last message it was built from, and its source.
+    roadmap_draft = models.JSONField(null=True, blank=True)
+    roadmap_draft_until = models.DateTimeField(blank=True, null=True)
+    roadmap_draft_source = models.CharField(max_length=10, choices=ROADMAP_SOURCE_CHOICES, blank=True, null=True)
+    # Tracks the draft's background job, like roadmap_status.
+    roadmap_draft_status = models.CharField(max_length=10, choices=ROADMAP_STATUS_CHOICES, blank=True, null=True)
+    # Number of chat messages, kept in step by history.record_message so a
+    # chat turn doesn't need a COUNT(*) over the session's messages.
+    message_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         db_table = 'user_sessions'
@@ -38,7 +66,9 @@ class ChatMessage(models.Model):
     session = models.ForeignKey(UserSession, on_delete=models.CASCADE, related_name='messages')
     sender = models.CharField(max_length=10, choices=SENDER_CHOICES)
     message = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set by history.record_messages at insert time, so timestamps follow
+    # commit order within a session (history cursors depend on it).
+    timestamp = models.DateTimeField(default=timezone.now)
 
     class Meta:
         db_table = 'chat_messages'
@@ -50,3 +80,71 @@ class ChatMessage(models.Model):
     def __str__(self):
         return f"{self.session.name} - {self.get_sender_display()}: {self.message[:50]}..."
 
+
+class BackgroundJob(models.Model):
+    KIND_CHOICES = [('roadmap', 'Roadmap Generation'), ('welcome', 'Welcome Message'), ('resume', 'Resume Parsing'), ('roadmap_draft', 'Roadmap Draft')]
+    STATUS_CHOICES = [('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')]
+
+    job_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    session = models.ForeignKey(UserSession, on_delete=models.CASCADE, related_name='jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # Rough completion percentage, reported to clients while they poll
+    progress = models.PositiveSmallIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    # Input the handler can't find in the database, e.g. where an uploaded
+    # resume is stored. A stored file is deleted once the job finishes.
+    payload = models.JSONField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'background_jobs'
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+        # Single-flight: a session has at most one queued or running job of
+        # each of these kinds, so double-clicks and retries join the job
+        # already in flight (see jobs.enqueue_job). Resume jobs are left out,
+        # since a new upload must be parsed even while an older one is; the
+        # upload cancels older queued ones instead, and a running one only
+        # writes its results if its file is still the session's latest.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['session', 'kind'],
+                condition=models.Q(status__in=['pending', 'running'], kind__in=['welcome', 'roadmap', 'roadmap_draft']),
+                name='one_active_job_per_session_kind',
+            ),
+        ]
+        verbose_name = 'Background Job'
+        verbose_name_plural = 'Background Jobs'
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for {self.session_id} ({self.get_status_display()})"
+
+
+class RoadmapTemplate(models.Model):
+    """
+    A roadmap shared by a cluster of past sessions with the same profile,
+    built offline by `manage.py build_roadmap_templates`.
+    """
+    template_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=20, choices=UserSession.STATUS_CHOICES)
+    level = models.CharField(max_length=20, choices=UserSession.LEVEL_CHOICES, blank=True, null=True)
+    field = models.CharField(max_length=20, choices=UserSession.FIELD_CHOICES, blank=True, null=True)
+    # L2-normalised float32 centroid of the cluster's conversation embeddings
+    centroid = models.BinaryField()
+    roadmap_data = models.JSONField()
+    # Number of past sessions in the cluster
+    support = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'roadmap_templates'
+        indexes = [models.Index(fields=['status', 'level', 'field'])]
+        verbose_name = 'Roadmap Template'
+        verbose_name_plural = 'Roadmap Templates'
+
+    def __str__(self):
+        return f"{self.get_status_display()} / {self.level or '-'} / {self.field or '-'} ({self.support} sessions)"
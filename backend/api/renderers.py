@@ -0,0 +1,64 @@
+import json
+
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# orjson handles dicts, lists, str, numbers, UUIDs and datetimes natively (UTC
+# datetimes end in "Z", as DRF writes them). Anything else (lazy translation
+# strings, Decimals, querysets...) falls back to DRF's own encoder.
+_drf_encoder = JSONEncoder()
+
+
+def _orjson_default(obj):
+    return _drf_encoder.default(obj)
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer backed by orjson.
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        option = orjson.OPT_UTC_Z
+        # Pretty-print when asked for, e.g. by the browsable API
+        renderer_context = renderer_context or {}
+        if renderer_context.get('indent') or 'indent=' in (accepted_media_type or ''):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_orjson_default, option=option)
+
+
+class ORJSONParser(BaseParser):
+    """
+    Parses JSON request bodies with orjson.
+    """
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as e:
+            raise ParseError(f'JSON parse error - {e}')
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets streaming views accept `Accept: text/event-stream`. Successful responses
+    are StreamingHttpResponses and bypass rendering; anything that reaches this
+    renderer is an error payload, sent as a single `error` event.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return f"event: error\ndata: {json.dumps(data, default=str)}\n\n".encode(self.charset)
@@ -0,0 +1,341 @@
+import re
+from datetime import date
+
+# A compact, structured profile of a resume (skills, education, years of
+# experience, roles, certifications, projects), extracted once when the
+# resume is parsed, without any model: headings split the text into
+# sections, and small dictionaries of skills, degrees and job titles pick
+# out the rest. Prompts include the profile (a few hundred characters)
+# instead of raw resume text; see format_resume_profile.
+
+# Bump when the extraction changes, so stored profiles can be told apart
+PROFILE_VERSION = 1
+
+MAX_SKILLS = 20
+MAX_ROLES = 5
+MAX_EDUCATION = 3
+MAX_LIST_ITEMS = 3
+MAX_ITEM_CHARS = 80
+
+# --- Sections ---
+SECTION_HEADINGS = {
+    'summary': ('summary', 'professional summary', 'profile', 'objective', 'career objective', 'about me'),
+    'experience': (
+        'experience', 'work experience', 'professional experience', 'employment', 'employment history',
+        'work history', 'internships', 'internship', 'internship experience',
+    ),
+    'education': ('education', 'academic background', 'academics', 'qualifications', 'educational qualifications'),
+    'skills': ('skills', 'technical skills', 'key skills', 'core competencies', 'technologies', 'tools', 'tech stack'),
+    'projects': ('projects', 'academic projects', 'personal projects', 'key projects'),
+    'certifications': ('certifications', 'certificates', 'licenses and certifications', 'courses'),
+    'achievements': ('achievements', 'awards', 'honors', 'accomplishments', 'extracurricular activities'),
+}
+_HEADING_LOOKUP = {heading: section for section, headings in SECTION_HEADINGS.items() for heading in headings}
+# A heading alone on its line, or followed by a colon and the section's first content
+_HEADING_PATTERN = re.compile(
+    r'^\s*(?P<heading>' + '|'.join(sorted(map(re.escape, _HEADING_LOOKUP), key=len, reverse=True))
+    + r')\s*(?::\s*(?P<rest>.*)|$)',
+    re.IGNORECASE,
+)
+_BULLET = re.compile(r'^[\s\-–•*·▪●◦]+')
+
+
+def split_sections(text):
+    """
+    Returns {section: [lines]} for the resume's text. Lines before the first
+    recognised heading go under 'header'.
+    """
+    sections = {'header': []}
+    current = 'header'
+    for raw_line in text.splitlines():
+        line = _BULLET.sub('', raw_line).strip()
+        if not line:
+            continue
+        match = _HEADING_PATTERN.match(line)
+        if match:
+            current = _HEADING_LOOKUP[match['heading'].lower()]
+            sections.setdefault(current, [])
+            if match['rest']:
+                sections[current].append(match['rest'].strip())
+            continue
+        sections[current].append(line)
+    return sections
+
+
+# --- Skills ---
+SKILLS = {
+    # Languages
+    'Python': ('python',), 'Java': ('java',), 'JavaScript': ('javascript', 'js'), 'TypeScript': ('typescript',),
+    'C++': ('c++', 'cpp'), 'C#': ('c#',), 'Kotlin': ('kotlin',), 'Swift': ('swift',), 'Ruby': ('ruby',),
+    'PHP': ('php',), 'Rust': ('rust',), 'Scala': ('scala',), 'MATLAB': ('matlab',), 'Dart': ('dart',),
+    'Bash': ('bash', 'shell scripting'), 'SQL': ('sql',), 'NoSQL': ('nosql',), 'HTML': ('html', 'html5'),
+    'CSS': ('css', 'css3'),
+    # Frameworks and libraries
+    'Django': ('django',), 'Flask': ('flask',), 'FastAPI': ('fastapi',), 'Spring': ('spring', 'spring boot'),
+    'React': ('react', 'react.js', 'reactjs'), 'React Native': ('react native',), 'Angular': ('angular',),
+    'Vue': ('vue', 'vue.js'), 'Node.js': ('node.js', 'nodejs'), 'Express': ('express.js', 'expressjs'),
+    'Next.js': ('next.js', 'nextjs'), '.NET': ('.net', 'asp.net'), 'Laravel': ('laravel',), 'Flutter': ('flutter',),
+    'TensorFlow': ('tensorflow',), 'PyTorch': ('pytorch',), 'Keras': ('keras',),
+    'scikit-learn': ('scikit-learn', 'sklearn'), 'Pandas': ('pandas',), 'NumPy': ('numpy',), 'OpenCV': ('opencv',),
+    'Spark': ('spark', 'pyspark', 'apache spark'), 'Hadoop': ('hadoop',),
+    # Data stores
+    'PostgreSQL': ('postgresql', 'postgres'), 'MySQL': ('mysql',), 'MongoDB': ('mongodb',), 'Redis': ('redis',),
+    'SQLite': ('sqlite',), 'Oracle': ('oracle',), 'Firebase': ('firebase',),
+    # Cloud and tooling
+    'AWS': ('aws', 'amazon web services'), 'Azure': ('azure',), 'GCP': ('gcp', 'google cloud'),
+    'Docker': ('docker',), 'Kubernetes': ('kubernetes', 'k8s'), 'Terraform': ('terraform',), 'Jenkins': ('jenkins',),
+    'Git': ('git', 'github', 'gitlab'), 'Linux': ('linux',), 'CI/CD': ('ci/cd',), 'REST APIs': ('rest api', 'rest apis', 'restful'),
+    'GraphQL': ('graphql',), 'Microservices': ('microservices',), 'Kafka': ('kafka',), 'Jira': ('jira',),
+    # Data and AI
+    'Machine Learning': ('machine learning', 'ml'), 'Deep Learning': ('deep learning',),
+    'NLP': ('nlp', 'natural language processing'), 'Computer Vision': ('computer vision',),
+    'Data Analysis': ('data analysis', 'data analytics'), 'Data Visualization': ('data visualization',),
+    'Statistics': ('statistics',), 'LLMs': ('llm', 'llms', 'large language models'), 'Generative AI': ('generative ai', 'genai'),
+    'Tableau': ('tableau',), 'Power BI': ('power bi', 'powerbi'), 'Excel': ('excel', 'ms excel', 'microsoft excel'),
+    # Design and engineering tools
+    'Figma': ('figma',), 'Photoshop': ('photoshop',), 'Illustrator': ('illustrator',),
+    'UI/UX Design': ('ui/ux', 'ux design', 'ui design', 'user experience'), 'AutoCAD': ('autocad',),
+    'SolidWorks': ('solidworks',),
+    # Business
+    'Project Management': ('project management',), 'Agile': ('agile', 'scrum'), 'Digital Marketing': ('digital marketing',),
+    'SEO': ('seo',), 'Sales': ('sales',), 'Accounting': ('accounting',), 'Financial Analysis': ('financial analysis',),
+    'Tally': ('tally',), 'SAP': ('sap',), 'Salesforce': ('salesforce',), 'Content Writing': ('content writing',),
+    'Public Speaking': ('public speaking',), 'Leadership': ('leadership',), 'Communication': ('communication',),
+}
+# Too ambiguous in prose ("go to", "C grade"), so only matched in a skills section
+SKILLS_SECTION_ONLY = {'Go': ('go', 'golang'), 'R': ('r',), 'C': ('c',)}
+
+
+def _alias_pattern(skills):
+    alias_to_skill = {alias: skill for skill, aliases in skills.items() for alias in aliases}
+    alternation = '|'.join(sorted(map(re.escape, alias_to_skill), key=len, reverse=True))
+    # Skill names contain '+', '#', '.' and '/', so \b isn't enough
+    return re.compile(r'(?<![\w+#.])(' + alternation + r')(?![\w+#])', re.IGNORECASE), alias_to_skill
+
+
+_SKILL_PATTERN, _SKILL_ALIASES = _alias_pattern(SKILLS)
+_SECTION_SKILL_PATTERN, _SECTION_SKILL_ALIASES = _alias_pattern(SKILLS_SECTION_ONLY)
+
+
+def extract_skills(sections):
+    """
+    Returns known skills, those listed under a skills heading first, then
+    the ones mentioned elsewhere, each once.
+    """
+    found = []
+    skills_text = "\n".join(sections.get('skills', []))
+    other_text = "\n".join(line for section, lines in sections.items() if section != 'skills' for line in lines)
+    for pattern, aliases, text in (
+        (_SKILL_PATTERN, _SKILL_ALIASES, skills_text),
+        (_SECTION_SKILL_PATTERN, _SECTION_SKILL_ALIASES, skills_text),
+        (_SKILL_PATTERN, _SKILL_ALIASES, other_text),
+    ):
+        for match in pattern.finditer(text):
+            skill = aliases[match.group(1).lower()]
+            if skill not in found:
+                found.append(skill)
+    return found[:MAX_SKILLS]
+
+
+# --- Dates ---
+MONTHS = ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec')
+_DATE = (
+    r'(?:(?P<{0}month>' + '|'.join(MONTHS) + r')[a-z]*\.?,?\s+|(?P<{0}num>\d{{1,2}})[/.-])?'
+    r'(?P<{0}year>(?:19|20)\d{{2}})'
+)
+_DATE_RANGE = re.compile(
+    _DATE.format('start_') + r'\s*(?:-|–|—|to|till|until)\s*(?:' + _DATE.format('end_')
+    + r'|(?P<ongoing>present|current|now|date|today|ongoing))',
+    re.IGNORECASE,
+)
+_YEAR = re.compile(r'\b(?:19|20)\d{2}\b')
+
+
+def _month_index(match, prefix):
+    """
+    Returns a date's month as year * 12 + month - 1, and whether the month was given.
+    """
+    year = int(match[f'{prefix}year'])
+    if match[f'{prefix}month']:
+        return year * 12 + MONTHS.index(match[f'{prefix}month'].lower()), True
+    if match[f'{prefix}num'] and 1 <= int(match[f'{prefix}num']) <= 12:
+        return year * 12 + int(match[f'{prefix}num']) - 1, True
+    return year * 12, False
+
+
+def date_ranges(line, today=None):
+    """
+    Yields (start, end, text) for each date range on a line, as month
+    indexes with the end excluded: "Jul 2019 - Dec 2021" ends after
+    December, "2019 - 2023" at the start of 2023, and "present" after this month.
+    """
+    today = today or date.today()
+    for match in _DATE_RANGE.finditer(line):
+        start, _ = _month_index(match, 'start_')
+        if match['ongoing']:
+            end = today.year * 12 + today.month
+        else:
+            end, has_month = _month_index(match, 'end_')
+            end += 1 if has_month else 0
+        if end >= start:
+            yield start, max(end, start + 1), match.group(0)
+
+
+def total_years(ranges):
+    """
+    Years covered by (start, end) month ranges, counting overlaps once,
+    rounded to the nearest half year.
+    """
+    months = 0
+    last_end = None
+    for start, end in sorted(ranges):
+        if last_end is not None and start < last_end:
+            start = last_end
+        if end > start:
+            months += end - start
+            last_end = end
+    return round(months / 6) / 2
+
+
+# --- Roles ---
+TITLE_WORDS = frozenset("""
+    engineer developer programmer analyst intern internship trainee manager designer scientist consultant
+    architect administrator specialist associate assistant coordinator executive officer teacher tutor
+    lecturer researcher founder co-founder freelancer technician accountant marketer lead head director
+""".split())
+_ROLE_SPLIT = re.compile(r'\s+(?:at|@)\s+|\s*[|,]\s*|\s+[-–—]\s+', re.IGNORECASE)
+
+
+def _clean(text):
+    return re.sub(r'\s+', ' ', text).strip(' ,.;:|-–—()')[:MAX_ITEM_CHARS]
+
+
+def extract_roles(lines, today=None):
+    """
+    Returns (roles, ranges): each role is {title, organization, period} from
+    a line naming a job title, and ranges are the date ranges found on those
+    lines, for total_years.
+    """
+    roles = []
+    ranges = []
+    for line in lines:
+        line_ranges = list(date_ranges(line, today))
+        text = line
+        for _, _, matched in line_ranges:
+            text = text.replace(matched, ' ')
+        parts = [_clean(part) for part in _ROLE_SPLIT.split(text) if _clean(part)]
+        title_index = next(
+            (index for index, part in enumerate(parts) if TITLE_WORDS & set(re.findall(r"[a-z-]+", part.lower()))),
+            None,
+        )
+        if title_index is None:
+            continue
+        ranges.extend((start, end) for start, end, _ in line_ranges)
+        role = {'title': parts[title_index]}
+        if title_index + 1 < len(parts):
+            role['organization'] = parts[title_index + 1]
+        elif title_index > 0:
+            role['organization'] = parts[title_index - 1]
+        if line_ranges:
+            role['period'] = _clean(line_ranges[0][2])
+        if len(roles) < MAX_ROLES:
+            roles.append(role)
+    return roles, ranges
+
+
+# --- Education ---
+DEGREES = (
+    (r'ph\.?\s?d', 'PhD'), (r'm\.?\s?tech', 'M.Tech'), (r'b\.?\s?tech', 'B.Tech'), (r'b\.e\.?', 'B.E.'),
+    (r'm\.e\.?', 'M.E.'), (r'm\.?\s?b\.?\s?a', 'MBA'), (r'm\.?\s?c\.?\s?a', 'MCA'), (r'b\.?\s?c\.?\s?a', 'BCA'),
+    (r'b\.?\s?com', 'B.Com'), (r'm\.?\s?com', 'M.Com'), (r'b\.?\s?sc', 'B.Sc'), (r'm\.?\s?sc', 'M.Sc'),
+    (r'b\.a\.?', 'B.A.'), (r'm\.a\.?', 'M.A.'), (r'b\.?\s?b\.?\s?a', 'BBA'), (r'mbbs', 'MBBS'), (r'll\.?\s?b', 'LLB'),
+    (r'diploma', 'Diploma'), (r"bachelor'?s?(?: of)?", "Bachelor's"), (r"master'?s?(?: of)?", "Master's"),
+    (r'(?:class|grade)\s?(?:12|xii)|hsc|12th', 'Class 12'), (r'(?:class|grade)\s?(?:10|x)|ssc|10th', 'Class 10'),
+)
+_DEGREE_PATTERNS = [(re.compile(r'(?<![\w.])' + pattern + r'(?![\w])', re.IGNORECASE), name) for pattern, name in DEGREES]
+_INSTITUTION = re.compile(r'[^,|(]*\b(?:university|college|institute|school|academy|iit|nit|iiit|bits)\b[^,|(]*', re.IGNORECASE)
+_FIELD = re.compile(r'\b(?:in|of)\s+([a-z&][a-z&\s]+?)(?=\s*(?:,|\||\(|\d|-|–|from\b|at\b|$))', re.IGNORECASE)
+
+
+def extract_education(lines):
+    """
+    Returns up to MAX_EDUCATION entries of {degree, field, institution, year}
+    from lines naming a known degree.
+    """
+    education = []
+    for line in lines:
+        degree = next((name for pattern, name in _DEGREE_PATTERNS if pattern.search(line)), None)
+        if degree is None:
+            continue
+        entry = {'degree': degree}
+        field = _FIELD.search(line)
+        if field and degree not in ('Class 10', 'Class 12'):
+            entry['field'] = _clean(field.group(1))
+        institution = _INSTITUTION.search(line)
+        if institution:
+            entry['institution'] = _clean(institution.group(0))
+        years = _YEAR.findall(line)
+        if years:
+            entry['year'] = years[-1]
+        education.append(entry)
+        if len(education) >= MAX_EDUCATION:
+            break
+    return education
+
+
+# --- Profile ---
+def extract_resume_profile(text, today=None):
+    """
+    Builds the structured profile for a resume's text. Returns None if
+    nothing useful was found.
+    """
+    if not text or not text.strip():
+        return None
+    sections = split_sections(text)
+
+    experience_lines = sections.get('experience')
+    if not experience_lines:
+        # No experience heading: look for job titles anywhere but education
+        experience_lines = [line for section, lines in sections.items() if section != 'education' for line in lines]
+    roles, ranges = extract_roles(experience_lines, today)
+
+    education_lines = sections.get('education') or [line for lines in sections.values() for line in lines]
+    profile = {
+        'version': PROFILE_VERSION,
+        'skills': extract_skills(sections),
+        'education': extract_education(education_lines),
+        'experience_years': total_years(ranges),
+        'roles': roles,
+        'certifications': [_clean(line) for line in sections.get('certifications', [])[:MAX_LIST_ITEMS]],
+        'projects': [_clean(line) for line in sections.get('projects', [])[:MAX_LIST_ITEMS]],
+    }
+    if not any((profile['skills'], profile['education'], profile['roles'])):
+        return None
+    return profile
+
+
+def format_resume_profile(profile):
+    """
+    Renders a profile as the short text prompts include.
+    """
+    parts = []
+    if profile.get('skills'):
+        parts.append(f"Skills: {', '.join(profile['skills'])}.")
+    education = []
+    for entry in profile.get('education', []):
+        degree = entry['degree'] + (f" in {entry['field']}" if entry.get('field') else '')
+        details = ', '.join(entry[key] for key in ('institution', 'year') if entry.get(key))
+        education.append(f"{degree} ({details})" if details else degree)
+    if education:
+        parts.append(f"Education: {'; '.join(education)}.")
+    if profile.get('roles'):
+        roles = []
+        for role in profile['roles']:
+            text = role['title'] + (f" at {role['organization']}" if role.get('organization') else '')
+            roles.append(text + (f" ({role['period']})" if role.get('period') else ''))
+        parts.append(f"Experience: about {profile.get('experience_years', 0):g} years; {'; '.join(roles)}.")
+    if profile.get('certifications'):
+        parts.append(f"Certifications: {'; '.join(profile['certifications'])}.")
+    if profile.get('projects'):
+        parts.append(f"Projects: {'; '.join(profile['projects'])}.")
+    return " ".join(parts)
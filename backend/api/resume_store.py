@@ -0,0 +1,120 @@
+import hashlib
+import re
+
+from django.conf import settings
+from django.utils import timezone
+
+from .metrics import span
+from .models import UserSession
+from .resume_profile import extract_resume_profile
+
+# --- Chunking Configuration ---
+# Sizes are in characters; the overlap keeps sentences that straddle a
+# boundary retrievable from either side.
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 150
+
+
+# --- Resume Parsing ---
+def iter_resume_pages(source, max_pages: int = None):
+    """
+    Yields the text of each page of a PDF (a path or a binary file object),
+    one page at a time. The reader parses pages on demand, so large files
+    are never loaded whole.
+    """
+    # Only job workers parse PDFs, so web workers never import pypdf
+    from pypdf import PdfReader
+    reader = PdfReader(source)
+    for number, page in enumerate(reader.pages):
+        if max_pages and number >= max_pages:
+            print(f"Resume has more than {max_pages} pages; ignoring the rest.")
+            break
+        yield page.extract_text() or ""
+
+
+@span("resume.parse")
+def process_resume(source):
+    """
+    Reads a resume (PDF, as a path or a binary file object) and returns the text content.
+    """
+    if not source:
+        return None
+    try:
+        # Line breaks mark section headings for the profile extractor
+        resume_text = "\n".join(iter_resume_pages(source, settings.RESUME_MAX_PAGES))
+        print(f"Successfully processed resume ({len(resume_text)} characters)")
+        return resume_text
+    except Exception as e:
+        print(f"Error processing resume file: {e}")
+        return None
+
+
+def looks_like_pdf(uploaded_file) -> bool:
+    """
+    Checks an upload's magic bytes, so junk is rejected before it is queued.
+    """
+    header = uploaded_file.read(5)
+    uploaded_file.seek(0)
+    return header == b"%PDF-"
+
+
+def hash_resume_file(uploaded_file) -> str:
+    """
+    Returns a SHA-256 hex digest of an uploaded file's contents.
+    """
+    digest = hashlib.sha256()
+    for block in uploaded_file.chunks():
+        digest.update(block)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def chunk_resume_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP):
+    """
+    Splits resume text into overlapping chunks, breaking on whitespace.
+    """
+    text = re.sub(r"\s+", " ", text or "").strip()
+    if not text:
+        return []
+
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            # Back off to the last space so words are never cut in half
+            space = text.rfind(" ", start, end)
+            if space > start:
+                end = space
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+        # Re-align the overlap to a word boundary
+        space = text.find(" ", start, end)
+        if space != -1:
+            start = space + 1
+    return chunks
+
+
+# --- Persistent Store ---
+def store_resume(session, resume_hash: str, source) -> bool:
+    """
+    Parses a resume (see process_resume) once and stores its chunks and
+    profile on the session, unless the session has moved on to another
+    upload (a different resume_hash) meanwhile. Returns True when chunks
+    were stored.
+    """
+    text = process_resume(source)
+    chunks = chunk_resume_text(text) if text else []
+    profile = extract_resume_profile(text) if text else None
+
+    stored = UserSession.objects.filter(pk=session.pk, resume_hash=resume_hash).update(
+        resume_chunks=chunks or None, resume_profile=profile, updated_at=timezone.now(),
+    )
+    if stored:
+        session.resume_hash = resume_hash
+        session.resume_chunks = chunks or None
+        session.resume_profile = profile
+    return bool(stored and chunks)
+
@@ -0,0 +1,179 @@
+import json
+import re
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+# Schemas for the two roadmap shapes the LLM is asked for, plus a cheap local
+# repair pass for near-miss JSON (code fences, chatter after the object,
+# trailing commas, output cut off at max_tokens) so a malformed reply does
+# not cost a full regeneration.
+
+
+# --- Schemas ---
+def _split_string_list(value):
+    # Models sometimes return "A, B, C" where a list was asked for
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(',') if item.strip()]
+    return value
+
+
+class SchoolPathway(BaseModel):
+    model_config = ConfigDict(coerce_numbers_to_str=True, str_strip_whitespace=True)
+
+    title: str = Field(min_length=1)
+    skills: list[str] = Field(min_length=1)
+    reasoning: str = ""
+
+    @field_validator('skills', mode='before')
+    @classmethod
+    def _split_skills(cls, value):
+        return _split_string_list(value)
+
+
+class CareerPathway(SchoolPathway):
+    courses_to_find: list[str] = []
+    salary: str = ""
+    growth: str = ""
+
+    @field_validator('courses_to_find', mode='before')
+    @classmethod
+    def _split_courses(cls, value):
+        return _split_string_list(value)
+
+
+class SchoolRoadmap(BaseModel):
+    roadmap: list[SchoolPathway] = Field(min_length=1)
+
+
+class CareerRoadmap(BaseModel):
+    roadmap: list[CareerPathway] = Field(min_length=1)
+
+
+def roadmap_schema_for(status):
+    """
+    School students get academic fields; everyone else gets career pathways.
+    """
+    return SchoolRoadmap if status == 'school_student' else CareerRoadmap
+
+
+def _drop_invalid_pathways(pathway_schema, data):
+    # Keep the pathways that validate (e.g. all but one cut off at max_tokens)
+    pathways = data.get('roadmap') if isinstance(data, dict) else None
+    if not isinstance(pathways, list):
+        return data
+    valid = []
+    for pathway in pathways:
+        try:
+            pathway_schema.model_validate(pathway)
+        except ValidationError:
+            continue
+        valid.append(pathway)
+    return {**data, 'roadmap': valid}
+
+
+# --- Repair ---
+def _close_json(text):
+    """
+    Appends whatever closing quote and brackets `text` is missing.
+    """
+    closers = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            closers.append('}' if char == '{' else ']')
+        elif char in '}]' and closers and closers[-1] == char:
+            closers.pop()
+    if in_string:
+        text += '"'
+    return text + ''.join(reversed(closers))
+
+
+def _first_object(text):
+    """
+    Returns `text` from its first '{' or '[' up to the bracket that closes it,
+    dropping any trailing chatter. Unclosed input is returned as is.
+    """
+    start = min((i for i in (text.find('{'), text.find('[')) if i != -1), default=-1)
+    if start == -1:
+        raise ValueError("Could not find a JSON object in the AI's response.")
+    text = text[start:]
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            depth += 1
+        elif char in '}]':
+            depth -= 1
+            if depth == 0:
+                return text[:index + 1]
+    return text
+
+
+def repair_json(text, max_cuts=20):
+    """
+    Parses `text` as JSON, fixing common LLM mistakes along the way. Output
+    cut off mid-object is closed after its last complete value.
+    Raises ValueError if nothing parseable is left.
+    """
+    fenced = re.search(r'```(?:json)?\s*(.*?)(?:```|$)', text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1)
+    text = _first_object(text.strip())
+    text = re.sub(r',\s*([}\]])', r'\1', text)
+
+    for _ in range(max_cuts):
+        candidate = re.sub(r'[\s,:]+$', '', text)
+        try:
+            return json.loads(re.sub(r',\s*([}\]])', r'\1', _close_json(candidate)))
+        except json.JSONDecodeError:
+            pass
+        cut = text.rfind(',')
+        if cut <= 0:
+            break
+        text = text[:cut]
+    raise ValueError("Could not repair the JSON in the AI's response.")
+
+
+# --- Parsing ---
+def parse_roadmap(llm_output_text, status):
+    """
+    Returns the validated roadmap dict for a session status, repairing the
+    JSON locally if needed. Raises ValueError (including pydantic's
+    ValidationError) if the reply cannot be turned into a roadmap.
+    """
+    try:
+        data = json.loads(llm_output_text)
+    except json.JSONDecodeError:
+        data = repair_json(llm_output_text)
+        print("Roadmap JSON was malformed and has been repaired locally.")
+
+    if isinstance(data, list):
+        data = {"roadmap": data}
+    schema = roadmap_schema_for(status)
+    try:
+        return schema.model_validate(data).model_dump()
+    except ValidationError as e:
+        print(f"Roadmap failed validation, keeping the valid pathways: {e}")
+        pathway_schema = SchoolPathway if schema is SchoolRoadmap else CareerPathway
+        return schema.model_validate(_drop_invalid_pathways(pathway_schema, data)).model_dump()
@@ -0,0 +1,176 @@
+import copy
+import re
+import threading
+
+import numpy as np
+from cachetools import TTLCache
+from django.conf import settings
+
+from .llm_engine import personalize_roadmap
+from .models import ChatMessage, RoadmapTemplate, UserSession
+from .vector_store import EMBEDDING_DIM, embed_texts
+
+# School roadmaps cluster heavily by level, field and what the student talks
+# about, so past roadmaps are grouped offline into templates (see
+# `manage.py build_roadmap_templates`). A new session whose conversation is
+# close enough to a template's cluster gets that roadmap without an LLM call.
+
+# Statuses whose roadmaps don't depend on per-user data like resumes or courses
+TEMPLATE_STATUSES = ('school_student',)
+
+# Function words and generic verbs of liking say little about a student's
+# interests but dominate hashed bag-of-words vectors, so they are dropped, and
+# the rest are crudely stemmed so e.g. "games"/"game" and "robots"/"robot" match.
+STOPWORDS = frozenset("""
+a about am an and are as at be because been but by can could do does doing don't for from have having how
+i i'm if in into is it it's just like me more my myself no not of on or so some than that the their them
+then there these they this to too very was we what when which who why will with would yes you your
+really want love enjoy interested
+""".split())
+STEM_SUFFIXES = ('ing', 'es', 'ed', 's')
+
+_template_cache = TTLCache(maxsize=64, ttl=settings.ROADMAP_TEMPLATE_CACHE_TTL)
+_cache_lock = threading.Lock()
+
+
+# --- Profile Features ---
+def _stem(word):
+    for suffix in STEM_SUFFIXES:
+        if len(word) > 4 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def profile_text(session):
+    """
+    Returns the user's side of the conversation as stemmed keywords.
+    """
+    messages = ChatMessage.objects.filter(session=session, sender='user').values_list('message', flat=True)
+    words = re.findall(r"[\w']+", " ".join(messages).lower())
+    return " ".join(_stem(word) for word in words if word not in STOPWORDS)
+
+
+def embed_profiles(texts):
+    # Keywords only: word order in a chat says little about the profile
+    return embed_texts(texts, bigrams=False)
+
+
+def _centroid(vectors):
+    centroid = vectors.mean(axis=0)
+    norm = np.linalg.norm(centroid)
+    return (centroid / norm if norm else centroid).astype(np.float32)
+
+
+# --- Building ---
+def _cluster(vectors, threshold):
+    """
+    Greedy single-pass clustering: each vector joins the most similar cluster
+    centroid if it is within `threshold`, otherwise it starts a new cluster.
+    Returns lists of row indexes.
+    """
+    clusters, centroids = [], []
+    for row, vector in enumerate(vectors):
+        if centroids:
+            scores = np.stack(centroids) @ vector
+            best = int(np.argmax(scores))
+            if scores[best] >= threshold:
+                clusters[best].append(row)
+                centroids[best] = _centroid(vectors[clusters[best]])
+                continue
+        clusters.append([row])
+        centroids.append(vector)
+    return clusters
+
+
+def build_templates(status='school_student', min_support=3, cluster_threshold=0.5):
+    """
+    Clusters past sessions' conversations per (level, field) and returns
+    unsaved RoadmapTemplates for clusters of at least `min_support` sessions.
+    Each template uses the roadmap of the session closest to its centroid.
+    Only LLM-generated roadmaps are used, so the store never learns from its
+    own output.
+    """
+    groups = {}
+    sessions = UserSession.objects.filter(status=status, roadmap_data__isnull=False, roadmap_source='llm').only(
+        'session_id', 'status', 'level', 'field', 'roadmap_data'
+    )
+    for session in sessions.iterator():
+        if not isinstance(session.roadmap_data, dict) or not session.roadmap_data.get('roadmap'):
+            continue
+        groups.setdefault((session.level, session.field), []).append(session)
+
+    templates = []
+    for (level, field), group in groups.items():
+        vectors = embed_profiles([profile_text(session) for session in group])
+        for rows in _cluster(vectors, cluster_threshold):
+            if len(rows) < min_support:
+                continue
+            centroid = _centroid(vectors[rows])
+            medoid = rows[int(np.argmax(vectors[rows] @ centroid))]
+            templates.append(RoadmapTemplate(
+                status=status,
+                level=level,
+                field=field,
+                centroid=centroid.tobytes(),
+                roadmap_data=group[medoid].roadmap_data,
+                support=len(rows),
+            ))
+    return templates
+
+
+# --- Matching ---
+def _load_templates(status, level, field):
+    key = (status, level, field)
+    with _cache_lock:
+        cached = _template_cache.get(key)
+    if cached is not None:
+        return cached
+
+    templates = list(RoadmapTemplate.objects.filter(status=status, level=level, field=field))
+    matrix = np.zeros((len(templates), EMBEDDING_DIM), dtype=np.float32)
+    for row, template in enumerate(templates):
+        matrix[row] = np.frombuffer(bytes(template.centroid), dtype=np.float32)
+
+    with _cache_lock:
+        _template_cache[key] = (matrix, templates)
+    return matrix, templates
+
+
+def clear_template_cache():
+    with _cache_lock:
+        _template_cache.clear()
+
+
+def match_template(session, threshold=None):
+    """
+    Returns (template, similarity) for the closest template at or above the
+    threshold, or None when the full LLM should run.
+    """
+    if not settings.ROADMAP_TEMPLATES_ENABLED or session.status not in TEMPLATE_STATUSES:
+        return None
+    threshold = settings.ROADMAP_TEMPLATE_THRESHOLD if threshold is None else threshold
+
+    matrix, templates = _load_templates(session.status, session.level, session.field)
+    if not templates:
+        return None
+    scores = matrix @ embed_profiles([profile_text(session)])[0]
+    best = int(np.argmax(scores))
+    if scores[best] < threshold:
+        return None
+    return templates[best], float(scores[best])
+
+
+def roadmap_from_template(session, history_text):
+    """
+    Returns a roadmap for the session from the template store, or None.
+    """
+    match = match_template(session)
+    if match is None:
+        return None
+    template, similarity = match
+    print(f"Serving roadmap for {session.session_id} from template {template.template_id} (similarity {similarity:.2f})")
+
+    roadmap = copy.deepcopy(template.roadmap_data)
+    if settings.ROADMAP_TEMPLATE_PERSONALIZE:
+        roadmap = personalize_roadmap(roadmap, history_text)
+    return roadmap
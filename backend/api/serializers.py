@@ -14,13 +14,6 @@ class ChatMessageSerializer(serializers.ModelSerializer):
         model = ChatMessage
         fields = ['message_id', 'sender', 'message', 'timestamp']
 
-class ChatHistorySerializer(serializers.ModelSerializer):
-    messages = ChatMessageSerializer(many=True, read_only=True)
-
-    class Meta:
-        model = UserSession
-        fields = ['session_id', 'name', 'status', 'messages']
-
 class ChatSendSerializer(serializers.Serializer):
     session_id = serializers.UUIDField()
     message = serializers.CharField()
@@ -0,0 +1,673 @@
+import asyncio
+import json
+import shutil
+import uuid
+import tempfile
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import llm_cache, metrics
+from .chat_socket import chat_socket
+from .history import build_chat_history, decode_cursor, encode_cursor, fetch_history_page, record_message
+from .llm_engine import age_range
+from .jobs import claim_job, claim_next_job, enqueue_job, queue_roadmap_draft, run_job, run_unclaimed_jobs
+from .management.commands.benchmark_pipeline import _resume_pdf
+from .llm_gateway import LLMRouter, LLMUnavailable, build_gateway, build_router
+from .models import BackgroundJob, ChatMessage, UserSession
+from .roadmap_schema import repair_json
+
+
+def make_session(**fields):
+    return UserSession.objects.create(**{'status': 'college_student', 'name': 'Test', 'age': 20, **fields})
+
+
+# Offline stand-ins for every provider, with no latency or rate limits
+FAKE_ROUTES = {'chat': ['fake'], 'roadmap': ['fake'], 'resume': ['fake']}
+FAKE_GATEWAY_OPTIONS = {'fake:fake': {'fake_latency': 0.0, 'requests_per_minute': None, 'tokens_per_minute': None}}
+
+
+@override_settings(YOUTUBE_BACKEND='fake', FAKE_YOUTUBE_LATENCY=0.0, JOB_INLINE_AFTER_SECONDS=60)
+class PipelineTestCase(TestCase):
+    """
+    Runs requests through the API with the fake LLM and YouTube backends.
+    Jobs are only run when a test runs them.
+    """
+
+    def setUp(self):
+        router = mock.patch('backend.api.llm_gateway._router', build_router(FAKE_ROUTES, FAKE_GATEWAY_OPTIONS))
+        router.start()
+        self.addCleanup(router.stop)
+        self.api = APIClient()
+        self.session = make_session()
+
+    def run_queued_jobs(self):
+        while (job := claim_next_job()) is not None:
+            run_job(job)
+
+    def run_threads_inline(self):
+        """
+        Makes the in-process fallback run its jobs before returning, on the
+        test's own DB connection.
+        """
+        class InlineThread:
+            def __init__(self, target, args=(), daemon=None):
+                self.target, self.args = target, args
+
+            def start(self):
+                self.target(*self.args)
+
+        for patcher in (
+            mock.patch('backend.api.jobs.threading', SimpleNamespace(Thread=InlineThread)),
+            mock.patch('backend.api.jobs.connections'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def send(self, message):
+        response = self.api.post('/api/send_message/', {
+            'session_id': self.session.session_id, 'message': message,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response
+
+
+# --- Roadmap JSON Repair ---
+class RepairJsonTests(SimpleTestCase):
+    def test_strips_code_fence_and_trailing_chatter(self):
+        text = 'Here you go:\n```json\n{"roadmap": [{"title": "A"}]}\n```\nHope this helps!'
+        self.assertEqual(repair_json(text), {"roadmap": [{"title": "A"}]})
+
+    def test_drops_trailing_commas(self):
+        self.assertEqual(repair_json('{"roadmap": [{"title": "A",}, ],}'), {"roadmap": [{"title": "A"}]})
+
+    def test_closes_truncated_output_after_last_complete_value(self):
+        text = '{"roadmap": [{"title": "A", "skills": ["x"]}, {"title": "B", "skills": ["y", "z'
+        data = repair_json(text)
+        self.assertEqual(data["roadmap"][0], {"title": "A", "skills": ["x"]})
+        self.assertEqual(data["roadmap"][1]["title"], "B")
+
+    def test_raises_when_there_is_no_json(self):
+        with self.assertRaises(ValueError):
+            repair_json("Sorry, I can't help with that.")
+
+
+# --- History Cursors ---
+class HistoryCursorTests(TestCase):
+    def setUp(self):
+        self.session = make_session()
+
+    def test_cursor_round_trip(self):
+        timestamp = timezone.now()
+        message = record_message(self.session, 'user', 'hi')
+        self.assertEqual(decode_cursor(encode_cursor(timestamp, message.message_id)), (timestamp, message.message_id))
+
+    def test_malformed_cursor_raises_value_error(self):
+        for cursor in ('not-a-cursor', encode_cursor(timezone.now(), 'x')[:-4], ''):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+    def test_pages_through_messages_sharing_a_timestamp(self):
+        # Same-timestamp rows are ordered by message_id, so a cursor between them skips none
+        timestamp = timezone.now()
+        ChatMessage.objects.bulk_create([
+            ChatMessage(session=self.session, sender='user', message=str(index), timestamp=timestamp)
+            for index in range(5)
+        ])
+        seen, cursor, has_more = [], None, True
+        while has_more:
+            page, cursor, has_more = fetch_history_page(self.session, since=cursor, limit=2)
+            seen.extend(row['message'] for row in page)
+        self.assertEqual(sorted(seen), [str(index) for index in range(5)])
+        self.assertEqual(len(seen), 5)
+
+    def test_cursor_only_returns_newer_messages(self):
+        record_message(self.session, 'user', 'first')
+        _, cursor, has_more = fetch_history_page(self.session)
+        self.assertFalse(has_more)
+        self.assertEqual(fetch_history_page(self.session, since=cursor), ([], cursor, False))
+
+        record_message(self.session, 'ai', 'second')
+        page, next_cursor, _ = fetch_history_page(self.session, since=cursor)
+        self.assertEqual([row['message'] for row in page], ['second'])
+        self.assertNotEqual(next_cursor, cursor)
+
+
+# --- Job Queue ---
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.session = make_session()
+
+    def test_enqueue_joins_the_active_job(self):
+        first = enqueue_job(self.session, 'roadmap')
+        second = enqueue_job(self.session, 'roadmap')
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(BackgroundJob.objects.filter(session=self.session, kind='roadmap').count(), 1)
+
+    def test_enqueue_creates_a_new_job_once_the_active_one_finished(self):
+        first = enqueue_job(self.session, 'roadmap')
+        BackgroundJob.objects.filter(pk=first.pk).update(status='done')
+        self.assertNotEqual(enqueue_job(self.session, 'roadmap').pk, first.pk)
+
+    def test_enqueue_retries_when_the_conflicting_job_finished_meanwhile(self):
+        # The unique index rejects the insert, but the job it clashed with is gone by the lookup
+        create = mock.patch.object(
+            BackgroundJob.objects, 'create', wraps=BackgroundJob.objects.create,
+            side_effect=[IntegrityError("UNIQUE constraint failed"), mock.DEFAULT],
+        )
+        with create as create, mock.patch('backend.api.jobs.active_job', return_value=None):
+            job = enqueue_job(self.session, 'roadmap')
+        self.assertEqual(create.call_count, 2)
+        self.assertEqual((job.kind, job.status), ('roadmap', 'pending'))
+
+    def test_resume_jobs_are_not_single_flight(self):
+        first = enqueue_job(self.session, 'resume', payload={'path': 'resumes/uploads/one.pdf', 'hash': 'one'})
+        second = enqueue_job(self.session, 'resume', payload={'path': 'resumes/uploads/two.pdf', 'hash': 'two'})
+        self.assertNotEqual(first.pk, second.pk)
+
+    @override_settings(JOB_LEASE_SECONDS=60)
+    def test_running_job_is_reclaimed_after_its_lease(self):
+        job = enqueue_job(self.session, 'welcome')
+        self.assertTrue(claim_job(job))
+        self.assertIsNone(claim_next_job())
+
+        BackgroundJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(seconds=61))
+        reclaimed = claim_next_job()
+        self.assertEqual(reclaimed.pk, job.pk)
+        self.assertEqual(reclaimed.attempts, 2)
+
+    def test_claim_job_is_won_once(self):
+        job = enqueue_job(self.session, 'welcome')
+        other = BackgroundJob.objects.get(pk=job.pk)
+        self.assertTrue(claim_job(job))
+        self.assertFalse(claim_job(other))
+
+    @override_settings(JOB_MAX_ATTEMPTS=2)
+    def test_failed_job_is_retried_then_marked_failed(self):
+        job = enqueue_job(self.session, 'roadmap')
+        with mock.patch.dict('backend.api.jobs.JOB_HANDLERS', {'roadmap': mock.Mock(side_effect=ValueError('boom'))}):
+            claim_job(job)
+            self.assertFalse(run_job(job))
+            self.assertEqual(job.status, 'pending')
+            claim_job(job)
+            self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'boom'))
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.roadmap_status, 'failed')
+
+
+# --- Roadmap Polling ---
+class GetRoadmapTests(PipelineTestCase):
+    def url(self):
+        return f'/api/roadmap/{self.session.session_id}/'
+
+    def ask_for_roadmap(self):
+        response = self.api.post('/api/send_message/', {
+            'session_id': self.session.session_id, 'message': 'Please generate my career roadmap',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_not_requested_yet(self):
+        self.assertEqual(self.api.get(self.url()).status_code, 404)
+
+    def test_pending_roadmap_answers_202_until_the_job_is_done(self):
+        self.ask_for_roadmap()
+        response = self.api.get(self.url())
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data, {'status': 'pending', 'progress': 0})
+
+        self.run_queued_jobs()
+        response = self.api.get(self.url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['roadmap'][0]['title'], 'Software Engineering')
+
+    @override_settings(JOB_MAX_ATTEMPTS=1)
+    def test_failed_roadmap_answers_200_with_failed_status(self):
+        self.ask_for_roadmap()
+        with mock.patch('backend.api.jobs.generate_career_roadmap', return_value={'error': 'boom'}):
+            self.run_queued_jobs()
+        response = self.api.get(self.url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'failed')
+        self.assertIn('error', response.data)
+
+
+# --- Welcome Message ---
+class WelcomeMessageTests(PipelineTestCase):
+    def setUp(self):
+        super().setUp()
+        response = self.api.post('/api/submit_questionnaire/', {
+            'status': 'school_student', 'level': 'class_12', 'name': 'Asha', 'age': 17,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.session = UserSession.objects.get(session_id=response.data['session_id'])
+        self.job = BackgroundJob.objects.get(session=self.session, kind='welcome')
+
+    def history(self):
+        response = self.api.get(f'/api/get_chat_history/{self.session.session_id}/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_questionnaire_only_queues_the_welcome(self):
+        self.assertEqual(self.job.status, 'pending')
+        self.assertFalse(ChatMessage.objects.filter(session=self.session).exists())
+
+    def test_history_starts_the_job_without_waiting_for_it(self):
+        with mock.patch('backend.api.jobs.threading') as threading:
+            first, second = self.history(), self.history()
+        self.assertEqual((first['messages'], first['welcome_pending']), ([], True))
+        self.assertTrue(second['welcome_pending'])
+        # Claimed by the first fetch, so the second leaves it alone
+        threading.Thread.assert_called_once()
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, 'running')
+
+    def test_history_leaves_a_job_a_worker_claimed(self):
+        self.assertTrue(claim_job(self.job))
+        with mock.patch('backend.api.jobs.threading') as threading:
+            self.assertTrue(self.history()['welcome_pending'])
+        threading.Thread.assert_not_called()
+
+    def test_welcome_is_written_by_the_job(self):
+        self.run_threads_inline()
+        page = self.history()
+        self.assertFalse(page['welcome_pending'])
+        self.assertEqual([message['sender'] for message in page['messages']], ['ai'])
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, 'done')
+
+    def test_worker_runs_the_welcome_job(self):
+        self.run_queued_jobs()
+        page = self.history()
+        self.assertFalse(page['welcome_pending'])
+        self.assertEqual(len(page['messages']), 1)
+
+
+# --- Chat Turns ---
+class ChatTurnTests(PipelineTestCase):
+    def saved_messages(self):
+        return list(ChatMessage.objects.filter(session=self.session).order_by('timestamp').values_list('sender', 'message'))
+
+    def test_turn_saves_the_message_then_the_reply(self):
+        with mock.patch('backend.api.views.chat_with_ai', return_value='Tell me more.') as chat:
+            self.send('I like biology')
+        # The prompt's history is built before the message is saved
+        self.assertNotIn('I like biology', chat.call_args.args[2])
+        self.assertEqual(self.saved_messages(), [('user', 'I like biology'), ('ai', 'Tell me more.')])
+
+    def test_message_is_kept_when_the_llm_is_unavailable(self):
+        with mock.patch('backend.api.views.chat_with_ai', side_effect=LLMUnavailable('all busy')):
+            response = self.api.post('/api/send_message/', {
+                'session_id': self.session.session_id, 'message': 'I like biology',
+            }, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.saved_messages(), [('user', 'I like biology')])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.message_count, 1)
+
+    def test_message_is_kept_when_the_stream_breaks(self):
+        def broken_stream(context, message, history):
+            yield 'Biology is'
+            raise ConnectionError('connection reset')
+
+        with mock.patch('backend.api.views.stream_chat_with_ai', broken_stream):
+            response = self.api.post('/api/send_message/stream/', {
+                'session_id': self.session.session_id, 'message': 'I like biology',
+            }, format='json')
+            body = b''.join(response.streaming_content).decode()
+        self.assertIn('event: error', body)
+        self.assertNotIn('event: done', body)
+        self.assertEqual(self.saved_messages(), [('user', 'I like biology')])
+
+
+# --- Chat Socket ---
+class ChatSocketTests(PipelineTestCase):
+    def setUp(self):
+        super().setUp()
+        # Run the socket's DB work on the test's thread, inside its transaction
+        patcher = mock.patch('backend.api.chat_socket.database_sync_to_async', sync_to_async)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def converse(self, *frames, until=None, session_id=None, origin=None):
+        """
+        Connects to the session's socket, sends each frame and waits for its
+        reply, then for a frame of type `until`, and disconnects. Returns
+        every frame the server sent.
+        """
+        scope = {
+            'type': 'websocket', 'path': f'/ws/chat/{session_id or self.session.session_id}/',
+            'headers': [(b'origin', origin.encode())] if origin else [],
+        }
+        sent = []
+
+        async def arrived(*kinds):
+            seen = len(sent)
+            while not app.done() and not any(frame.get('type') in kinds for frame in sent[seen:]):
+                await asyncio.sleep(0.01)
+
+        async def send(event):
+            sent.append(json.loads(event['text']) if 'text' in event else event)
+
+        async def run():
+            nonlocal app
+            inbox = asyncio.Queue()
+            await inbox.put({'type': 'websocket.connect'})
+            app = asyncio.ensure_future(chat_socket(scope, inbox.get, send))
+            await asyncio.wait_for(arrived('ready'), 5)
+            for text in frames:
+                await inbox.put({'type': 'websocket.receive', 'text': text})
+                await asyncio.wait_for(arrived('done', 'error'), 5)
+            if until:
+                await asyncio.wait_for(arrived(until), 5)
+            await inbox.put({'type': 'websocket.disconnect'})
+            await asyncio.wait_for(app, 5)
+
+        app = None
+        async_to_sync(run)()
+        return sent
+
+    def of_type(self, frames, kind):
+        return [frame for frame in frames if frame.get('type') == kind]
+
+    def test_unknown_session_is_rejected(self):
+        self.assertEqual(self.converse(session_id=uuid.uuid4()), [{'type': 'websocket.close'}])
+
+    @override_settings(CORS_ALLOW_ALL_ORIGINS=False, CORS_ALLOWED_ORIGINS=['http://localhost:3000'], CORS_ALLOWED_ORIGIN_REGEXES=[])
+    def test_foreign_origin_is_rejected(self):
+        self.assertEqual(self.converse(origin='http://evil.example'), [{'type': 'websocket.close'}])
+
+    def test_sends_history_then_ready(self):
+        record_message(self.session, 'ai', 'Hi Test!')
+        frames = self.converse()
+        self.assertEqual(frames[0], {'type': 'websocket.accept'})
+        self.assertEqual([message['message'] for message in frames[1]['messages']], ['Hi Test!'])
+        self.assertEqual(frames[2], {'type': 'ready', 'welcome_pending': False, 'roadmap_status': None, 'resume_status': None})
+
+    def test_pushes_the_welcome_once_it_is_saved(self):
+        enqueue_job(self.session, 'welcome')
+        self.run_threads_inline()
+        frames = self.converse(until='messages')
+        self.assertTrue(self.of_type(frames, 'ready')[0]['welcome_pending'])
+        self.assertEqual([message['sender'] for message in self.of_type(frames, 'messages')[0]['messages']], ['ai'])
+
+    def test_turn_streams_tokens_and_saves_the_turn(self):
+        record_message(self.session, 'ai', 'Hi Test!')
+        frames = self.converse(json.dumps({'type': 'message', 'message': 'I like biology'}))
+        tokens = ''.join(frame['delta'] for frame in self.of_type(frames, 'token'))
+        self.assertTrue(tokens)
+        done = self.of_type(frames, 'done')[0]['message']
+        self.assertEqual(done['message'], tokens)
+        saved = list(ChatMessage.objects.filter(session=self.session).order_by('timestamp').values_list('sender', 'message'))
+        self.assertEqual(saved[1:], [('user', 'I like biology'), ('ai', tokens)])
+
+    def test_roadmap_turn_reports_its_status(self):
+        record_message(self.session, 'ai', 'Hi Test!')
+        frames = self.converse(json.dumps({'type': 'message', 'message': 'Please generate my career roadmap'}))
+        self.assertIn('/roadmap/', self.of_type(frames, 'done')[0]['message']['message'])
+        self.assertEqual(self.of_type(frames, 'roadmap'), [{'type': 'roadmap', 'status': 'pending'}])
+
+    def test_bad_frames_get_an_error(self):
+        record_message(self.session, 'ai', 'Hi Test!')
+        frames = self.converse('not json', json.dumps({'type': 'typing'}))
+        self.assertEqual([frame['error'] for frame in self.of_type(frames, 'error')], ['Frames must be JSON.', 'Unknown frame type.'])
+
+
+# --- Roadmap Drafts ---
+@override_settings(ROADMAP_DRAFT_AT=2, JOB_INLINE_AFTER_SECONDS=0)
+class RoadmapDraftTests(PipelineTestCase):
+    def draft_jobs(self):
+        return BackgroundJob.objects.filter(session=self.session, kind='roadmap_draft')
+
+    def test_draft_is_built_and_served_without_a_worker(self):
+        self.run_threads_inline()
+        self.send('I enjoy programming and building small apps')
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.roadmap_draft_status, 'pending')
+        self.assertIsNone(self.session.roadmap_draft)
+
+        # The next turn finds the draft unclaimed and runs it
+        self.send('What does a software engineer do all day?')
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.roadmap_draft_status, 'done')
+        self.assertTrue(self.session.roadmap_draft)
+        self.assertEqual(list(self.draft_jobs().values_list('status', flat=True)), ['done'])
+
+        # Nothing new was said since, so the draft is the roadmap
+        self.send('Please generate my career roadmap')
+        self.assertFalse(BackgroundJob.objects.filter(session=self.session, kind='roadmap').exists())
+        response = self.api.get(f'/api/roadmap/{self.session.session_id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, self.session.roadmap_draft)
+
+    def test_claimed_draft_is_not_run_again(self):
+        queue_roadmap_draft(self.session)
+        self.assertTrue(claim_job(self.draft_jobs().get()))
+        with mock.patch('backend.api.jobs.threading') as threading:
+            self.assertEqual(run_unclaimed_jobs(self.session), [])
+        threading.Thread.assert_not_called()
+
+    def test_roadmap_job_supersedes_a_pending_draft(self):
+        queue_roadmap_draft(self.session)
+        self.send('Please generate my career roadmap')
+        job = claim_next_job(kinds=['roadmap'])
+        run_job(job)
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.roadmap_status, 'done')
+        self.assertEqual(self.session.roadmap_draft_status, 'failed')
+        self.assertEqual(self.draft_jobs().get().error, 'Superseded by a newer job.')
+
+
+# --- Resume Uploads ---
+class UploadResumeTests(PipelineTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = self.settings(MEDIA_ROOT=media_root, RESUME_INDEX_DIR=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def upload(self, content, name='resume.pdf'):
+        return self.api.post('/api/resume/upload/', {
+            'session_id': str(self.session.session_id), 'resume': SimpleUploadedFile(name, content, content_type='application/pdf'),
+        }, format='multipart')
+
+    def resume_jobs(self):
+        return BackgroundJob.objects.filter(session=self.session, kind='resume')
+
+    @override_settings(RESUME_MAX_UPLOAD_BYTES=1024)
+    def test_rejects_oversized_files(self):
+        response = self.upload(b'%PDF-' + b'0' * 2048)
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(self.resume_jobs().exists())
+
+    def test_rejects_files_that_are_not_pdfs(self):
+        response = self.upload(b'GIF89a not a resume', name='resume.pdf')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.resume_jobs().exists())
+
+    def test_job_gets_the_stored_path_and_deletes_the_file(self):
+        response = self.upload(_resume_pdf(["Python developer", "Skills: Python, SQL, Django"]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['resume_status'], 'pending')
+
+        payload = self.resume_jobs().get().payload
+        self.assertEqual(set(payload), {'path', 'hash'})
+        self.assertTrue(default_storage.exists(payload['path']))
+
+        self.run_queued_jobs()
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.resume_status, 'done')
+        self.assertTrue(self.session.resume_chunks)
+        self.assertFalse(default_storage.exists(payload['path']))
+        self.assertIsNone(self.resume_jobs().get().payload)
+
+    def test_newer_upload_deletes_the_superseded_file(self):
+        self.upload(_resume_pdf(["First resume"]))
+        first = self.resume_jobs().get().payload['path']
+        self.upload(_resume_pdf(["Second resume"]))
+        self.assertFalse(default_storage.exists(first))
+        self.assertEqual(self.resume_jobs().filter(status='pending').count(), 1)
+
+
+# --- LLM Response Cache ---
+class LLMCacheTests(TestCase):
+    def setUp(self):
+        llm_cache._memory.clear()
+        llm_cache._shared_cache().clear()
+
+    def test_hits_misses_and_hit_rate(self):
+        before = llm_cache.cache_stats()
+        key = llm_cache.make_key('fake:fake', [{"role": "user", "content": "hi"}], temperature=0.3)
+        self.assertIsNone(llm_cache.get_cached(key))
+        llm_cache.store_cached(key, "hello")
+        self.assertEqual(llm_cache.get_cached(key), "hello")
+
+        # Another worker only has the shared tier
+        llm_cache._memory.clear()
+        self.assertEqual(llm_cache.get_cached(key), "hello")
+
+        after = llm_cache.cache_stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['memory_hits'] - before['memory_hits'], 1)
+        self.assertEqual(after['shared_hits'] - before['shared_hits'], 1)
+        lookups = after['memory_hits'] + after['shared_hits'] + after['misses']
+        self.assertAlmostEqual(after['hit_rate'], (after['memory_hits'] + after['shared_hits']) / lookups)
+
+    def test_hit_ages_fall_into_fixed_buckets(self):
+        key = llm_cache.make_key('fake:fake', [{"role": "user", "content": "age"}])
+        with mock.patch('backend.api.llm_cache.time.time', return_value=1000.0):
+            llm_cache.store_cached(key, "hello")
+        with mock.patch('backend.api.llm_cache.time.time', return_value=1000.0 + 7200):
+            llm_cache.get_cached(key)
+
+        output = metrics.render_prometheus()
+        self.assertIn('llm_cache_hit_age_seconds_bucket{tier="memory",le="3600"} 0', output)
+        self.assertIn('llm_cache_hit_age_seconds_bucket{tier="memory",le="14400"} 1', output)
+        self.assertNotRegex(output, r'llm_cache\S*\{[^}]*age=')
+
+    def test_bare_shared_entries_are_still_served(self):
+        llm_cache._shared_cache().set('llm:legacy', "old reply")
+        self.assertEqual(llm_cache.get_cached('llm:legacy'), "old reply")
+
+    @override_settings(DEBUG=True)
+    def test_metrics_endpoint_exports_cache_stats(self):
+        with mock.patch('backend.api.views.get_router', return_value=LLMRouter({})):
+            body = self.client.get('/api/metrics').content.decode()
+        for name in ('llm_cache_hits_total{tier="memory"}', 'llm_cache_hits_total{tier="shared"}',
+                     'llm_cache_misses_total ', 'llm_cache_hit_rate ', 'llm_cache_memory_entries '):
+            self.assertIn(name, body)
+
+    def test_welcome_prompt_uses_age_ranges(self):
+        self.assertEqual([age_range(age) for age in (13, 16, 17, 21, 25, 40)],
+                         ["14 or younger", "15-18", "15-18", "19-22", "23-30", "over 30"])
+
+
+# --- LLM Router ---
+def fake_gateway(model, error_rate=0.0):
+    return build_gateway('fake', model, fake_latency=0.0, fake_error_rate=error_rate, max_retries=0,
+                         requests_per_minute=None, tokens_per_minute=None)
+
+
+class LLMRouterTests(SimpleTestCase):
+    messages = [{"role": "user", "content": "hello"}]
+
+    def make_router(self, *gateways, **options):
+        return LLMRouter({'chat': list(gateways)}, explore_rate=0.0, failover_retries=0, **options)
+
+    def test_falls_back_to_the_next_gateway(self):
+        broken, healthy = fake_gateway('broken', error_rate=1.0), fake_gateway('healthy')
+        router = self.make_router(broken, healthy)
+        response = router.create('chat', self.messages)
+        self.assertTrue(response.choices[0].message.content)
+
+        stats = router.provider_stats()
+        self.assertEqual(stats['fake:broken']['failures'], 1)
+        self.assertEqual(stats['fake:healthy']['calls'], 1)
+        # The failure makes the broken gateway the slower choice from now on
+        self.assertEqual([gateway.model for gateway in router.candidates('chat')], ['healthy', 'broken'])
+
+    def test_raises_when_every_gateway_fails(self):
+        router = self.make_router(fake_gateway('a', error_rate=1.0), fake_gateway('b', error_rate=1.0))
+        with self.assertRaises(LLMUnavailable):
+            router.create('chat', self.messages)
+
+    def test_empty_route_raises_llm_unavailable(self):
+        router = LLMRouter({'chat': []})
+        with self.assertRaisesMessage(LLMUnavailable, "No LLM providers configured for chat"):
+            router.create('chat', self.messages)
+        with self.assertRaisesMessage(LLMUnavailable, "No LLM providers configured for roadmap"):
+            async_to_sync(router.acreate)('roadmap', self.messages)
+
+    def test_orders_by_ewma_latency_with_unmeasured_gateways_last(self):
+        slow, fast, fresh = fake_gateway('slow'), fake_gateway('fast'), fake_gateway('fresh')
+        router = self.make_router(fresh, slow, fast, alpha=0.5)
+        router.stats[slow.key].record(2.0, ok=True)
+        router.stats[fast.key].record(1.0, ok=True)
+        self.assertEqual([gateway.model for gateway in router.candidates('chat')], ['fast', 'slow', 'fresh'])
+
+        # Two fast calls move slow's average below fast's
+        router.stats[slow.key].record(0.1, ok=True)
+        router.stats[slow.key].record(0.1, ok=True)
+        self.assertAlmostEqual(router.stats[slow.key].latency, 0.575)
+        self.assertEqual([gateway.model for gateway in router.candidates('chat')], ['slow', 'fast', 'fresh'])
+
+    def test_errors_are_charged_the_error_penalty(self):
+        flaky, steady = fake_gateway('flaky'), fake_gateway('steady')
+        router = self.make_router(steady, flaky, alpha=0.5, error_penalty=10.0)
+        router.stats[flaky.key].record(0.1, ok=True)
+        router.stats[steady.key].record(1.0, ok=True)
+        router.stats[flaky.key].record(0.1, ok=False)
+        self.assertAlmostEqual(router.stats[flaky.key].score(10.0), 0.1 + 0.5 * 10.0)
+        self.assertEqual([gateway.model for gateway in router.candidates('chat')], ['steady', 'flaky'])
+
+
+# --- Chat History Budget ---
+@mock.patch('backend.api.history.count_tokens', lambda text: len(text.split()))
+@mock.patch('backend.api.history.summarize_history', side_effect=lambda previous, transcript: f"summary of {transcript.count(chr(10)) + 1} lines")
+class BuildChatHistoryTests(TestCase):
+    def setUp(self):
+        self.session = make_session()
+        for index in range(10):
+            # 5 tokens per line, counting the "User:" label
+            record_message(self.session, 'user', f"message number {index} here")
+
+    def test_history_within_budget_is_returned_verbatim(self, summarize):
+        history = build_chat_history(self.session, token_budget=100)
+        self.assertEqual(history.splitlines()[0], "User: message number 0 here")
+        self.assertEqual(len(history.splitlines()), 10)
+        summarize.assert_not_called()
+        self.assertIsNone(self.session.summarized_until)
+
+    def test_overflow_folds_oldest_lines_into_the_summary(self, summarize):
+        history = build_chat_history(self.session, token_budget=30)
+        # Half the budget (15 tokens) keeps the newest 3 lines; the other 7 are folded in one call
+        summarize.assert_called_once()
+        self.assertEqual(summarize.call_args.args[1].count("\n") + 1, 7)
+        lines = history.split("\n\n", 1)[1].splitlines()
+        self.assertEqual(lines, [f"User: message number {index} here" for index in (7, 8, 9)])
+        self.assertTrue(history.startswith("Summary of the earlier conversation: summary of 7 lines"))
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.history_summary, "summary of 7 lines")
+        folded_until = ChatMessage.objects.get(session=self.session, message="message number 6 here").timestamp
+        self.assertEqual(self.session.summarized_until, folded_until)
+
+    def test_next_turns_only_read_messages_after_the_summary(self, summarize):
+        build_chat_history(self.session, token_budget=30)
+        record_message(self.session, 'ai', "a short reply")
+        history = build_chat_history(self.session, token_budget=30)
+        summarize.assert_called_once()
+        self.assertNotIn("message number 6 here", history)
+        self.assertTrue(history.endswith("AI: a short reply"))
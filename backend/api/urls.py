@@ -1,12 +1,19 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Under ASGI the LLM-bound endpoints are served by their async versions.
+chat_views = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
     path('test/', views.test_view, name='test_view'),
-    path('submit_questionnaire/', views.submit_questionnaire, name='submit_questionnaire'),
-    path('send_message/', views.send_message, name='send_message'),
+    path('submit_questionnaire/', chat_views.submit_questionnaire, name='submit_questionnaire'),
+    path('send_message/', chat_views.send_message, name='send_message'),
+    path('send_message/stream/', chat_views.send_message_stream, name='send_message_stream'),
     path('get_chat_history/<uuid:session_id>/', views.get_chat_history, name='get_chat_history'),
     path('resume/upload/', views.upload_resume, name='upload_resume'),
+    path('resume/<uuid:session_id>/', views.get_resume_status, name='get_resume_status'),
     path('roadmap/<uuid:session_id>/', views.get_roadmap, name='get_roadmap'),
+    path('metrics', views.get_metrics, name='metrics'),
 ]
 
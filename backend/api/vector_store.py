@@ -0,0 +1,126 @@
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+from cachetools import LRUCache
+from django.conf import settings
+
+from .metrics import span
+
+# --- Embedding Configuration ---
+# A hashing vectorizer needs no model download or network call, so indexes can
+# be built and queried entirely in-process. FAISS is imported where an index
+# is built or loaded, so workers that never see a resume don't load it.
+EMBEDDING_DIM = 1024
+
+# Indexes are derived from the chunks stored on the session, so the files
+# under RESUME_INDEX_DIR are a cache: any process that doesn't find one (a
+# web service that doesn't share the job worker's disk, say) rebuilds it.
+# Recently used indexes stay in memory so most turns skip the disk read.
+_index_cache = LRUCache(maxsize=256)
+_cache_lock = threading.Lock()
+
+
+# --- Embedding ---
+def _features(text: str, bigrams: bool = True):
+    words = re.findall(r"\w+", text.lower())
+    if not bigrams:
+        return words
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def embed_texts(texts, bigrams: bool = True):
+    """
+    Embeds texts as L2-normalised hashed unigram (and by default bigram) vectors.
+    """
+    vectors = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for feature in _features(text, bigrams):
+            h = zlib.crc32(feature.encode('utf-8'))
+            # The top bit picks a sign so hash collisions tend to cancel out
+            vectors[row, h % EMBEDDING_DIM] += 1.0 if h & 0x80000000 else -1.0
+    # Dampen repeated terms so one keyword can't dominate a chunk
+    vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.where(norms == 0, 1.0, norms)
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+# --- Resume Index ---
+class ResumeIndex:
+    """
+    A FAISS inner-product index over one resume's chunks.
+    """
+
+    def __init__(self, index, chunks):
+        self.index = index
+        self.chunks = chunks
+
+    @classmethod
+    def build(cls, chunks):
+        import faiss
+        index = faiss.IndexFlatIP(EMBEDDING_DIM)
+        index.add(embed_texts(chunks))
+        return cls(index, chunks)
+
+    def similarity_search(self, query: str, k: int = 2):
+        """
+        Returns up to k chunks ranked by cosine similarity to the query.
+        """
+        if not self.chunks or not query:
+            return []
+        k = min(k, len(self.chunks))
+        _, ids = self.index.search(embed_texts([query]), k)
+        return [self.chunks[i] for i in ids[0] if i != -1]
+
+
+def _index_path(session):
+    return os.path.join(settings.RESUME_INDEX_DIR, f"{session.session_id}-{session.resume_hash}.faiss")
+
+
+@span("resume.index")
+def build_resume_index(session):
+    """
+    Builds and persists the index for a session's stored resume chunks.
+    """
+    if not session.resume_chunks or not session.resume_hash:
+        return None
+    import faiss
+    resume_index = ResumeIndex.build(session.resume_chunks)
+    path = _index_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename, so a process sharing the directory never reads a partial file
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    faiss.write_index(resume_index.index, temp_path)
+    os.replace(temp_path, path)
+    with _cache_lock:
+        _index_cache[(session.session_id, session.resume_hash)] = resume_index
+    return resume_index
+
+
+def get_resume_index(session):
+    """
+    Returns the session's resume index, loading it from memory or disk on first use.
+    """
+    if not session.resume_chunks or not session.resume_hash:
+        return None
+    key = (session.session_id, session.resume_hash)
+    with _cache_lock:
+        cached = _index_cache.get(key)
+    if cached is not None:
+        return cached
+
+    path = _index_path(session)
+    if not os.path.exists(path):
+        return build_resume_index(session)
+    import faiss
+    try:
+        resume_index = ResumeIndex(faiss.read_index(path), session.resume_chunks)
+    except RuntimeError as e:
+        print(f"Error loading resume index, rebuilding: {e}")
+        return build_resume_index(session)
+    with _cache_lock:
+        _index_cache[key] = resume_index
+    return resume_index
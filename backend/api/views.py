@@ -1,10 +1,30 @@
+import hashlib
+import hmac
+import json
+
+import orjson
+from django.conf import settings
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, renderer_classes
 from rest_framework.response import Response
-from .models import UserSession, ChatMessage
-from .serializers import UserSessionSerializer, ChatMessageSerializer, ChatSendSerializer, ChatHistorySerializer
-from .llm_engine import chat_with_ai, generate_career_roadmap
-from django.http import JsonResponse
+from . import llm_cache, metrics
+from .models import BackgroundJob, UserSession
+from .renderers import EventStreamRenderer, ORJSONRenderer
+from .serializers import UserSessionSerializer, ChatMessageSerializer, ChatSendSerializer
+from .intent import classify_intent
+from .history import build_chat_history, decode_cursor, fetch_history_page, record_message, record_turn
+from .jobs import (
+    active_job, claim_roadmap, draft_is_current, enqueue_job, latest_job, queue_roadmap_draft, roadmap_draft_due,
+    run_unclaimed_jobs, supersede_pending_jobs,
+)
+from .llm_engine import chat_with_ai, stream_chat_with_ai, wants_resume_excerpts
+from .llm_gateway import LLMUnavailable, get_router
+from .resume_store import hash_resume_file, looks_like_pdf
+from .vector_store import get_resume_index
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 
 @api_view(['POST'])
 def submit_questionnaire(request):
@@ -12,12 +32,9 @@ def submit_questionnaire(request):
     if serializer.is_valid():
         session = serializer.save()
         
-        # --- NEW: Generate a dynamic welcome message using the LLM ---
-        context = { "name": session.name, "status": session.status, "age": session.age }
-        # The initial message is a placeholder to trigger the "Phase 1" welcome logic in the LLM.
-        welcome_message = chat_with_ai(context, "The user has just completed the questionnaire and joined the chat.", "")
-        
-        ChatMessage.objects.create(session=session, sender='ai', message=welcome_message)
+        # The LLM welcome message is generated in the background (by a worker,
+        # or started by the first history fetch) so onboarding doesn't wait on the LLM.
+        enqueue_job(session, 'welcome')
         
         return Response({
             'success': True,
@@ -26,6 +43,91 @@ def submit_questionnaire(request):
     
     return Response({'success': False, 'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
+LLM_BUSY_ERROR = 'The AI counselor is busy right now. Please try again in a moment.'
+
+# --- Chat Turn Helpers ---
+def _roadmap_due(session, intent):
+    """
+    Decides whether this turn should produce the roadmap instead of a chat reply.
+    """
+    # 1. Check if the user is explicitly asking for the roadmap (see intent.py)
+    user_wants_roadmap = intent == 'roadmap'
+
+    # 2. Check if the message limit has been reached (counting this message)
+    limit_reached = session.message_count + 1 >= settings.ROADMAP_MESSAGE_LIMIT
+
+    # 3. Skip if a roadmap already exists or is being generated
+    roadmap_in_progress = session.roadmap_status in ('pending', 'running')
+
+    return (limit_reached or user_wants_roadmap) and not session.roadmap_data and not roadmap_in_progress
+
+def _build_chat_context(session, intent=None):
+    # The index is only loaded for turns that still search the resume text
+    wants_excerpts = wants_resume_excerpts(session.resume_profile, intent)
+    return {
+        "name": session.name, "status": session.status, "age": session.age,
+        "resume_index": get_resume_index(session) if wants_excerpts else None,
+        "resume_profile": session.resume_profile, "resume_status": session.resume_status,
+        "intent": intent,
+    }
+
+def _queue_roadmap_reply(session, message_text):
+    """
+    Saves the user's message, queues roadmap generation for the job worker and
+    returns the AI message pointing to it. A draft roadmap that nothing since
+    has changed is served right away instead. If a concurrent request (a
+    double-click or a retry) already claimed the roadmap, this one only points
+    to it.
+    """
+    serve_draft = draft_is_current(session, [message_text])
+    with transaction.atomic():
+        ai_message = record_turn(session, message_text, _roadmap_ready_text(session))
+        if serve_draft:
+            claim_roadmap(session, session.roadmap_draft, session.roadmap_draft_source)
+        elif claim_roadmap(session):
+            enqueue_job(session, 'roadmap')
+    return ai_message
+
+def _record_user_message(session, message_text):
+    """
+    Saves the user's side of an ordinary chat turn before the LLM is called,
+    so the message stays in the history even if no reply comes. Returns it.
+    Build the prompt's history first: it must not contain this message.
+    """
+    return record_message(session, 'user', message_text)
+
+def _record_chat_reply(session, ai_response_text):
+    """
+    Saves the AI's reply to the turn started by _record_user_message and
+    returns it. Queues the draft roadmap once the session nears the message
+    limit, and runs it here on a later turn if no worker has picked it up.
+    """
+    # The turn started one message ago, with the user's message
+    previous_count = session.message_count - 1
+    ai_message = record_message(session, 'ai', ai_response_text)
+    if roadmap_draft_due(session, previous_count):
+        queue_roadmap_draft(session)
+    elif session.roadmap_draft_status in ('pending', 'running'):
+        run_unclaimed_jobs(session)
+    return ai_message
+
+def _roadmap_ready_text(session):
+    return f"Oops! You've reached the message limit for this session. We've had a great conversation! I'm preparing a personalized career roadmap for you based on everything we've discussed. It will be ready here in a moment: [View Your Roadmap](/roadmap/{session.session_id})"
+
+def _welcome_pending(session):
+    """
+    True while the session's welcome message is still being generated. Starts
+    its job in the background if no worker has, but never waits for it.
+    """
+    # The welcome message is the first one, so only empty sessions can be waiting on it
+    if session.message_count:
+        return False
+    run_unclaimed_jobs(session)
+    return active_job(session, 'welcome') is not None
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @api_view(['POST'])
 def send_message(request):
     serializer = ChatSendSerializer(data=request.data)
@@ -37,67 +139,137 @@ def send_message(request):
     
     try:
         session = UserSession.objects.get(session_id=session_id)
-        
-        # Save the user's message
-        ChatMessage.objects.create(session=session, sender='user', message=message_text)
-
-
-         # 1. Check if the user is explicitly asking for the roadmap
-        user_wants_roadmap = 'roadmap' in message_text.lower() or 'career plan' in message_text.lower()
-
-         # --- ROADMAP TRIGGER LOGIC ---
-         # First, get the total message count for this session
-        message_count = ChatMessage.objects.filter(session=session).count()
-        limit_reached = message_count >= 20
-        # Check if the message limit is reached AND the roadmap hasn't been created yet
-        if (limit_reached or user_wants_roadmap) and not session.roadmap_data:
-            
-            # This part of the logic is unchanged. It generates and saves the roadmap.
-            history_queryset = ChatMessage.objects.filter(session=session).order_by("timestamp")
-            history_text = "\n".join([f"{msg.get_sender_display()}: {msg.message}" for msg in history_queryset])
-            
-            roadmap_json = generate_career_roadmap(session, history_text)
-            session.roadmap_data = roadmap_json
-            session.save()
-            
-            final_ai_message_text = f"Oops! You've reached the message limit for this session. We've had a great conversation! I've prepared a personalized career roadmap for you based on everything we've discussed. You can access it here: [View Your Roadmap](/roadmap/{session.session_id})"
-            
-            ai_message = ChatMessage.objects.create(session=session, sender='ai', message=final_ai_message_text)
+
+        # --- ROADMAP TRIGGER LOGIC ---
+        intent = classify_intent(message_text)
+        if _roadmap_due(session, intent):
+            ai_message = _queue_roadmap_reply(session, message_text)
         else:
             # --- NORMAL CONVERSATION FLOW ---
             # If the limit isn't reached, continue the conversation as usual.
-        
-            # Get the full conversation history to provide context to the LLM
-            history_queryset = ChatMessage.objects.filter(session=session).order_by("timestamp")
-            history_text = "\n".join([f"{msg.get_sender_display()}: {msg.message}" for msg in history_queryset])
-        
-            # Prepare the context from the user's session data
-            context = { "name": session.name, "status": session.status, "age": session.age }
+            history_text = build_chat_history(session)
+            context = _build_chat_context(session, intent)
+            _record_user_message(session, message_text)
         
             # Call the LLM to get the next response
             ai_response_text = chat_with_ai(context, message_text, history_text)
         
             # Save the AI's response
-            ai_message = ChatMessage.objects.create(session=session, sender='ai', message=ai_response_text)
+            ai_message = _record_chat_reply(session, ai_response_text)
         
         return Response({
             'success': True,
             'ai_response': ChatMessageSerializer(ai_message).data
         }, status=status.HTTP_201_CREATED)
     
+    except UserSession.DoesNotExist:
+        return Response({'success': False, 'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+    except LLMUnavailable as e:
+        print(f"LLM unavailable for send_message: {e}")
+        return Response({'success': False, 'error': LLM_BUSY_ERROR}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+@api_view(['POST'])
+@renderer_classes([ORJSONRenderer, EventStreamRenderer])
+def send_message_stream(request):
+    """
+    Streaming variant of send_message. Emits the AI reply as Server-Sent Events:
+    `token` events carry text deltas, a final `done` event carries the saved message.
+    """
+    serializer = ChatSendSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({'success': False, 'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    session_id = serializer.validated_data['session_id']
+    message_text = serializer.validated_data['message']
+
+    try:
+        session = UserSession.objects.get(session_id=session_id)
     except UserSession.DoesNotExist:
         return Response({'success': False, 'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
 
+    intent = classify_intent(message_text)
+    if _roadmap_due(session, intent):
+        def event_stream():
+            ai_message = _queue_roadmap_reply(session, message_text)
+            yield _sse_event('done', ChatMessageSerializer(ai_message).data)
+    else:
+        history_text = build_chat_history(session)
+        context = _build_chat_context(session, intent)
+        _record_user_message(session, message_text)
+
+        def event_stream():
+            parts = []
+            try:
+                for delta in stream_chat_with_ai(context, message_text, history_text):
+                    parts.append(delta)
+                    yield _sse_event('token', {'delta': delta})
+            except Exception as e:
+                print(f"Error streaming AI response: {e}")
+                yield _sse_event('error', {'error': 'The AI response was interrupted.'})
+                return
+
+            # Persist the reply only once the stream has finished
+            ai_message = _record_chat_reply(session, "".join(parts))
+            yield _sse_event('done', ChatMessageSerializer(ai_message).data)
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def _history_etag(session, welcome_pending, since, limit):
+    # message_count and updated_at change with every saved message, so the
+    # tag can be checked before any messages are read
+    version = f"{session.session_id}:{session.message_count}:{session.updated_at.timestamp()}:{welcome_pending}:{since}:{limit}"
+    return f'"{hashlib.sha1(version.encode()).hexdigest()}"'
+
 @api_view(['GET'])
 def get_chat_history(request, session_id):
+    """
+    Returns a page of the session's messages, oldest first. `since` (a cursor
+    from a previous response's `next_cursor`) returns only newer messages and
+    `limit` caps the page size. Unchanged pages are answered with 304. While
+    `welcome_pending` is true, the client should poll for the welcome message.
+    """
+    since = request.query_params.get('since') or None
     try:
-        session = UserSession.objects.get(session_id=session_id)
-        serializer = ChatHistorySerializer(session)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    
+        limit = min(int(request.query_params.get('limit', settings.CHAT_HISTORY_PAGE_SIZE)), settings.CHAT_HISTORY_PAGE_SIZE)
+        if since:
+            decode_cursor(since)
+    except ValueError:
+        return Response({'success': False, 'error': 'Invalid limit or cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(limit, 1)
+
+    try:
+        session = UserSession.objects.only(
+            'session_id', 'name', 'status', 'message_count', 'updated_at',
+            'roadmap_status', 'resume_status', 'roadmap_draft_status',
+        ).get(session_id=session_id)
     except UserSession.DoesNotExist:
         return Response({'success': False, 'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
-    
+
+    welcome_pending = _welcome_pending(session)
+    etag = _history_etag(session, welcome_pending, since, limit)
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        messages, next_cursor, has_more = fetch_history_page(session, since, limit)
+        payload = {
+            'session_id': session.session_id,
+            'name': session.name,
+            'status': session.status,
+            'messages': messages,
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'welcome_pending': welcome_pending,
+        }
+        response = HttpResponse(orjson.dumps(payload, option=orjson.OPT_UTC_Z), content_type='application/json')
+    response['ETag'] = etag
+    # Let clients cache the page but revalidate it on every poll
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
 @api_view(['GET'])
 def get_roadmap(request, session_id):
     """
@@ -107,17 +279,40 @@ def get_roadmap(request, session_id):
         session = UserSession.objects.get(session_id=session_id)
         if session.roadmap_data:
             return Response(session.roadmap_data, status=status.HTTP_200_OK)
+        elif session.roadmap_status in ('pending', 'running'):
+            # Still being generated; clients should poll until they get a 200
+            run_unclaimed_jobs(session)
+            job = latest_job(session, 'roadmap')
+            return Response({
+                'status': session.roadmap_status,
+                'progress': job.progress if job else 0,
+            }, status=status.HTTP_202_ACCEPTED)
+        elif session.roadmap_status == 'failed':
+            # A finished job, not a server error: pollers stop on this 200
+            return Response({'error': 'Failed to generate the roadmap.', 'status': 'failed'}, status=status.HTTP_200_OK)
         else:
             return Response({'error': 'Roadmap not generated yet.'}, status=status.HTTP_404_NOT_FOUND)
     
     except UserSession.DoesNotExist:
         return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
 
+# Room for the session_id field and multipart boundaries around the file
+MULTIPART_OVERHEAD = 16 * 1024
+
 @api_view(['POST'])
 def upload_resume(request):
     """
-    Handles resume file uploads for a given session.
+    Handles resume file uploads for a given session. The file is saved and
+    parsed by a background job; poll get_resume_status for the outcome.
     """
+    # Refuse oversized uploads before the body is read
+    content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    if content_length > settings.RESUME_MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD:
+        return Response(
+            {'success': False, 'error': 'Resume file is too large.'},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+
     session_id = request.data.get('session_id')
     resume_file = request.FILES.get('resume')
 
@@ -136,9 +331,35 @@ def upload_resume(request):
             status=status.HTTP_404_NOT_FOUND
         )
 
-    # Assign the uploaded file to the model field and save the session
-    session.resume_file = resume_file
-    session.save()
+    if resume_file.size > settings.RESUME_MAX_UPLOAD_BYTES:
+        return Response(
+            {'success': False, 'error': 'Resume file is too large.'},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+    if not looks_like_pdf(resume_file):
+        return Response(
+            {'success': False, 'error': 'Resume must be a PDF file.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Each distinct file is parsed and chunked once, off the request;
+    # re-uploads of the same content reuse the stored chunks or pending job.
+    resume_hash = hash_resume_file(resume_file)
+    already_handled = session.resume_chunks or session.resume_status in ('pending', 'running')
+    if resume_hash != session.resume_hash or not already_handled:
+        # Storage copies the upload in chunks, so it is never read whole. The
+        # job only gets its name (workers read it through the same storage)
+        # and deletes it once parsed.
+        resume_path = default_storage.save(f"resumes/uploads/{session.session_id}.pdf", resume_file)
+        with transaction.atomic():
+            session.resume_hash = resume_hash
+            session.resume_chunks = None
+            session.resume_profile = None
+            session.resume_status = 'pending'
+            session.save(update_fields=['resume_hash', 'resume_chunks', 'resume_profile', 'resume_status', 'updated_at'])
+            # Only the latest upload needs parsing
+            supersede_pending_jobs(session, 'resume')
+            enqueue_job(session, 'resume', payload={'path': resume_path, 'hash': resume_hash})
 
     # --- LLM Trigger (Optional) ---
     # You could immediately trigger the LLM to analyze the resume and send a new message.
@@ -147,17 +368,74 @@ def upload_resume(request):
     # Create a confirmation message to add to the chat history
     ai_message_text = f"Thank you for uploading your resume, '{resume_file.name}'. I will review it now. What specific roles are you interested in?"
     
-    ai_message = ChatMessage.objects.create(
-        session=session,
-        sender='ai',
-        message=ai_message_text
-    )
+    ai_message = record_message(session, 'ai', ai_message_text)
     
     return Response({
         'success': True,
         'message': 'Resume uploaded successfully.',
+        'resume_status': session.resume_status,
         'ai_response': ChatMessageSerializer(ai_message).data
     }, status=status.HTTP_200_OK)
 
+@api_view(['GET'])
+def get_resume_status(request, session_id):
+    """
+    Reports how far the session's resume has been processed.
+    """
+    session = UserSession.objects.filter(session_id=session_id).only(
+        'resume_status', 'resume_chunks', 'roadmap_status', 'roadmap_draft_status',
+    ).first()
+    if session is None:
+        return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+    if session.resume_status is None and not session.resume_chunks:
+        return Response({'error': 'No resume uploaded yet.'}, status=status.HTTP_404_NOT_FOUND)
+    run_unclaimed_jobs(session)
+    # Sessions from before background parsing have chunks but no status
+    return Response({
+        'status': session.resume_status or 'done',
+        'chunks': len(session.resume_chunks or []),
+    }, status=status.HTTP_200_OK)
+
+def _metrics_extra():
+    """
+    Values owned by other modules, read at scrape time.
+    """
+    cache = llm_cache.cache_stats()
+    for tier in ('memory', 'shared'):
+        yield ('llm_cache_hits_total', 'counter', "LLM response cache hits by tier.", {'tier': tier}, cache[f'{tier}_hits'])
+    yield ('llm_cache_misses_total', 'counter', "LLM response cache misses.", {}, cache['misses'])
+    yield ('llm_cache_hit_rate', 'gauge', "Share of LLM response cache lookups served from the cache.", {}, cache['hit_rate'])
+    yield ('llm_cache_memory_entries', 'gauge', "Entries in the in-process LLM response cache.", {}, cache['memory_entries'])
+
+    for provider, stats in get_router().provider_stats().items():
+        labels = {'provider': provider}
+        yield ('llm_provider_calls_total', 'counter', "LLM calls routed to each provider.", labels, stats['calls'])
+        yield ('llm_provider_failures_total', 'counter', "Failed LLM calls per provider.", labels, stats['failures'])
+        yield ('llm_provider_latency_ewma_seconds', 'gauge', "Smoothed LLM latency per provider.", labels, stats['latency'])
+        yield ('llm_provider_error_rate_ewma', 'gauge', "Smoothed LLM error rate per provider.", labels, stats['error_rate'])
+
+    from .chat_socket import open_connections
+    yield ('chat_socket_open_connections', 'gauge', "Open chat WebSockets in this process.", {}, open_connections())
+
+    queued = BackgroundJob.objects.filter(status__in=('pending', 'running')).values('kind', 'status').annotate(jobs=Count('pk'))
+    for row in queued:
+        yield ('background_jobs', 'gauge', "Queued and running background jobs.", {'kind': row['kind'], 'status': row['status']}, row['jobs'])
+
+def get_metrics(request):
+    """
+    Serves this process's metrics in the Prometheus text format.
+    """
+    if not settings.METRICS_TOKEN and not settings.DEBUG:
+        # Never public in production
+        return HttpResponse(status=404)
+    if settings.METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied, settings.METRICS_TOKEN):
+            return HttpResponse(status=401)
+    return HttpResponse(
+        metrics.render_prometheus(_metrics_extra()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
 def test_view(request):
      return JsonResponse({"message": "This is the NEWEST version running."})
\ No newline at end of file
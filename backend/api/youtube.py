@@ -1,29 +1,121 @@
 # In backend/api/youtube.py
 
-from googleapiclient.discovery import build
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cachetools import TTLCache
 from django.conf import settings
 
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+YOUTUBE_API_SERVICE_NAME = "youtube"
+YOUTUBE_API_VERSION = "v3"
+
+# --- Shared State ---
+# The API client sits on httplib2, which is not thread-safe, so each thread
+# builds its client once and reuses it for every later lookup.
+_local = threading.local()
+
+# Results are cached per normalized skill; the same skills come up in most
+# roadmaps, and every cache hit saves a search call's worth of quota.
+_course_cache = TTLCache(maxsize=settings.YOUTUBE_CACHE_SIZE, ttl=settings.YOUTUBE_CACHE_TTL)
+_cache_lock = threading.Lock()
+
+# Bounded pool for fanning out a roadmap's lookups in parallel
+_executor = ThreadPoolExecutor(max_workers=settings.YOUTUBE_MAX_WORKERS, thread_name_prefix='youtube')
+
+
+# --- Fake Backend ---
+# Stands in for the YouTube API client (YOUTUBE_BACKEND=fake) so roadmaps can
+# be generated offline with a configurable latency and error profile.
+class _FakeSearchRequest:
+    def __init__(self, query, max_results, latency, error_rate):
+        self.query = query
+        self.max_results = max_results
+        self.latency = latency
+        self.error_rate = error_rate
+
+    def execute(self):
+        time.sleep(self.latency)
+        if random.random() < self.error_rate:
+            raise RuntimeError("Fake YouTube quota exceeded")
+        return {'items': [
+            {'id': {'videoId': f"fake{i}"}, 'snippet': {'title': f"{self.query} (part {i + 1})"}}
+            for i in range(self.max_results)
+        ]}
+
+
+class _FakeSearch:
+    def __init__(self, latency, error_rate):
+        self.latency = latency
+        self.error_rate = error_rate
+
+    def list(self, q, maxResults=1, **params):
+        return _FakeSearchRequest(q, maxResults, self.latency, self.error_rate)
+
+
+class FakeYouTube:
+    def __init__(self, latency=0.0, error_rate=0.0):
+        self._search = _FakeSearch(latency, error_rate)
+
+    def search(self):
+        return self._search
+
+
+def _get_client():
+    youtube = getattr(_local, 'client', None)
+    if youtube is None:
+        if settings.YOUTUBE_BACKEND == 'fake':
+            youtube = FakeYouTube(settings.FAKE_YOUTUBE_LATENCY, settings.FAKE_YOUTUBE_ERROR_RATE)
+        else:
+            # The discovery client is slow to import and only needed here
+            from googleapiclient.discovery import build
+            youtube = build(
+                YOUTUBE_API_SERVICE_NAME,
+                YOUTUBE_API_VERSION,
+                developerKey=settings.YOUTUBE_API_KEY,
+                cache_discovery=False,
+            )
+        _local.client = youtube
+    return youtube
+
+
+def normalize_skill(skill):
+    """
+    Normalizes a skill name for use as a cache key ("  Data  Structures" -> "data structures").
+    """
+    return re.sub(r"\s+", " ", str(skill)).strip().lower()
+
+
 def get_youtube_courses(skill, max_results=1):
     """
     Search YouTube for a course/tutorial about a specific skill.
     """
-    # Assumes you have YOUTUBE_API_KEY in your settings.py file
-    API_KEY = settings.YOUTUBE_API_KEY
-    YOUTUBE_API_SERVICE_NAME = "youtube"
-    YOUTUBE_API_VERSION = "v3"
-    
+    cache_key = (normalize_skill(skill), max_results)
+    with _cache_lock:
+        cached = _course_cache.get(cache_key)
+    if cached is not None:
+        metrics.inc('youtube_cache_lookups_total', result='hit')
+        return list(cached)
+    metrics.inc('youtube_cache_lookups_total', result='miss')
+
     try:
-        youtube = build(YOUTUBE_API_SERVICE_NAME, YOUTUBE_API_VERSION, developerKey=API_KEY)
-        
-        request = youtube.search().list(
+        request = _get_client().search().list(
             q=f"{skill} course tutorial for beginners",
             part="snippet",
             type="video",
             maxResults=max_results,
             videoCategoryId="27" # Category ID for "Education"
         )
-        response = request.execute()
-        
+        with metrics.span("youtube.search"):
+            response = request.execute()
+
         results = []
         for item in response.get('items', []):
             video_id = item.get('id', {}).get('videoId')
@@ -33,8 +125,24 @@ def get_youtube_courses(skill, max_results=1):
                     "name": snippet.get('title', 'Untitled Video'),
                     "url": f"https://www.youtube.com/watch?v={video_id}"
                 })
-        return results
-        
+        # Only successful lookups are cached so transient failures are retried
+        with _cache_lock:
+            _course_cache[cache_key] = results
+        return list(results)
+
     except Exception as e:
-        print(f"Failed to fetch YouTube courses for '{skill}': {str(e)}")
-        return []
\ No newline at end of file
+        logger.warning("Failed to fetch YouTube courses for '%s': %s", skill, e)
+        return []
+
+
+def get_youtube_courses_bulk(skills, max_results=1):
+    """
+    Looks up several skills in parallel on the shared pool.
+    Returns a dict mapping each normalized skill to its results.
+    """
+    futures = {}
+    for skill in skills:
+        key = normalize_skill(skill)
+        if key and key not in futures:
+            futures[key] = _executor.submit(get_youtube_courses, skill, max_results)
+    return {key: future.result() for key, future in futures.items()}
@@ -0,0 +1,20 @@
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.counseling_ai.settings')
+
+django_application = get_asgi_application()
+
+# Imported after Django is set up, since it loads the models
+from backend.api.chat_socket import chat_socket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """
+    Sends WebSocket connections to the chat socket and everything else to Django.
+    """
+    if scope['type'] == 'websocket':
+        await chat_socket(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
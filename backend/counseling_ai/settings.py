@@ -41,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.api.middleware.request_metrics_middleware', # First, so it times everything below
     'corsheaders.middleware.CorsMiddleware', # Must be high up
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -71,6 +72,18 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.counseling_ai.wsgi.application'
+ASGI_APPLICATION = 'backend.counseling_ai.asgi.application'
+
+# Serve the LLM-bound endpoints with async views. Enable when running under
+# an ASGI server (uvicorn); sync views are better under gunicorn/WSGI.
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=False)
+
+# Chat WebSockets (see api/chat_socket.py, ASGI only). Each connection
+# re-reads its session row every CHAT_SOCKET_POLL_SECONDS while a welcome
+# message, roadmap or resume is being generated, and every
+# CHAT_SOCKET_IDLE_POLL_SECONDS otherwise (for messages sent from other tabs).
+CHAT_SOCKET_POLL_SECONDS = env.float('CHAT_SOCKET_POLL_SECONDS', default=1.0)
+CHAT_SOCKET_IDLE_POLL_SECONDS = env.float('CHAT_SOCKET_IDLE_POLL_SECONDS', default=10.0)
 
 
 # Database
@@ -124,6 +137,10 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Resume search indexes (see api/vector_store.py). They are rebuilt from the
+# database wherever they are missing, so a local directory works; point the
+# web and worker services at a shared disk to build each one only once.
+RESUME_INDEX_DIR = env('RESUME_INDEX_DIR', default=os.path.join(MEDIA_ROOT, 'resume_index'))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
@@ -143,5 +160,149 @@ CORS_ALLOWED_ORIGIN_REGEXES = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# JSON in and out of DRF views goes through orjson (api/renderers.py)
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'backend.api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'backend.api.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# LLM gateway (api/llm_gateway.py). LLM_BACKEND picks the default provider:
+# groq, openai, ollama, or fake, an offline stand-in with FAKE_LLM_LATENCY
+# seconds of latency and FAKE_LLM_ERROR_RATE chance of a 429.
+# LLM_RATE_LIMIT_MAX_WAIT is the longest a call will queue for quota before
+# giving up.
+LLM_BACKEND = env('LLM_BACKEND', default='groq')
+LLM_TIMEOUT = env.float('LLM_TIMEOUT', default=30.0)
+LLM_MAX_RETRIES = env.int('LLM_MAX_RETRIES', default=3)
+LLM_MAX_CONNECTIONS = env.int('LLM_MAX_CONNECTIONS', default=20)
+LLM_RATE_LIMIT_MAX_WAIT = env.float('LLM_RATE_LIMIT_MAX_WAIT', default=20.0)
+FAKE_LLM_LATENCY = env.float('FAKE_LLM_LATENCY', default=0.2)
+FAKE_LLM_ERROR_RATE = env.float('FAKE_LLM_ERROR_RATE', default=0.0)
+
+# Per-provider (requests, tokens) per minute. Groq defaults to its free tier
+# for llama-3.1-8b-instant; providers not listed are not throttled.
+LLM_RATE_LIMITS = {
+    'groq': (
+        env.int('LLM_REQUESTS_PER_MINUTE', default=30),
+        env.int('LLM_TOKENS_PER_MINUTE', default=6000),
+    ),
+}
+
+OPENAI_API_KEY = env('OPENAI_API_KEY', default='')
+OPENAI_MODEL = env('OPENAI_MODEL', default='gpt-4o-mini')
+OLLAMA_HOST = env('OLLAMA_HOST', default='127.0.0.1:11434')
+OLLAMA_MODEL = env('OLLAMA_MODEL', default='llama3.1')
+
+# Provider routes per task, as comma-separated "provider:model" entries (the
+# model may be omitted), e.g. LLM_ROUTE_CHAT=groq:llama-3.1-8b-instant,ollama.
+# Calls go to the entry with the lowest recent latency + error cost and fail
+# over down the list; see LLMRouter.
+LLM_ROUTES = {
+    'chat': env.list('LLM_ROUTE_CHAT', default=[LLM_BACKEND]),
+    'roadmap': env.list('LLM_ROUTE_ROADMAP', default=[LLM_BACKEND]),
+    'resume': env.list('LLM_ROUTE_RESUME', default=[LLM_BACKEND]),
+}
+# EWMA weight of each new latency sample, seconds charged per failure when
+# ranking providers, share of calls sent to a fallback to re-measure it, and
+# retries allowed on a provider before failing over to the next one.
+LLM_ROUTER_EWMA_ALPHA = env.float('LLM_ROUTER_EWMA_ALPHA', default=0.2)
+LLM_ROUTER_ERROR_PENALTY = env.float('LLM_ROUTER_ERROR_PENALTY', default=10.0)
+LLM_ROUTER_EXPLORE_RATE = env.float('LLM_ROUTER_EXPLORE_RATE', default=0.05)
+LLM_FAILOVER_RETRIES = env.int('LLM_FAILOVER_RETRIES', default=1)
+
+# Caches. CACHE_URL accepts django-environ cache URLs (e.g. redis://...); the
+# in-process default is fine for a single worker.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# LLM response cache (see api/llm_cache.py): in-process LRU size and TTL in
+# seconds, plus the shared cache alias backing it.
+LLM_CACHE_ALIAS = 'default'
+LLM_CACHE_MAX_ENTRIES = env.int('LLM_CACHE_MAX_ENTRIES', default=1024)
+LLM_CACHE_TTL = env.int('LLM_CACHE_TTL', default=60 * 60 * 24)
+
+# Token budget for the conversation history placed in each chat prompt. Older
+# turns beyond it are folded into a rolling summary of at most
+# HISTORY_SUMMARY_MAX_TOKENS tokens.
+CHAT_HISTORY_TOKEN_BUDGET = env.int('CHAT_HISTORY_TOKEN_BUDGET', default=2000)
+HISTORY_SUMMARY_MAX_TOKENS = env.int('HISTORY_SUMMARY_MAX_TOKENS', default=300)
+
+# Messages per page of the chat history endpoint (clients may ask for fewer).
+CHAT_HISTORY_PAGE_SIZE = env.int('CHAT_HISTORY_PAGE_SIZE', default=100)
+
+# Roadmap template store (see `manage.py build_roadmap_templates`). A school
+# roadmap is served from a template when the conversation's cosine similarity
+# to the template's cluster is at least ROADMAP_TEMPLATE_THRESHOLD.
+# ROADMAP_TEMPLATE_PERSONALIZE adds a short LLM pass that rewrites the
+# reasoning for the student. Templates are cached per process for
+# ROADMAP_TEMPLATE_CACHE_TTL seconds.
+ROADMAP_TEMPLATES_ENABLED = env.bool('ROADMAP_TEMPLATES_ENABLED', default=True)
+ROADMAP_TEMPLATE_THRESHOLD = env.float('ROADMAP_TEMPLATE_THRESHOLD', default=0.6)
+ROADMAP_TEMPLATE_PERSONALIZE = env.bool('ROADMAP_TEMPLATE_PERSONALIZE', default=False)
+ROADMAP_TEMPLATE_CACHE_TTL = env.int('ROADMAP_TEMPLATE_CACHE_TTL', default=300)
+
+# A session gets its roadmap at ROADMAP_MESSAGE_LIMIT messages (or earlier,
+# when the user asks). At ROADMAP_DRAFT_AT messages a draft is generated in
+# the background, so the roadmap is ready (or only needs a short refresh
+# with the latest turns) when it is triggered. 0 disables drafts.
+ROADMAP_MESSAGE_LIMIT = env.int('ROADMAP_MESSAGE_LIMIT', default=20)
+ROADMAP_DRAFT_AT = env.int('ROADMAP_DRAFT_AT', default=16)
+
+# Chat intent classifier (see api/intent.py): where its weights live, and the
+# confidence below which a turn is treated as ordinary counseling.
+INTENT_MODEL_PATH = env('INTENT_MODEL_PATH', default=os.path.join(BASE_DIR, 'api', 'intent_model.npz'))
+INTENT_MIN_CONFIDENCE = env.float('INTENT_MIN_CONFIDENCE', default=0.5)
+
+# Resume uploads: the largest accepted file, and how many pages are parsed.
+# Uploads bigger than FILE_UPLOAD_MAX_MEMORY_SIZE are spooled to a temporary
+# file instead of being held in memory.
+RESUME_MAX_UPLOAD_BYTES = env.int('RESUME_MAX_UPLOAD_BYTES', default=5 * 1024 * 1024)
+RESUME_MAX_PAGES = env.int('RESUME_MAX_PAGES', default=10)
+FILE_UPLOAD_MAX_MEMORY_SIZE = env.int('FILE_UPLOAD_MAX_MEMORY_SIZE', default=512 * 1024)
+
+# App loggers write to stderr. LOG_LEVEL=DEBUG adds diagnostics such as raw
+# LLM output, which can quote user messages, so leave it off in production.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {'backend.api': {'handlers': ['console'], 'level': env('LOG_LEVEL', default='INFO')}},
+}
+
+# Metrics (see api/metrics.py). /api/metrics serves them in the Prometheus
+# format; if METRICS_TOKEN is set, scrapers must send it as a bearer token.
+# Outside DEBUG the endpoint is only served when a token is set.
+# METRICS_SERVER_TIMING adds each request's stage breakdown as a
+# Server-Timing header, which every browser can read, so it is off in
+# production unless enabled explicitly.
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+METRICS_SERVER_TIMING = env.bool('METRICS_SERVER_TIMING', default=DEBUG)
+
+# Background jobs (see `manage.py run_jobs`). A job still marked running after
+# the lease is assumed to belong to a dead worker and is picked up again.
+JOB_LEASE_SECONDS = env.int('JOB_LEASE_SECONDS', default=300)
+JOB_MAX_ATTEMPTS = env.int('JOB_MAX_ATTEMPTS', default=2)
+# Roadmap, draft and resume jobs no worker has claimed after this many seconds
+# run in the web process polling for them, so the worker service is optional.
+# 0 runs them there right away. Welcome messages are always started right away.
+JOB_INLINE_AFTER_SECONDS = env.int('JOB_INLINE_AFTER_SECONDS', default=10)
+
 YOUTUBE_API_KEY = env('YOUTUBE_API_KEY')
+# Parallel lookups per process, and how long (seconds) course results stay cached
+YOUTUBE_MAX_WORKERS = env.int('YOUTUBE_MAX_WORKERS', default=8)
+YOUTUBE_CACHE_TTL = env.int('YOUTUBE_CACHE_TTL', default=60 * 60 * 24)
+YOUTUBE_CACHE_SIZE = env.int('YOUTUBE_CACHE_SIZE', default=2048)
+# api, or fake, an offline stand-in with FAKE_YOUTUBE_LATENCY seconds of
+# latency and FAKE_YOUTUBE_ERROR_RATE chance of a failed search.
+YOUTUBE_BACKEND = env('YOUTUBE_BACKEND', default='api')
+FAKE_YOUTUBE_LATENCY = env.float('FAKE_YOUTUBE_LATENCY', default=0.1)
+FAKE_YOUTUBE_ERROR_RATE = env.float('FAKE_YOUTUBE_ERROR_RATE', default=0.0)
 GROQ_API_KEY = env('GROQ_API_KEY')
\ No newline at end of file
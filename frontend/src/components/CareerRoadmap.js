@@ -2,13 +2,27 @@ import React, { useState, useEffect } from 'react';
 import { Menu, User } from 'lucide-react'; 
 import { ReactComponent as MyLogo } from '../assets/my-logo.svg';
 
-// Helper function to fetch data from your API
-async function fetchRoadmapData(sessionId) {
-    const response = await fetch(`/api/roadmap/${sessionId}/`);
-    if (!response.ok) {
-        throw new Error('Failed to fetch roadmap data.');
+const ROADMAP_POLL_INTERVAL_MS = 2000;
+
+// Helper function to fetch data from your API.
+// The backend answers 202 while the roadmap is still being generated, so keep
+// polling (reporting progress) until it is ready. A generation that failed
+// comes back as a 200 with status 'failed'.
+async function fetchRoadmapData(sessionId, onProgress, isCancelled) {
+    while (!isCancelled()) {
+        const response = await fetch(`/api/roadmap/${sessionId}/`);
+        if (response.status === 202) {
+            const pending = await response.json();
+            onProgress(pending.progress);
+            await new Promise(resolve => setTimeout(resolve, ROADMAP_POLL_INTERVAL_MS));
+            continue;
+        }
+        if (!response.ok) {
+            throw new Error('Failed to fetch roadmap data.');
+        }
+        return response.json();
     }
-    return response.json();
+    return null;
 }
 
 // A single card component to display a career option
@@ -79,15 +93,23 @@ const CareerRoadmap = ({ sessionData, onStartNewSession }) => {
     const [roadmapData, setRoadmapData] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
+    const [progress, setProgress] = useState(null);
 
     useEffect(() => {
+        let cancelled = false;
         if (sessionId) {
-            fetchRoadmapData(sessionId)
+            fetchRoadmapData(sessionId, setProgress, () => cancelled)
                 .then(data => {
-                    setRoadmapData(data.roadmap);
+                    if (cancelled || !data) return;
+                    if (data.status === 'failed') {
+                        setError("We couldn't generate your roadmap. Go back to the chat and ask for it again.");
+                    } else {
+                        setRoadmapData(data.roadmap);
+                    }
                     setLoading(false);
                 })
                 .catch(err => {
+                    if (cancelled) return;
                     setError('Could not load your career roadmap. Please try again later.');
                     setLoading(false);
                 });
@@ -95,10 +117,15 @@ const CareerRoadmap = ({ sessionData, onStartNewSession }) => {
             setError('No session data found.');
             setLoading(false);
         }
+        return () => { cancelled = true; };
     }, [sessionId]);
 
     if (loading) {
-        return <div className="text-center p-10 font-glory">Loading your personalized roadmap...</div>;
+        return (
+            <div className="text-center p-10 font-glory">
+                {progress === null ? 'Loading your personalized roadmap...' : `Preparing your personalized roadmap... ${progress}%`}
+            </div>
+        );
     }
 
     if (error) {
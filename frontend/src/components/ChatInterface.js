@@ -1,9 +1,18 @@
 import React, { useState, useEffect, useRef } from 'react';
-import { getChatHistory, sendMessage, uploadResume } from '../services/api';
+import { getChatHistory, openChatSocket, sendMessageStream, uploadResume } from '../services/api';
 import { Menu, User, Send, Mic, Paperclip } from 'lucide-react';
 import counselorAvatar from '../assets/avatar.png';
 import { ReactComponent as MyLogo } from '../assets/my-logo.svg';
 
+const WELCOME_POLL_INTERVAL_MS = 1000;
+// Background job statuses (roadmap_status / resume_status) still in progress
+const IN_PROGRESS = ['pending', 'running'];
+const RESUME_STATUS_TEXT = {
+  pending: 'Reading your resume...',
+  running: 'Reading your resume...',
+  failed: "Couldn't read your resume. Please try uploading it again.",
+};
+
 // This component uses YOUR original logic with the NEW design.
 const ChatInterface = ({ sessionData, onNavigateToRoadmap }) => {
   const [messages, setMessages] = useState([]);
@@ -14,11 +23,29 @@ const ChatInterface = ({ sessionData, onNavigateToRoadmap }) => {
   const inputRef = useRef(null);
   const [selectedFile, setSelectedFile] = useState(null);
   const fileInputRef = useRef(null);
+  // Open chat WebSocket, if the backend supports one (see openChatSocket)
+  const socketRef = useRef(null);
+  // Pushed over the socket; null when unknown (e.g. over HTTP)
+  const [roadmapStatus, setRoadmapStatus] = useState(null);
+  const [resumeStatus, setResumeStatus] = useState(null);
 
   const sessionId = sessionData?.session_id;
 
-  // Your original useEffect for loading chat history - NO CHANGES
+  // The same message can arrive from the socket and from an HTTP response
+  const appendMessages = (newMessages) => setMessages(prev => {
+    const seen = new Set(prev.map(msg => msg.message_id));
+    return [...prev, ...newMessages.filter(msg => !seen.has(msg.message_id))];
+  });
+
+  // Load chat history. Over the WebSocket, history and the welcome message
+  // are pushed; otherwise, while the backend reports the welcome message as
+  // pending, we show the typing indicator and poll.
   useEffect(() => {
+    let cancelled = false;
+    let pollTimer = null;
+    let cursor = null;
+    let socket = null;
+
     const loadChatHistory = async () => {
       if (!sessionId) {
         setIsLoading(false);
@@ -26,19 +53,79 @@ const ChatInterface = ({ sessionData, onNavigateToRoadmap }) => {
         return;
       }
       try {
-        const response = await getChatHistory(sessionId);
-        if (response && response.messages) {
-          setMessages(response.messages);
+        // Page through anything newer than what we already have
+        let response = null;
+        const newMessages = [];
+        do {
+          response = await getChatHistory(sessionId, cursor);
+          if (cancelled) return;
+          newMessages.push(...(response.messages || []));
+          cursor = response.next_cursor;
+        } while (response.has_more);
+        if (newMessages.length > 0) {
+          appendMessages(newMessages);
+        }
+        if (response && response.welcome_pending) {
+          setIsTyping(true);
+          pollTimer = setTimeout(loadChatHistory, WELCOME_POLL_INTERVAL_MS);
+          return;
         }
+        setIsTyping(false);
       } catch (error) {
         console.error('Error fetching chat history:', error);
+        setIsTyping(false);
         setMessages([{ message_id: 'error_fetch', message: 'Failed to load message history.', sender: 'ai' }]);
       } finally {
-        setIsLoading(false);
-        setTimeout(() => inputRef.current?.focus(), 100);
+        if (!cancelled) {
+          setIsLoading(false);
+          setTimeout(() => inputRef.current?.focus(), 100);
+        }
       }
     };
-    loadChatHistory();
+
+    const openSocket = () => {
+      let ready = false;
+      let welcomePending = false;
+      socket = openChatSocket(sessionId, {
+        onMessages: (newMessages) => {
+          appendMessages(newMessages);
+          if (welcomePending) {
+            welcomePending = false;
+            setIsTyping(false);
+          }
+        },
+        onReady: (frame) => {
+          ready = true;
+          socketRef.current = socket;
+          welcomePending = frame.welcome_pending;
+          setIsTyping(frame.welcome_pending);
+          setRoadmapStatus(frame.roadmap_status);
+          setResumeStatus(frame.resume_status);
+          setIsLoading(false);
+          setTimeout(() => inputRef.current?.focus(), 100);
+        },
+        onRoadmap: setRoadmapStatus,
+        onResume: setResumeStatus,
+        onClose: () => {
+          socketRef.current = null;
+          // No socket on this deployment: fall back to HTTP polling
+          if (!ready && !cancelled) loadChatHistory();
+        },
+      });
+    };
+
+    if (sessionId && typeof WebSocket !== 'undefined') {
+      openSocket();
+    } else {
+      loadChatHistory();
+    }
+
+    return () => {
+      cancelled = true;
+      clearTimeout(pollTimer);
+      socket?.close();
+      socketRef.current = null;
+    };
   }, [sessionId]);
 
   // Your original auto-scroll logic - NO CHANGES
@@ -73,7 +160,13 @@ const ChatInterface = ({ sessionData, onNavigateToRoadmap }) => {
         
         // The backend's 'upload_resume' view should return the AI's response.
         if (uploadResponse.success && uploadResponse.ai_response) {
-          setMessages(prev => [...prev, userFileMessage, uploadResponse.ai_response]);
+          setResumeStatus(uploadResponse.resume_status);
+          // The socket may have pushed the AI message already
+          setMessages(prev => [
+            ...prev.filter(msg => msg.message_id !== uploadResponse.ai_response.message_id),
+            userFileMessage,
+            uploadResponse.ai_response,
+          ]);
           // Speak the AI's response after the file is analyzed.
           
         } else {                     
@@ -108,18 +201,31 @@ const ChatInterface = ({ sessionData, onNavigateToRoadmap }) => {
       setInputMessage('');
       setIsTyping(true);
 
-      try {
-        const response = await sendMessage(currentInput, sessionId);
-        if (response.success && response.ai_response) {
-          setMessages(prev => [...prev, response.ai_response]);
-          
-        } else {
-          throw new Error("Invalid AI response from backend.");
+      // Placeholder bubble that fills in as tokens stream from the backend
+      const streamingId = `ai_stream_${Date.now()}`;
+      let streamStarted = false;
+
+      const onToken = (delta) => {
+        if (!streamStarted) {
+          streamStarted = true;
+          setIsTyping(false);
+          setMessages(prev => [...prev, { message_id: streamingId, message: '', sender: 'ai', timestamp: new Date().toISOString() }]);
         }
+        setMessages(prev => prev.map(msg => msg.message_id === streamingId ? { ...msg, message: msg.message + delta } : msg));
+      };
+
+      try {
+        const aiMessage = socketRef.current
+          ? await socketRef.current.sendMessage(currentInput, onToken)
+          : await sendMessageStream(currentInput, sessionId, onToken);
+        // Swap the placeholder for the saved message (or append it if no tokens were streamed)
+        setMessages(prev => streamStarted
+          ? prev.map(msg => msg.message_id === streamingId ? aiMessage : msg)
+          : [...prev, aiMessage]);
       } catch (error) {
         console.error('Error sending message:', error);
         const errorMessage = { message_id: `err_${Date.now()}`, message: "I'm sorry, an error occurred. Please try again.", sender: 'ai', timestamp: new Date().toISOString() };
-        setMessages(prev => [...prev, errorMessage]);
+        setMessages(prev => [...prev.filter(msg => msg.message_id !== streamingId), errorMessage]);
       } finally {
         setIsTyping(false);
         inputRef.current?.focus();
@@ -228,9 +334,12 @@ const ChatInterface = ({ sessionData, onNavigateToRoadmap }) => {
       <div className="animate-spin rounded-full h-6 w-6 sm:h-8 sm:w-8 md:h-9 md:w-9 border-b-2 border-white"></div>
     </div>
   ) : (
-    messages.map((msg) => <MessageBubble key={msg.message_id} message={msg} onNavigate={onNavigateToRoadmap} />)
+    messages.map((msg) => <MessageBubble key={msg.message_id} message={msg} onNavigate={onNavigateToRoadmap} roadmapStatus={roadmapStatus} />)
   )}
   {isTyping && <TypingIndicator />}
+  {RESUME_STATUS_TEXT[resumeStatus] && (
+    <p className="text-center text-white/70 font-light text-xs sm:text-sm">{RESUME_STATUS_TEXT[resumeStatus]}</p>
+  )}
   <div ref={messagesEndRef} />
 </div>
 
@@ -333,7 +442,7 @@ const ChatInterface = ({ sessionData, onNavigateToRoadmap }) => {
 };
 
 // UPDATED MessageBubble component to better match Figma
-const MessageBubble = ({ message, onNavigate }) => {
+const MessageBubble = ({ message, onNavigate, roadmapStatus }) => {
   const isUser = message.sender === 'user';
   
   // Fixed classes - text color only defined here, not in paragraph
@@ -343,6 +452,9 @@ const MessageBubble = ({ message, onNavigate }) => {
   // --- Link Detection Logic ---
   const roadmapLinkText = '[View Your Roadmap]';
   const containsRoadmapLink = message.message.includes(roadmapLinkText);
+  // With no status (over HTTP) the button stays enabled; the roadmap page polls until it is ready
+  const roadmapBusy = IN_PROGRESS.includes(roadmapStatus);
+  const roadmapFailed = roadmapStatus === 'failed';
 
   return (
     <div className={`flex w-full ${isUser ? 'justify-end' : 'justify-start'}`}>
@@ -370,9 +482,10 @@ const MessageBubble = ({ message, onNavigate }) => {
             </p>
             <button
               onClick={onNavigate}
-              className="w-full text-center font-light text-white bg-[#64855f]/75 rounded-lg px-3 py-1.5 hover:bg-[#64855f]/100 transition-all duration-200 text-xs sm:text-sm"
+              disabled={roadmapBusy || roadmapFailed}
+              className="w-full text-center font-light text-white bg-[#64855f]/75 rounded-lg px-3 py-1.5 hover:bg-[#64855f]/100 disabled:opacity-50 transition-all duration-200 text-xs sm:text-sm"
             >
-              View Your Roadmap
+              {roadmapBusy ? 'Preparing Your Roadmap...' : roadmapFailed ? 'Roadmap Failed, Ask Me to Try Again' : 'View Your Roadmap'}
             </button>
           </div>
         ) : (
@@ -46,8 +46,107 @@ export const sendMessage = async (message, sessionId) => {
   });
 };
 
-export const getChatHistory = async (sessionId) => {
-  return makeRequest(`/get_chat_history/${sessionId}/`);
+// Streams the AI reply as Server-Sent Events. `onToken` receives each text
+// delta as it arrives; the resolved value is the saved AI message.
+export const sendMessageStream = async (message, sessionId, onToken) => {
+  const response = await fetch(`${API_BASE_URL}/send_message/stream/`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+    body: JSON.stringify({ message: message, session_id: sessionId }),
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Streaming request failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let finalMessage = null;
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let eventName = 'message';
+      let data = '';
+      rawEvent.split('\n').forEach(line => {
+        if (line.startsWith('event: ')) eventName = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      });
+      const payload = data ? JSON.parse(data) : {};
+
+      if (eventName === 'token') {
+        onToken(payload.delta);
+      } else if (eventName === 'done') {
+        finalMessage = payload;
+      } else if (eventName === 'error') {
+        throw new Error(payload.error || 'Streaming error');
+      }
+    }
+  }
+
+  if (!finalMessage) {
+    throw new Error('Stream ended before the AI response was complete.');
+  }
+  return finalMessage;
+};
+
+// Opens the chat WebSocket for a session (ASGI deployments only). The server
+// first sends the saved history as `messages` frames, then `ready`, and after
+// that pushes new messages (e.g. the welcome message) and roadmap/resume
+// status changes to the handlers. `sendMessage` streams a reply like
+// sendMessageStream and resolves with the saved AI message.
+export const openChatSocket = (sessionId, handlers = {}) => {
+  const socket = new WebSocket(`${API_BASE_URL.replace(/^http/, 'ws')}/ws/chat/${sessionId}/`);
+  let turn = null;
+
+  socket.onmessage = (event) => {
+    const frame = JSON.parse(event.data);
+    if (frame.type === 'messages') {
+      handlers.onMessages?.(frame.messages);
+    } else if (frame.type === 'ready') {
+      handlers.onReady?.(frame);
+    } else if (frame.type === 'roadmap') {
+      handlers.onRoadmap?.(frame.status);
+    } else if (frame.type === 'resume') {
+      handlers.onResume?.(frame.status);
+    } else if (frame.type === 'token') {
+      turn?.onToken(frame.delta);
+    } else if (frame.type === 'done') {
+      turn?.resolve(frame.message);
+      turn = null;
+    } else if (frame.type === 'error') {
+      turn?.reject(new Error(frame.error || 'Chat socket error'));
+      turn = null;
+    }
+  };
+  socket.onclose = () => {
+    turn?.reject(new Error('The chat connection was closed.'));
+    turn = null;
+    handlers.onClose?.();
+  };
+
+  return {
+    sendMessage: (message, onToken) => new Promise((resolve, reject) => {
+      turn = { resolve, reject, onToken };
+      socket.send(JSON.stringify({ type: 'message', message }));
+    }),
+    close: () => socket.close(),
+  };
+};
+
+// Returns one page of history. Pass the previous response's `next_cursor` as
+// `since` to fetch only newer messages; `has_more` says another page follows.
+export const getChatHistory = async (sessionId, since = null) => {
+  const query = since ? `?since=${encodeURIComponent(since)}` : '';
+  return makeRequest(`/get_chat_history/${sessionId}/${query}`);
 };
 
 export const uploadResume = async (file, sessionId) => {